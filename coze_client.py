@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+COZE 工作流客户端
+令牌桶限流 + 并发上限，429/5xx、流中的频率超限错误事件和网络错误按带抖动的指数退避重试，
+结果按 workflow_id + 输入哈希持久化缓存，相同输入不再重复运行工作流
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+
+from rate_limit import TokenBucket, backoff_delay
+from sse_parser import decode_coze_error, decode_coze_message, iter_sse_events
+
+COZE_API_BASE = 'https://api.coze.cn'
+
+# 需要重试的 HTTP 状态码
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 流中 Error 事件需要重试的错误码：4013 请求频率超限，5000 服务内部错误
+RETRY_ERROR_CODES = {4013, 5000}
+
+
+class CozeError(Exception):
+    """COZE 调用失败"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None,
+                 error_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        # 服务端 Retry-After 头指定的等待秒数
+        self.retry_after = retry_after
+        # HTTP 200 的流中 Error 事件携带的 COZE 错误码
+        self.error_code = error_code
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code in RETRY_STATUS or self.error_code in RETRY_ERROR_CODES
+
+
+def input_hash(parameters: Dict) -> str:
+    """工作流输入参数的哈希（键排序后序列化）"""
+    data = json.dumps(parameters, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class CozeResultCache:
+    """基于 SQLite 的工作流结果缓存（支持TTL与按条数LRU淘汰）"""
+
+    def __init__(self, db_path: str = 'coze_cache.db', ttl: int = 7 * 24 * 3600, max_entries: int = 2000):
+        """
+        初始化结果缓存
+
+        Args:
+            db_path: SQLite 数据库文件路径
+            ttl: 缓存有效期（秒），<=0 表示永不过期
+            max_entries: 最大缓存条数，超出后按最近使用时间淘汰
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS coze_results (
+                cache_key TEXT PRIMARY KEY,
+                workflow_id TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_coze_results_last_used ON coze_results(last_used)')
+        self._conn.commit()
+
+    @staticmethod
+    def key(workflow_id: str, parameters: Dict) -> str:
+        return f'{workflow_id}:{input_hash(parameters)}'
+
+    def get(self, workflow_id: str, parameters: Dict) -> Optional[Dict]:
+        """查询缓存的工作流结果"""
+        cache_key = self.key(workflow_id, parameters)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT result, created_at FROM coze_results WHERE cache_key = ?', (cache_key,)
+            ).fetchone()
+            if row and self.ttl > 0 and now - row[1] > self.ttl:
+                self._conn.execute('DELETE FROM coze_results WHERE cache_key = ?', (cache_key,))
+                self._conn.commit()
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE coze_results SET last_used = ? WHERE cache_key = ?', (now, cache_key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, workflow_id: str, parameters: Dict, result: Dict):
+        """写入工作流结果"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO coze_results (cache_key, workflow_id, result, created_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (self.key(workflow_id, parameters), workflow_id, json.dumps(result, ensure_ascii=False), now, now)
+            )
+            if self.max_entries > 0:
+                self._conn.execute(
+                    'DELETE FROM coze_results WHERE cache_key NOT IN '
+                    '(SELECT cache_key FROM coze_results ORDER BY last_used DESC LIMIT ?)',
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """缓存命中统计"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM coze_results').fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+class CozeClient:
+    """COZE 工作流流式运行客户端（线程安全，可在多个 worker 间共用）"""
+
+    def __init__(self, token: str, rate: float = 1.0, burst: Optional[float] = None,
+                 max_concurrency: int = 2, max_retries: int = 4, backoff_base: float = 1.0,
+                 backoff_max: float = 30.0, connect_timeout: float = 10, read_timeout: float = 120,
+                 cache: Optional[CozeResultCache] = None, base_url: str = COZE_API_BASE):
+        """
+        初始化客户端
+
+        Args:
+            token: COZE 访问令牌
+            rate: 每秒最多发起的工作流调用数（令牌桶速率），<=0 表示不限
+            burst: 允许的突发调用数
+            max_concurrency: 同时运行的工作流数上限
+            max_retries: 429/5xx/频率超限错误事件/网络错误的最大重试次数
+            backoff_base: 退避基数（秒）
+            backoff_max: 单次退避上限（秒）
+            connect_timeout: 连接超时（秒）
+            read_timeout: 读取超时（秒，流式响应两次数据之间的最长间隔）
+            cache: 结果缓存，None 表示不缓存
+            base_url: API 地址
+        """
+        self.token = token
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache = cache
+        self.base_url = base_url.rstrip('/')
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        })
+
+    def _stream_run(self, workflow_id: str, parameters: Dict) -> Optional[Dict]:
+        """发起一次 stream_run，返回第一条 Message；HTTP 错误或流中的 Error 事件抛出 CozeError"""
+        with self._slots:
+            resp = self.session.post(
+                f'{self.base_url}/v1/workflow/stream_run',
+                json={'workflow_id': workflow_id, 'parameters': parameters},
+                timeout=self.timeout,
+                stream=True
+            )
+            with resp:
+                if resp.status_code != 200:
+                    retry_after = resp.headers.get('Retry-After', '')
+                    raise CozeError(f'COZE错误: {resp.status_code} {resp.text[:200]}', resp.status_code,
+                                    float(retry_after) if retry_after.isdigit() else None)
+                # 边接收边解析SSE，拿到第一条Message就返回，不等流结束
+                for event in iter_sse_events(resp.iter_content(chunk_size=None)):
+                    error = decode_coze_error(event)
+                    if error is not None:
+                        raise CozeError(f"COZE错误事件: {error['code']} {error['message'][:200]}",
+                                        resp.status_code, error_code=error['code'])
+                    message = decode_coze_message(event)
+                    if message is not None:
+                        return message
+                return None
+
+    def run_workflow(self, workflow_id: str, parameters: Dict, use_cache: bool = True) -> Optional[Dict]:
+        """
+        运行工作流
+
+        Args:
+            workflow_id: 工作流ID
+            parameters: 工作流输入参数
+            use_cache: 是否读取缓存（结果总会写入缓存）
+
+        Returns:
+            Optional[Dict]: 第一条 Message 的内容；流中没有可解析的 Message 时返回 None
+
+        Raises:
+            CozeError: 非重试类错误，或重试次数用完
+        """
+        if use_cache and self.cache is not None:
+            cached = self.cache.get(workflow_id, parameters)
+            if cached is not None:
+                return cached
+
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                result = self._stream_run(workflow_id, parameters)
+                break
+            except CozeError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                # 优先遵循服务端的 Retry-After
+                if e.retry_after is not None:
+                    delay = min(e.retry_after, self.backoff_max)
+                else:
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+            except requests.RequestException as e:
+                if attempt >= self.max_retries:
+                    raise CozeError(f'COZE请求失败: {e}') from e
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+            attempt += 1
+            time.sleep(delay)
+
+        if result is not None and self.cache is not None:
+            self.cache.put(workflow_id, parameters, result)
+        return result
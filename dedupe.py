@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点近似去重
+用 MinHash 签名识别标题/正文略有不同的同一热点：同一批次内按话题归并，跨运行通过 SQLite 签名索引跳过已处理/已发布的话题
+"""
+
+import hashlib
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# MinHash 签名长度与 LSH 分段：60 个哈希分成 20 段，每段 3 个；
+# Jaccard 相似度 0.5 的两段文本约 94% 概率至少有一段完全相同，0.1 的约 2%
+NUM_PERM = 60
+BANDS = 20
+ROWS = NUM_PERM // BANDS
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+# 提取特征前去掉的字符（空白、标点）
+_NOISE = re.compile(r'[\s\W_]+', re.UNICODE)
+
+# 各类签名使用的字符 n-gram 长度（中文没有空格分词，按字符切分更稳定）
+NGRAM = {'title': 2, 'content': 3}
+
+# 话题状态
+STATUS_PROCESSED = 'processed'
+STATUS_PUBLISHED = 'published'
+
+Signature = Tuple[int, ...]
+
+
+def _features(text: str, ngram: int) -> set:
+    text = _NOISE.sub('', text or '').lower()
+    if len(text) <= ngram:
+        return {text} if text else set()
+    return {text[i:i + ngram] for i in range(len(text) - ngram + 1)}
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+def minhash(text: str, ngram: int = 2) -> Optional[Signature]:
+    """
+    计算文本的 MinHash 签名
+
+    Args:
+        text: 标题或正文
+        ngram: 字符 n-gram 长度
+
+    Returns:
+        Optional[Signature]: 签名，文本为空时返回 None
+    """
+    hashes = [_hash64(feature.encode('utf-8')) for feature in _features(text, ngram)]
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """由签名估计两段文本的 Jaccard 相似度"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def band_keys(signature: Signature) -> List[int]:
+    """LSH 分段键（每段的哈希，带段号，取 63 位以便存入 SQLite INTEGER）"""
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * ROWS:(band + 1) * ROWS]
+        keys.append(_hash64(struct.pack(f'>H{ROWS}Q', band, *values)) >> 1)
+    return keys
+
+
+def group_near_duplicates(items: Iterable[Dict], text_of: Callable[[Dict], str] = lambda item: item.get('title', ''),
+                          threshold: float = 0.5, ngram: int = NGRAM['title'], field: str = 'topic') -> List[Dict]:
+    """
+    把同一批次中的近似重复热点归为同一话题
+
+    每条热点写入 field（话题编号，取该话题第一条热点的序号）和 signature 字段
+
+    Args:
+        items: 热点列表
+        text_of: 取用于比较的文本
+        threshold: Jaccard 相似度不低于该值视为重复
+        ngram: 字符 n-gram 长度
+        field: 写入话题编号的字段名
+
+    Returns:
+        List[Dict]: 原列表（已写入话题编号）
+    """
+    items = list(items)
+    buckets: Dict[int, List[int]] = {}
+    signatures: List[Optional[Signature]] = []
+    topics: List[int] = []
+
+    for index, item in enumerate(items):
+        signature = minhash(text_of(item), ngram)
+        topic = index
+        if signature is not None:
+            keys = band_keys(signature)
+            checked = set()
+            for key in keys:
+                for other in buckets.get(key, ()):
+                    if other in checked:
+                        continue
+                    checked.add(other)
+                    if similarity(signature, signatures[other]) >= threshold:
+                        topic = topics[other]
+                        break
+                if topic != index:
+                    break
+            for key in keys:
+                buckets.setdefault(key, []).append(index)
+
+        signatures.append(signature)
+        topics.append(topic)
+        item[field] = topic
+        item['signature'] = signature
+    return items
+
+
+class DedupeIndex:
+    """基于 SQLite 的 MinHash 签名索引（LSH 分段键建索引），跨运行记录已处理/已发布的话题"""
+
+    def __init__(self, db_path: str = 'dedupe.db', threshold: float = 0.5, ttl: int = 30 * 24 * 3600):
+        """
+        初始化签名索引
+
+        Args:
+            db_path: SQLite 数据库文件路径
+            threshold: Jaccard 相似度不低于该值视为重复
+            ttl: 话题保留时长（秒），<=0 表示永久保留
+        """
+        self.db_path = db_path
+        self.threshold = threshold
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS topics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                title TEXT,
+                url TEXT,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS topic_bands (
+                kind TEXT NOT NULL,
+                band_key INTEGER NOT NULL,
+                topic_id INTEGER NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_topic_bands_key ON topic_bands(kind, band_key)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_topic_bands_topic ON topic_bands(topic_id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_topics_created ON topics(created_at)')
+        self._conn.commit()
+
+    @staticmethod
+    def _pack(signature: Signature) -> bytes:
+        return struct.pack(f'>{NUM_PERM}Q', *signature)
+
+    @staticmethod
+    def _unpack(data: bytes) -> Signature:
+        return struct.unpack(f'>{NUM_PERM}Q', data)
+
+    def find(self, signature: Optional[Signature], kind: str = 'title') -> Optional[Dict]:
+        """
+        查找近似重复的已记录话题
+
+        Args:
+            signature: MinHash 签名
+            kind: 签名类型（title / content）
+
+        Returns:
+            Optional[Dict]: 最相似的记录（含 similarity），没有返回 None
+        """
+        if signature is None:
+            return None
+        keys = band_keys(signature)
+        since = time.time() - self.ttl if self.ttl > 0 else 0
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT DISTINCT t.signature, t.title, t.url, t.status, t.created_at '
+                'FROM topic_bands b JOIN topics t ON t.id = b.topic_id '
+                f'WHERE b.kind = ? AND b.band_key IN ({",".join("?" * len(keys))}) AND t.created_at >= ?',
+                [kind, *keys, since]
+            ).fetchall()
+
+        best = None
+        for row in rows:
+            score = similarity(signature, self._unpack(row[0]))
+            if score >= self.threshold and (best is None or score > best['similarity']):
+                best = {'title': row[1], 'url': row[2], 'status': row[3],
+                        'created_at': row[4], 'similarity': score}
+        return best
+
+    def add(self, signature: Optional[Signature], kind: str = 'title', title: str = '', url: str = '',
+            status: str = STATUS_PROCESSED):
+        """记录一个话题签名，并清理过期记录"""
+        if signature is None:
+            return
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO topics (kind, signature, title, url, status, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (kind, self._pack(signature), title, url, status, now)
+            )
+            self._conn.executemany(
+                'INSERT INTO topic_bands (kind, band_key, topic_id) VALUES (?, ?, ?)',
+                [(kind, key, cursor.lastrowid) for key in band_keys(signature)]
+            )
+            if self.ttl > 0:
+                expired = now - self.ttl
+                self._conn.execute(
+                    'DELETE FROM topic_bands WHERE topic_id IN (SELECT id FROM topics WHERE created_at < ?)',
+                    (expired,)
+                )
+                self._conn.execute('DELETE FROM topics WHERE created_at < ?', (expired,))
+            self._conn.commit()
+
+    def find_text(self, text: str, kind: str = 'title') -> Optional[Dict]:
+        """按文本查找近似重复的已记录话题"""
+        return self.find(minhash(text, NGRAM.get(kind, 2)), kind)
+
+    def add_text(self, text: str, kind: str = 'title', title: str = '', url: str = '',
+                 status: str = STATUS_PROCESSED):
+        """按文本记录话题签名"""
+        self.add(minhash(text, NGRAM.get(kind, 2)), kind, title, url, status)
+
+    def stats(self) -> Dict:
+        """各类型/状态的话题数"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT kind, status, COUNT(*) FROM topics GROUP BY kind, status'
+            ).fetchall()
+        return {f'{kind}:{status}': count for kind, status, count in rows}
@@ -2,42 +2,119 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
 import requests
-import tempfile
-import hashlib
 from dotenv import load_dotenv
-import markdown
 import re
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 
 load_dotenv()
-from wechat_sdk import WeChatAPI
+from wechat_sdk import MAX_DRAFT_ARTICLES
+from wechat_accounts import AccountPool, DailyQuotaStore, DEFAULT_ACCOUNT, QuotaExceededError, load_accounts_config
+from token_store import create_token_store
+from upload_cache import UploadCache, HashingReader, sha256_bytes, sha256_file
+from image_prep import MEDIA_LIMITS, PROBE_BYTES, needs_preparation, prepare_image
+from job_queue import JobQueue
+from publish_tracker import PublishTracker
+from idempotency import IdempotencyStore, derive_idempotency_key
+from wechat_styler import THEMES, MarkdownRenderer, load_theme
+from sse_parser import parse_coze_sse_text
 
 app = Flask(__name__)
 CORS(app)
 
-wechat = WeChatAPI(
-    app_id=os.getenv('WEIXIN_APP_ID'),
-    app_secret=os.getenv('WEIXIN_APP_SECRET')
+# 公众号账号池：WEIXIN_APP_ID/WEIXIN_APP_SECRET 为默认账号，WEIXIN_ACCOUNTS（JSON 或 JSON 文件路径）配置更多账号，
+# 请求中用 account / accounts 字段选择账号；所有账号共用一个连接池，大小应不小于图片并发数。
+# 令牌存储 WECHAT_TOKEN_STORE：file:/path（同机多进程共享，默认）、redis://...（多机共享）或 memory
+accounts = AccountPool.from_config(
+    load_accounts_config(os.getenv('WEIXIN_ACCOUNTS'), os.getenv('WEIXIN_APP_ID'), os.getenv('WEIXIN_APP_SECRET')),
+    token_store=create_token_store(os.getenv('WECHAT_TOKEN_STORE', 'file:.wechat_token.json')),
+    pool_size=int(os.getenv('WECHAT_POOL_SIZE', '20')),
+    keep_alive=os.getenv('WECHAT_KEEP_ALIVE', '1').lower() in ('1', 'true', 'yes'),
+    per_minute=float(os.getenv('WECHAT_RATE_PER_MINUTE', '0')),
+    daily_quotas=json.loads(os.getenv('WECHAT_DAILY_QUOTAS', '{}')),
+    quota_store=DailyQuotaStore(os.getenv('WECHAT_QUOTA_PATH', 'wechat_quota.db')),
+    connect_timeout=float(os.getenv('WECHAT_CONNECT_TIMEOUT', '5')),
+    read_timeout=float(os.getenv('WECHAT_READ_TIMEOUT', '30')),
+    upload_timeout=float(os.getenv('WECHAT_UPLOAD_TIMEOUT', '120'))
 )
 
-def download_image(url):
-    """下载图片到临时文件"""
+# 图片并发处理配置：总并发数 & 单个域名的最大并发数
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '8'))
+IMAGE_PER_HOST_LIMIT = int(os.getenv('IMAGE_PER_HOST_LIMIT', '4'))
+# 超过该大小（字节）的图片不进内存，直接流式转发到微信
+IMAGE_STREAM_THRESHOLD = int(os.getenv('IMAGE_STREAM_THRESHOLD', str(2 * 1024 * 1024)))
+
+# 上传前图片预处理（需要 Pillow）：识别真实格式、转码、超宽缩小、按字节预算压缩；
+# 封面另受微信缩略图限制（JPG、64KB）。不超过 IMAGE_PREP_MAX_SOURCE 的图片读入内存预处理，更大的仍流式转发；
+# 超过 IMAGE_STREAM_THRESHOLD 的先只读文件头，无需改动（如未超出微信上限的动图）时同样流式转发
+IMAGE_PREPROCESS = os.getenv('IMAGE_PREPROCESS', '1').lower() in ('1', 'true', 'yes')
+IMAGE_MAX_WIDTH = int(os.getenv('IMAGE_MAX_WIDTH', '1080'))
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', str(2 * 1024 * 1024)))
+THUMB_MAX_WIDTH = int(os.getenv('THUMB_MAX_WIDTH', '900'))
+THUMB_MAX_BYTES = int(os.getenv('THUMB_MAX_BYTES', str(64 * 1024)))
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '85'))
+IMAGE_PREP_MAX_SOURCE = int(os.getenv('IMAGE_PREP_MAX_SOURCE', str(20 * 1024 * 1024)))
+
+# 文章样式主题：内置主题名或JSON主题文件路径。主题文件只能通过环境变量在启动时加载，
+# 请求中的 theme 字段只能选择已注册的主题名
+WECHAT_THEME = os.getenv('WECHAT_THEME', 'default')
+if WECHAT_THEME not in THEMES:
+    THEMES[WECHAT_THEME] = load_theme(WECHAT_THEME)
+
+# Markdown渲染器：复用转换器实例，并缓存渲染结果
+markdown_renderer = MarkdownRenderer(
+    extensions=[
+        'extra',           # 支持表格、代码块等
+        'codehilite',      # 代码高亮
+        'fenced_code',     # 围栏代码块
+        'tables',          # 表格支持
+    ],
+    max_entries=int(os.getenv('RENDER_CACHE_SIZE', '256'))
+)
+
+# 素材上传缓存：相同URL或相同内容的图片只上传一次
+upload_cache = UploadCache(
+    db_path=os.getenv('UPLOAD_CACHE_PATH', 'upload_cache.db'),
+    ttl=int(os.getenv('UPLOAD_CACHE_TTL', str(30 * 24 * 3600))),
+    max_entries=int(os.getenv('UPLOAD_CACHE_MAX_ENTRIES', '5000'))
+)
+
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+def host_slot(url, scope=''):
+    """返回URL所在域名的并发信号量，用于限制对同一域名的并发请求数（scope 区分账号，各账号互不占用）"""
+    host = urlparse(url).netloc.lower()
+    if scope:
+        host = f'{scope}@{host}'
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(max(1, IMAGE_PER_HOST_LIMIT))
+            _host_semaphores[host] = semaphore
+        return semaphore
+
+def open_image_stream(url):
+    """以流式方式请求图片，返回响应对象（调用方负责关闭），失败返回None"""
     try:
-        resp = requests.get(url, timeout=30)
+        resp = requests.get(url, timeout=30, stream=True)
         if resp.status_code == 200:
-            url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
-            ext = url.split('.')[-1].split('?')[0]
-            if ext not in ['jpg', 'jpeg', 'png', 'gif']:
-                ext = 'jpg'
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{ext}')
-            temp_file.write(resp.content)
-            temp_file.close()
-            return temp_file.name
+            return resp
+        resp.close()
         return None
     except Exception as e:
         print(f"下载图片失败: {url[:60]}, 错误: {e}")
         return None
 
+def image_filename(url):
+    """根据URL推断上传文件名"""
+    ext = url.split('.')[-1].split('?')[0].lower()
+    if ext not in ['jpg', 'jpeg', 'png', 'gif']:
+        ext = 'jpg'
+    return f'image.{ext}'
+
 def extract_image_urls_from_markdown(md_content):
     """从markdown中提取所有图片URL"""
     # 匹配 ![alt](url) 格式
@@ -46,25 +123,143 @@ def extract_image_urls_from_markdown(md_content):
     # 返回 [(alt_text, url), ...]
     return matches
 
-def upload_image_to_wechat(image_url):
-    """下载图片并上传到微信，返回微信图片URL"""
-    try:
-        # 1. 下载图片
-        local_path = download_image(image_url)
-        if not local_path:
-            return None
+def cache_account(account):
+    """上传缓存中的账号名（素材只在所属公众号内有效）；默认账号沿用原有缓存条目"""
+    return '' if account.name == DEFAULT_ACCOUNT else account.name
 
-        # 2. 上传到微信作为永久素材
-        result = wechat.upload_media(local_path, 'image')
+def should_preprocess(media_type, length):
+    """该素材是否读入内存做预处理（length 为 0 表示长度未知）"""
+    return IMAGE_PREPROCESS and media_type in MEDIA_LIMITS and length <= IMAGE_PREP_MAX_SOURCE
 
-        # 3. 删除临时文件
-        try:
-            os.remove(local_path)
-        except:
-            pass
+def prep_settings(media_type):
+    """该素材类型预处理用的 (最大宽度, 字节预算)"""
+    if media_type == 'thumb':
+        return THUMB_MAX_WIDTH, THUMB_MAX_BYTES
+    return IMAGE_MAX_WIDTH, IMAGE_MAX_BYTES
 
-        # 4. 返回微信图片URL
-        if result.get('success'):
+def preprocess_image(data, media_type, filename=None):
+    """上传前预处理图片，返回 (字节, 文件名, Content-Type)；无法处理时原样上传"""
+    try:
+        prepared = prepare_image(data, media_type, *prep_settings(media_type), IMAGE_QUALITY)
+    except ValueError as e:
+        print(f"    图片预处理失败，原样上传: {str(e)[:50]}")
+        return data, filename, None
+    if prepared.converted:
+        print(f"    图片预处理: {len(data)} -> {len(prepared.data)} 字节 ({prepared.width}x{prepared.height})")
+    return prepared.data, prepared.filename(filename), prepared.content_type
+
+def upload_media_cached(media, media_type, account, source_url=None, filename=None):
+    """上传本地文件或字节内容到微信（按原始内容哈希去重，未命中时先预处理），返回上传结果"""
+    if isinstance(media, str):
+        content_hash = sha256_file(media)
+    else:
+        content_hash = sha256_bytes(media)
+    scope = cache_account(account)
+    cached = upload_cache.get_by_hash(content_hash, media_type, scope)
+    if cached:
+        # 同一内容换了URL，补充URL索引
+        if source_url:
+            upload_cache.put(media_type, cached['media_id'], cached['url'], source_url=source_url, account=scope)
+        return cached
+
+    content_type = None
+    if isinstance(media, str) and should_preprocess(media_type, os.path.getsize(media)):
+        filename = filename or os.path.basename(media)
+        with open(media, 'rb') as f:
+            media = f.read()
+    if not isinstance(media, str) and should_preprocess(media_type, len(media)):
+        media, filename, content_type = preprocess_image(media, media_type, filename)
+
+    # 上传到微信作为永久素材（按账号+微信API域名限流）
+    with host_slot(account.api.base_url, account.name):
+        result = account.api.upload_media(media, media_type, filename=filename, content_type=content_type)
+
+    if result.get('success'):
+        upload_cache.put(
+            media_type, result.get('media_id'), result.get('url', ''),
+            source_url=source_url, content_hash=content_hash, account=scope
+        )
+    return result
+
+def memory_limit(media_type):
+    """下载时最多读入内存的字节数：需要预处理的图片放宽到 IMAGE_PREP_MAX_SOURCE"""
+    if should_preprocess(media_type, 0):
+        return max(IMAGE_STREAM_THRESHOLD, IMAGE_PREP_MAX_SOURCE)
+    return IMAGE_STREAM_THRESHOLD
+
+def read_head(resp, size):
+    """从未解码的响应流读取开头最多 size 字节（用于探测格式和尺寸）"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = resp.raw.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+def read_limited(resp, limit):
+    """读取响应体，超过 limit 字节时抛出异常（不会把超大响应整个读进内存）"""
+    chunks = []
+    size = 0
+    for chunk in resp.iter_content(chunk_size=64 * 1024):
+        size += len(chunk)
+        if size > limit:
+            raise ValueError(f'图片超过 {limit} 字节: {resp.url[:60]}')
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+def upload_url_cached(source_url, media_type, account):
+    """下载远程图片并上传到微信（按URL与内容哈希去重），返回上传结果"""
+    cached = upload_cache.get_by_url(source_url, media_type, cache_account(account))
+    if cached:
+        return cached
+
+    # 请求图片（按来源域名限流，槽位一直占用到响应体读完或转发完），不写临时文件
+    filename = image_filename(source_url)
+    with host_slot(source_url):
+        resp = open_image_stream(source_url)
+        if resp is None:
+            return None
+        with resp:
+            length = int(resp.headers.get('Content-Length') or 0)
+            limit = memory_limit(media_type)
+            encoded = resp.headers.get('Content-Encoding')
+            head = b''
+            if IMAGE_STREAM_THRESHOLD < length <= limit and not encoded:
+                # 较大的图先只读文件头：无需改动（如未超限的动图）时仍流式转发，不必整个读入内存解码
+                head = read_head(resp, PROBE_BYTES)
+                stream = not needs_preparation(head, length, media_type, *prep_settings(media_type))
+            else:
+                stream = length > limit and not encoded
+            if not stream:
+                # 小图、需要预处理的图和长度未知的响应读入内存（有上限），上传前可按内容哈希去重
+                data = head + read_limited(resp, limit - len(head))
+            else:
+                # 大图直接从响应流转发到微信，边传边计算哈希
+                data = None
+                reader = HashingReader(resp.raw, length=length, prefix=head)
+                with host_slot(account.api.base_url, account.name):
+                    result = account.api.upload_media(reader, media_type, filename=filename)
+
+    if data is not None:
+        return upload_media_cached(data, media_type, account, source_url=source_url, filename=filename)
+
+    if result.get('success'):
+        upload_cache.put(
+            media_type, result.get('media_id'), result.get('url', ''),
+            source_url=source_url, content_hash=reader.hexdigest(), account=cache_account(account)
+        )
+    return result
+
+def upload_image_to_wechat(image_url, account):
+    """下载图片并上传到微信，返回微信图片URL"""
+    try:
+        result = upload_url_cached(image_url, 'image', account)
+
+        # 返回微信图片URL
+        if result and result.get('success'):
             # 微信返回的url字段
             return result.get('url', '')
         return None
@@ -73,8 +268,41 @@ def upload_image_to_wechat(image_url):
         print(f"    上传图片失败: {str(e)[:50]}")
         return None
 
-def process_markdown_images(md_content):
-    """处理markdown中的图片：下载并上传到微信，替换URL"""
+def upload_cover(cover_url, account):
+    """上传封面图，返回 thumb_media_id（失败返回空字符串）"""
+    try:
+        cover_result = upload_url_cached(cover_url, 'thumb', account)
+    except Exception as e:
+        print(f"    上传封面失败: {str(e)[:50]}")
+        return ''
+    if cover_result and cover_result.get('success'):
+        print(f"  封面图上传成功{'（缓存）' if cover_result.get('cached') else ''}")
+        return cover_result['media_id']
+    return ''
+
+def upload_images_and_covers(account, image_urls, cover_urls=()):
+    """
+    图片/封面共用一个并发上传阶段（同一URL只处理一次）
+
+    Returns:
+        (dict, dict): {图片URL: 微信图片URL或None}, {封面URL: thumb_media_id或''}
+    """
+    unique_images = list(dict.fromkeys(image_urls))
+    unique_covers = list(dict.fromkeys(cover_urls))
+    total = len(unique_images) + len(unique_covers)
+    if not total:
+        return {}, {}
+
+    workers = max(1, min(IMAGE_WORKERS, total))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image') as executor:
+        image_futures = [executor.submit(upload_image_to_wechat, url, account) for url in unique_images]
+        cover_futures = [executor.submit(upload_cover, url, account) for url in unique_covers]
+        uploaded = {url: future.result() for url, future in zip(unique_images, image_futures)}
+        covers = {url: future.result() for url, future in zip(unique_covers, cover_futures)}
+    return uploaded, covers
+
+def process_markdown_images(md_content, account, uploaded=None):
+    """处理markdown中的图片：下载并上传到微信，替换URL（uploaded 为已上传结果时直接替换）"""
     if not md_content or '![' not in md_content:
         return md_content
 
@@ -84,14 +312,16 @@ def process_markdown_images(md_content):
     if not image_matches:
         return md_content
 
-    print(f"  发现 {len(image_matches)} 张图片，正在上传到微信...")
+    if uploaded is None:
+        print(f"  发现 {len(image_matches)} 张图片，正在上传到微信...")
+        # 并发下载+上传，同一URL只处理一次
+        uploaded, _ = upload_images_and_covers(account, (url for _, url in image_matches))
 
     processed_content = md_content
     success_count = 0
 
     for alt_text, original_url in image_matches:
-        # 上传到微信
-        wechat_url = upload_image_to_wechat(original_url)
+        wechat_url = uploaded.get(original_url)
 
         if wechat_url:
             # 替换URL
@@ -106,264 +336,568 @@ def process_markdown_images(md_content):
     print(f"  图片处理完成: {success_count}/{len(image_matches)} 成功")
     return processed_content
 
-def convert_markdown_to_wechat_html(md_content):
-    """将Markdown转换为微信公众号格式的HTML"""
+def check_theme(theme):
+    """请求中的主题必须是已注册的主题名（不接受文件路径），否则抛出 ValueError"""
+    if theme and theme not in THEMES:
+        raise ValueError(f'未知主题: {theme}')
+
+def convert_markdown_to_wechat_html(md_content, theme=None):
+    """将Markdown转换为微信公众号格式的HTML（相同内容+主题直接命中渲染缓存）"""
     if not md_content:
         return md_content
+    check_theme(theme)
 
-    # 配置markdown转换器，启用常用扩展
-    html = markdown.markdown(
-        md_content,
-        extensions=[
-            'extra',           # 支持表格、代码块等
-            'codehilite',      # 代码高亮
-            'fenced_code',     # 围栏代码块
-            'tables',          # 表格支持
-        ]
-    )
-
-    # 为微信公众号添加样式
-    html = f'''
-<section style="margin: 0; padding: 16px; font-family: -apple-system, 'PingFang SC', 'Microsoft YaHei', sans-serif; line-height: 1.75; color: #333;">
-{html}
-</section>
-'''
-
-    # 优化图片样式
-    html = re.sub(
-        r'<img\s+([^>]*?)>',
-        r'<img \1 style="max-width: 100%; height: auto; display: block; margin: 20px auto; border-radius: 4px;">',
-        html
-    )
-
-    # 优化段落样式
-    html = re.sub(
-        r'<p>',
-        r'<p style="margin: 16px 0; text-align: justify; font-size: 15px; line-height: 1.8;">',
-        html
-    )
-
-    # 优化标题样式 - 更醒目的样式
-    html = re.sub(
-        r'<h2>([^<]+)</h2>',
-        r'<h2 style="font-size: 22px; font-weight: bold; margin: 28px 0 18px; padding: 14px 20px; background-color: #4a6cf7; color: #ffffff; text-align: center; letter-spacing: 1px;">\1</h2>',
-        html
-    )
-    html = re.sub(
-        r'<h3>([^<]+)</h3>',
-        r'<h3 style="font-size: 19px; font-weight: bold; margin: 24px 0 14px; padding: 10px 0 10px 16px; color: #2d3748; border-left: 5px solid #4a6cf7; background-color: #f7fafc;">\1</h3>',
-        html
-    )
-
-    # 优化代码块样式
-    html = re.sub(
-        r'<code>',
-        r'<code style="padding: 2px 6px; background: #f5f5f5; border-radius: 3px; font-family: Consolas, Monaco, monospace; font-size: 14px;">',
-        html
-    )
-    html = re.sub(
-        r'<pre>',
-        r'<pre style="background: #f8f8f8; padding: 16px; border-radius: 4px; overflow-x: auto; margin: 16px 0;">',
-        html
-    )
-
-    # 优化引用样式
-    html = re.sub(
-        r'<blockquote>',
-        r'<blockquote style="border-left: 4px solid #5b7be8; padding-left: 16px; margin: 16px 0; color: #666; background-color: #f7f9fa; padding: 12px 16px;">',
-        html
-    )
-
-    # 优化列表样式
-    html = re.sub(
-        r'<ul>',
-        r'<ul style="margin: 16px 0; padding-left: 24px;">',
-        html
-    )
-    html = re.sub(
-        r'<li>',
-        r'<li style="margin: 8px 0; line-height: 1.8;">',
-        html
-    )
-
-    # 优化强调文字（加粗）
-    html = re.sub(
-        r'<strong>',
-        r'<strong style="color: #5b7be8; font-weight: bold;">',
-        html
-    )
-
-    return html
+    # 按主题表一次性注入微信公众号内联样式（主题见 wechat_styler.py，可用 WECHAT_THEME 指定JSON主题文件）
+    return markdown_renderer.render(md_content, theme or WECHAT_THEME)
 
 def parse_coze_sse_output(data):
     """解析COZE的SSE流式输出"""
-    # 如果data是字符串（SSE格式）
-    if isinstance(data, str) and 'event' in data:
-        # 查找Message事件 - 支持多种格式
-        # 格式1: event: Message\ndata: {...}
-        # 格式2: event:Message\ndata:{...}
-        patterns = [
-            r'event:\s*Message\s*\ndata:\s*(\{[^\n]+\})',
-            r'event: Message\ndata: (\{.*?\})\n',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, data, re.DOTALL)
-            if match:
-                try:
-                    message_data = json.loads(match.group(1))
-                    # content是双重JSON编码
-                    content_str = message_data.get('content', '{}')
-                    content_data = json.loads(content_str)
-                    return {
-                        'title': content_data.get('title', ''),
-                        'content': content_data.get('output', ''),
-                        'cover_url': content_data.get('cover', '')
-                    }
-                except json.JSONDecodeError:
-                    continue
-    return None
+    # 如果data是字符串（SSE格式），取第一条Message事件；content是双重JSON编码，由解析器处理
+    content_data = parse_coze_sse_text(data)
+    if content_data is None:
+        return None
+    return {
+        'title': content_data.get('title', ''),
+        'content': content_data.get('output', ''),
+        'cover_url': content_data.get('cover', '')
+    }
+
+def parse_publish_payload(raw_data):
+    """解析发布请求（N8N数组 / COZE SSE / 标准JSON），返回 title, content, cover_url, thumb_media_id"""
+    print(f"1. raw_data类型: {type(raw_data)}", flush=True)
+
+    # 第一步：处理数组
+    if isinstance(raw_data, list):
+        print(f"2. 是数组，长度: {len(raw_data)}", flush=True)
+        if len(raw_data) > 0:
+            data = raw_data[0]
+        else:
+            data = {}
+    else:
+        data = raw_data
+
+    print(f"3. data类型: {type(data)}", flush=True)
+
+    # 第二步：确保是字典
+    if not isinstance(data, dict):
+        print(f"4. 不是字典，转换中...", flush=True)
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except:
+                data = {'content': data}
+        else:
+            data = {}
+
+    print(f"5. 最终data类型: {type(data)}, 键: {list(data.keys()) if isinstance(data, dict) else 'N/A'}", flush=True)
+
+    # 第三步：获取SSE文本
+    sse_text = ''
+    if isinstance(data, dict):
+        sse_text = data.get('data', '') or data.get('body', '')
+    print(f"6. SSE文本长度: {len(sse_text)}", flush=True)
+
+    # 第四步：解析COZE输出
+    coze_parsed = parse_coze_sse_output(sse_text)
+    if coze_parsed:
+        title = coze_parsed['title']
+        content = coze_parsed['content']
+        cover_url = coze_parsed['cover_url']
+        thumb_media_id = ''
+        print(f"7. COZE解析成功: {title[:20] if title else 'N/A'}...", flush=True)
+    else:
+        # 标准格式
+        title = data.get('title', '') if isinstance(data, dict) else ''
+        content = (data.get('content', '') or data.get('output', '')) if isinstance(data, dict) else ''
+        cover_url = (data.get('cover_url', '') or data.get('cover', '')) if isinstance(data, dict) else ''
+        thumb_media_id = data.get('thumb_media_id', '') if isinstance(data, dict) else ''
+        print(f"7. 使用标准格式: {title[:20] if title else 'N/A'}...", flush=True)
+
+    return {
+        'title': title,
+        'content': content,
+        'cover_url': cover_url,
+        'thumb_media_id': thumb_media_id,
+        'theme': data.get('theme', '') if isinstance(data, dict) else '',
+        'account': data.get('account', '') if isinstance(data, dict) else '',
+        'accounts': data.get('accounts') if isinstance(data, dict) else None
+    }
+
+def is_markdown_content(content):
+    """判断内容是否为Markdown（含图片语法，或多个标题且开头不是HTML）"""
+    return bool(content) and ('![' in content or (content.count('#') > 2 and '<' not in content[:100]))
+
+def render_article_content(content, account, theme=None, uploaded=None):
+    """把文章内容处理成微信HTML：Markdown 上传图片并渲染，HTML 与纯文本原样使用"""
+    is_html = content and ('<p>' in content or '<div>' in content or '<section>' in content)
+
+    if is_markdown_content(content):
+        # Markdown内容需要转换
+        print(f"  检测到Markdown格式")
+
+        # 第一步：处理markdown中的图片（上传到微信并替换URL）
+        if '![' in content:
+            content = process_markdown_images(content, account, uploaded)
+
+        # 第二步：转换markdown为HTML
+        print(f"  正在转换为微信HTML...")
+        content = convert_markdown_to_wechat_html(content, theme)
+        print(f"  转换后长度: {len(content)} 字符")
+    elif is_html:
+        # HTML内容，直接使用（COZE已经生成了完整样式）
+        print(f"  检测到HTML格式，直接使用COZE样式")
+    else:
+        # 纯文本，简单包装
+        print(f"  纯文本内容")
+    return content
+
+def default_thumb_media_id(account):
+    """默认封面（cover.jpg）的 thumb_media_id，没有默认封面时返回空字符串"""
+    if not os.path.exists('cover.jpg'):
+        return ''
+    print(f"  使用默认封面图")
+    cover_result = upload_media_cached('cover.jpg', 'thumb', account)
+    return cover_result['media_id'] if cover_result.get('success') else ''
+
+def build_draft_article(title, content, thumb_media_id):
+    """构造草稿中的一篇文章"""
+    return {
+        'title': title,
+        'content': content,
+        'digest': title[:50] if title else '',
+        'thumb_media_id': thumb_media_id,
+        'show_cover_pic': 1 if thumb_media_id else 0,
+        'need_open_comment': 0,
+        'only_fans_can_comment': 0
+    }
+
+def target_accounts(payload):
+    """请求要发布到的账号（accounts: 账号名列表或 'all'；account: 单个账号；都没有时为默认账号）"""
+    return accounts.resolve(payload.get('accounts') or payload.get('account') or None)
+
+def publish_payload(payload, key=None):
+    """
+    处理已解析的发布内容，发布到一个或多个账号（多个账号并行，互不阻塞），返回结果字典
+
+    多账号时每个账号另有幂等记录（key:account:账号名），部分账号失败后重试只会重新发布失败的账号
+    """
+    publish = publish_batch_payload if 'articles' in payload else publish_article_payload
+    targets = target_accounts(payload)
+    if len(targets) == 1:
+        return {**publish_to_account(publish, payload, targets[0]), 'account': targets[0].name}
+
+    def run(account):
+        account_key = f'{key}:account:{account.name}' if key else None
+        existing = idempotency.begin(account_key) if account_key else None
+        if existing:
+            if existing.get('result'):
+                return {**existing['result'], 'idempotent_replay': True}
+            return {'success': False, 'error': 'duplicate request in progress'}
+        result = None
+        try:
+            result = publish_to_account(publish, payload, account)
+        finally:
+            if account_key:
+                idempotency.complete(account_key, result)
+        return result
+
+    results = accounts.fan_out(targets, run)
+    succeeded = sum(1 for result in results.values() if result.get('success'))
+    return {
+        'success': succeeded == len(results),
+        'accounts': results,
+        'message': f'{succeeded}/{len(results)} 个账号发布成功'
+    }
+
+def publish_to_account(publish, payload, account):
+    """发布到一个账号；账号配额用完时返回失败结果（带 retry_after）而不是抛出异常"""
+    try:
+        return publish(payload, account)
+    except QuotaExceededError as e:
+        print(f"  账号 {account.name} 限流: {e}")
+        return {'success': False, 'error': str(e), 'retry_after': e.retry_after}
+
+def publish_article_payload(payload, account):
+    """单篇发布到一个账号（图片/封面上传 -> 创建草稿）"""
+    title = payload.get('title', '')
+    content = payload.get('content', '')
+    cover_url = payload.get('cover_url', '')
+    thumb_media_id = payload.get('thumb_media_id', '')
+
+    print(f"\n收到发布请求: {title} (账号: {account.name})")
+    print(f"  内容长度: {len(content)} 字符")
+
+    content = render_article_content(content, account, payload.get('theme'))
+
+    # 处理封面图：优先使用cover_url
+    if cover_url and not thumb_media_id:
+        print(f"  下载封面图: {cover_url[:60]}...")
+        thumb_media_id = upload_cover(cover_url, account)
+
+    # 如果没有提供封面，使用默认cover.jpg
+    if not thumb_media_id:
+        thumb_media_id = default_thumb_media_id(account)
+
+    articles = [build_draft_article(title, content, thumb_media_id)]
+
+    print(f"  发布到微信...")
+    result = account.api.create_draft(articles)
+
+    if result.get('success'):
+        print(f"  成功: {result.get('media_id')[:30]}...\n")
+        return {
+            'success': True,
+            'media_id': result.get('media_id'),
+            'message': 'Draft published successfully'
+        }
+    else:
+        print(f"  失败: {result.get('error')}\n")
+        return {
+            'success': False,
+            'error': result.get('error')
+        }
+
+def parse_batch_payload(raw_data):
+    """解析批量发布请求：{"articles": [...], "publish": true} 或文章数组，每篇文章的格式同单篇发布"""
+    if isinstance(raw_data, list):
+        raw_data = {'articles': raw_data}
+    if not isinstance(raw_data, dict) or not isinstance(raw_data.get('articles'), list):
+        raise ValueError('articles must be a list')
+
+    articles = [parse_publish_payload(item) for item in raw_data['articles']]
+    if not articles:
+        raise ValueError('articles is empty')
+    for article in articles:
+        if not article.get('theme'):
+            article['theme'] = raw_data.get('theme', '')
+
+    publish = raw_data.get('publish', True)
+    if isinstance(publish, str):
+        publish = publish.lower() in ('1', 'true', 'yes')
+    return {
+        'articles': articles,
+        'publish': bool(publish),
+        'group_size': int(raw_data.get('group_size') or MAX_DRAFT_ARTICLES),
+        'webhook': raw_data.get('webhook', ''),
+        'account': raw_data.get('account', ''),
+        'accounts': raw_data.get('accounts')
+    }
+
+def publish_batch_payload(payload, account):
+    """
+    批量发布：所有文章的图片和封面在一个并发阶段里上传，
+    之后按顺序每 8 篇合成一个多图文草稿，每组只调用一次 create_draft / publish_article
+    """
+    items = payload['articles']
+    print(f"\n收到批量发布请求: {len(items)} 篇 (账号: {account.name})")
+
+    # 第一步：收集所有文章的图片与封面，统一上传
+    image_urls = []
+    for item in items:
+        if is_markdown_content(item.get('content')):
+            image_urls.extend(url for _, url in extract_image_urls_from_markdown(item['content']))
+    cover_urls = [item['cover_url'] for item in items if item.get('cover_url') and not item.get('thumb_media_id')]
+    print(f"  共 {len(set(image_urls))} 张图片、{len(set(cover_urls))} 张封面，正在上传到微信...")
+    uploaded, covers = upload_images_and_covers(account, image_urls, cover_urls)
+
+    # 第二步：逐篇渲染（图片URL直接替换为已上传的结果）
+    default_thumb = None
+    articles = []
+    for item in items:
+        title = item.get('title', '')
+        print(f"  处理: {title}")
+        content = render_article_content(item.get('content', ''), account, item.get('theme'), uploaded)
+        thumb_media_id = item.get('thumb_media_id') or covers.get(item.get('cover_url'), '')
+        if not thumb_media_id:
+            if default_thumb is None:
+                default_thumb = default_thumb_media_id(account)
+            thumb_media_id = default_thumb
+        articles.append(build_draft_article(title, content, thumb_media_id))
+
+    # 第三步：分组创建草稿并提交发布
+    print(f"  发布到微信...")
+    result = account.api.batch_publish(articles, group_size=payload.get('group_size', MAX_DRAFT_ARTICLES),
+                                  publish=payload.get('publish', True))
+    print(f"  {result['message']}\n")
+
+    # 第四步：登记发布状态跟踪，到达终态后通过 webhook 通知
+    for group in result['groups']:
+        if group.get('publish_id'):
+            track_publish(group['publish_id'], payload.get('webhook'),
+                          {'media_id': group['media_id'], 'titles': group['titles']}, account.name)
+            group['status_url'] = f"/publish-status/{group['publish_id']}"
+    return result
+
+def track_publish(publish_id, webhook=None, context=None, account=''):
+    """登记发布状态跟踪（未指定 webhook 时使用 PUBLISH_WEBHOOK）"""
+    publish_tracker.track(publish_id, webhook=webhook or PUBLISH_WEBHOOK or None, context=context, account=account)
+
+def run_publish_job(payload):
+    """执行发布并记录幂等结果（同步请求与后台任务共用）"""
+    key = payload.pop('_idempotency_key', None)
+    try:
+        result = publish_payload(payload, key)
+    except Exception:
+        if key:
+            idempotency.complete(key, None)
+        raise
+    if key:
+        idempotency.complete(key, result)
+    return result
+
+def request_idempotency_key(payload):
+    """幂等键：优先使用 Idempotency-Key 请求头，否则由标题+内容计算（批量请求按全部文章计算）；非默认账号附加账号名"""
+    key = request.headers.get('Idempotency-Key') or request.headers.get('X-Idempotency-Key')
+    if key:
+        key = f'header:{key}'
+    elif 'articles' in payload:
+        key = derive_idempotency_key(
+            '\0'.join(article['title'] for article in payload['articles']),
+            '\0'.join(article['content'] for article in payload['articles'])
+        ) + f":batch:{int(payload['publish'])}"
+    else:
+        key = derive_idempotency_key(payload['title'], payload['content'])
+
+    names = [account.name for account in target_accounts(payload)]
+    if names != [DEFAULT_ACCOUNT]:
+        key += ':accounts:' + ','.join(sorted(names))
+    return key
+
+def replay_response(record):
+    """重复提交时返回首次发布的结果"""
+    if record.get('result'):
+        print(f"  重复提交，返回已有结果: {record['result'].get('media_id')}", flush=True)
+        return jsonify({**record['result'], 'idempotent_replay': True}), 200
+    job_id = record.get('job_id')
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/jobs/{job_id}',
+        'idempotent_replay': True
+    }), 202
+
+def wants_async():
+    """是否以异步任务方式处理请求：?async=1、Prefer: respond-async 或 PUBLISH_ASYNC=1"""
+    flag = request.args.get('async')
+    if flag is not None:
+        return flag.lower() in ('1', 'true', 'yes')
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        return True
+    return PUBLISH_ASYNC_DEFAULT
 
 @app.route('/publish-draft', methods=['POST'])
 def publish_draft():
-    import sys
     print("\n========== 收到请求 ==========", flush=True)
     try:
-        raw_data = request.json
-        print(f"1. raw_data类型: {type(raw_data)}", flush=True)
-
-        # 第一步：处理数组
-        if isinstance(raw_data, list):
-            print(f"2. 是数组，长度: {len(raw_data)}", flush=True)
-            if len(raw_data) > 0:
-                data = raw_data[0]
-            else:
-                data = {}
-        else:
-            data = raw_data
-
-        print(f"3. data类型: {type(data)}", flush=True)
-
-        # 第二步：确保是字典
-        if not isinstance(data, dict):
-            print(f"4. 不是字典，转换中...", flush=True)
-            if isinstance(data, str):
-                try:
-                    data = json.loads(data)
-                except:
-                    data = {'content': data}
-            else:
-                data = {}
-
-        print(f"5. 最终data类型: {type(data)}, 键: {list(data.keys()) if isinstance(data, dict) else 'N/A'}", flush=True)
-
-        # 第三步：获取SSE文本
-        sse_text = ''
-        if isinstance(data, dict):
-            sse_text = data.get('data', '') or data.get('body', '')
-        print(f"6. SSE文本长度: {len(sse_text)}", flush=True)
-
-        # 第四步：解析COZE输出
-        coze_parsed = parse_coze_sse_output(sse_text)
-        if coze_parsed:
-            title = coze_parsed['title']
-            content = coze_parsed['content']
-            cover_url = coze_parsed['cover_url']
-            thumb_media_id = ''
-            print(f"7. COZE解析成功: {title[:20] if title else 'N/A'}...", flush=True)
-        else:
-            # 标准格式
-            title = data.get('title', '') if isinstance(data, dict) else ''
-            content = (data.get('content', '') or data.get('output', '')) if isinstance(data, dict) else ''
-            cover_url = (data.get('cover_url', '') or data.get('cover', '')) if isinstance(data, dict) else ''
-            thumb_media_id = data.get('thumb_media_id', '') if isinstance(data, dict) else ''
-            print(f"7. 使用标准格式: {title[:20] if title else 'N/A'}...", flush=True)
-
-        print(f"\n收到发布请求: {title}")
-        print(f"  内容长度: {len(content)} 字符")
-
-        # 判断内容格式
-        is_markdown = content and ('![' in content or (content.count('#') > 2 and '<' not in content[:100]))
-        is_html = content and ('<p>' in content or '<div>' in content or '<section>' in content)
-
-        if is_markdown:
-            # Markdown内容需要转换
-            print(f"  检测到Markdown格式")
-
-            # 第一步：处理markdown中的图片（上传到微信并替换URL）
-            if '![' in content:
-                content = process_markdown_images(content)
-
-            # 第二步：转换markdown为HTML
-            print(f"  正在转换为微信HTML...")
-            content = convert_markdown_to_wechat_html(content)
-            print(f"  转换后长度: {len(content)} 字符")
-        elif is_html:
-            # HTML内容，直接使用（COZE已经生成了完整样式）
-            print(f"  检测到HTML格式，直接使用COZE样式")
-        else:
-            # 纯文本，简单包装
-            print(f"  纯文本内容")
-
-        # 处理封面图：优先使用cover_url
-        if cover_url and not thumb_media_id:
-            print(f"  下载封面图: {cover_url[:60]}...")
-            cover_path = download_image(cover_url)
-            if cover_path:
-                cover_result = wechat.upload_media(cover_path, 'thumb')
-                if cover_result.get('success'):
-                    thumb_media_id = cover_result['media_id']
-                    print(f"  封面图上传成功")
-                try:
-                    os.remove(cover_path)
-                except:
-                    pass
-
-        # 如果没有提供封面，使用默认cover.jpg
-        if not thumb_media_id and os.path.exists('cover.jpg'):
-            print(f"  使用默认封面图")
-            cover_result = wechat.upload_media('cover.jpg', 'thumb')
-            if cover_result.get('success'):
-                thumb_media_id = cover_result['media_id']
-
-        articles = [{
-            'title': title,
-            'content': content,
-            'digest': title[:50] if title else '',
-            'thumb_media_id': thumb_media_id,
-            'show_cover_pic': 1 if thumb_media_id else 0,
-            'need_open_comment': 0,
-            'only_fans_can_comment': 0
-        }]
-
-        print(f"  发布到微信...")
-        result = wechat.create_draft(articles)
-
-        if result.get('success'):
-            print(f"  成功: {result.get('media_id')[:30]}...\n")
-            return jsonify({
-                'success': True,
-                'media_id': result.get('media_id'),
-                'message': 'Draft published successfully'
-            })
-        else:
-            print(f"  失败: {result.get('error')}\n")
-            return jsonify({
-                'success': False,
-                'error': result.get('error')
-            }), 400
+        return submit_publish(parse_publish_payload(request.json))
+    except Exception as e:
+        print(f"  异常: {e}\n")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/publish-drafts', methods=['POST'])
+def publish_drafts():
+    """批量发布：多篇文章合并为多图文草稿（每个草稿最多 8 篇）"""
+    print("\n========== 收到批量请求 ==========", flush=True)
+    try:
+        payload = parse_batch_payload(request.json)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    try:
+        return submit_publish(payload)
     except Exception as e:
         print(f"  异常: {e}\n")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def submit_publish(payload):
+    """幂等检查后同步执行或加入任务队列（单篇与批量发布共用）"""
+    if request.args.get('account') and not payload.get('account'):
+        payload['account'] = request.args['account']
+    try:
+        target_accounts(payload)
+        # 主题和 webhook 在上传图片之前校验，不合法时直接返回 400
+        check_theme(payload.get('theme'))
+        for article in payload.get('articles', []):
+            check_theme(article.get('theme'))
+        publish_tracker.check_webhook(payload.get('webhook'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    is_async = wants_async()
+
+    # 幂等控制：窗口内重复提交直接返回首次结果，不再上传图片和创建草稿
+    key = request_idempotency_key(payload)
+    job_id = job_queue.new_job_id() if is_async else None
+    existing = idempotency.begin(key, job_id=job_id)
+    if existing and existing['status'] == 'pending' and not existing.get('job_id'):
+        # 同一内容正在被另一个同步请求处理（如客户端超时重试），等待其结果
+        existing = idempotency.wait(key, timeout=IDEMPOTENCY_WAIT) or idempotency.begin(key, job_id=job_id)
+        if existing and existing['status'] == 'pending':
+            return jsonify({'success': False, 'error': 'duplicate request in progress'}), 409
+    if existing:
+        return replay_response(existing)
+    payload['_idempotency_key'] = key
+
+    # 异步模式：写入任务队列后立即返回任务ID，由后台worker处理
+    if is_async:
+        job_queue.submit(payload, job_id=job_id)
+        print(f"  已加入任务队列: {job_id}", flush=True)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/jobs/{job_id}'
+        }), 202
+
+    result = run_publish_job(payload)
+    if result.get('success'):
+        return jsonify(result), 200
+    return jsonify(result), (429 if result.get('retry_after') else 400)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询异步发布任务的状态与结果"""
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'job not found'}), 404
+
+    result = job.get('result') or {}
+    return jsonify({
+        'success': True,
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'media_id': result.get('media_id'),
+        'result': job['result'],
+        'error': job['error'],
+        'attempts': job['attempts'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    })
+
+@app.route('/publish-status/<publish_id>', methods=['GET'])
+def get_publish_status(publish_id):
+    """查询发布状态跟踪记录（state: tracking / done / expired）"""
+    record = publish_tracker.get(publish_id)
+    if not record:
+        return jsonify({'success': False, 'error': 'publish_id not tracked'}), 404
+    return jsonify({'success': True, **record})
+
+@app.route('/publish-status', methods=['POST'])
+def track_publish_status():
+    """登记要跟踪的 publish_id：{"publish_id": "...", "account": "...", "webhook": "http://..."}"""
+    data = request.get_json(silent=True) or {}
+    publish_id = data.get('publish_id')
+    if not publish_id:
+        return jsonify({'success': False, 'error': 'publish_id is required'}), 400
+    try:
+        account = accounts.get(data.get('account'))
+        publish_tracker.check_webhook(data.get('webhook'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    track_publish(str(publish_id), data.get('webhook'), data.get('context'), account.name)
+    return jsonify({'success': True, 'publish_id': publish_id, 'status_url': f'/publish-status/{publish_id}'}), 202
+
+@app.route('/upload-cache', methods=['GET'])
+def upload_cache_stats():
+    return jsonify({'success': True, 'stats': upload_cache.stats()})
+
+@app.route('/upload-cache/invalidate', methods=['POST'])
+def invalidate_upload_cache():
+    """使上传缓存失效：支持 url / sha256 / media_id / type / account，或 all=true 清空"""
+    data = request.get_json(silent=True) or {}
+    if data.get('all'):
+        upload_cache.clear()
+        return jsonify({'success': True, 'deleted': 'all'})
+
+    deleted = upload_cache.invalidate(
+        source_url=data.get('url'),
+        content_hash=data.get('sha256'),
+        media_id=data.get('media_id'),
+        media_type=data.get('type'),
+        account=('' if data['account'] == DEFAULT_ACCOUNT else data['account']) if data.get('account') else None
+    )
+    return jsonify({'success': True, 'deleted': deleted})
+
+@app.route('/render-cache', methods=['GET'])
+def render_cache_stats():
+    return jsonify({'success': True, 'stats': markdown_renderer.stats()})
+
+@app.route('/accounts', methods=['GET'])
+def list_accounts():
+    """已配置的公众号账号"""
+    default = accounts.default.name if accounts.names() else None
+    return jsonify({
+        'success': True,
+        'accounts': [
+            {'name': name, 'app_id': accounts.get(name).app_id, 'default': name == default}
+            for name in accounts.names()
+        ]
+    })
+
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({'status': 'ok', 'service': 'WeChat Draft Publisher'})
 
+# 发布幂等记录：窗口内相同幂等键只发布一次
+IDEMPOTENCY_WAIT = float(os.getenv('IDEMPOTENCY_WAIT', '60'))
+idempotency = IdempotencyStore(
+    db_path=os.getenv('IDEMPOTENCY_PATH', 'idempotency.db'),
+    window=int(os.getenv('IDEMPOTENCY_WINDOW', str(24 * 3600))),
+    # 异步任务排队或执行期间，处理中记录一直有效
+    job_active=lambda job_id: job_queue.is_active(job_id)
+)
+
+# 异步发布任务队列（持久化到SQLite，重启后继续处理未完成任务）
+PUBLISH_ASYNC_DEFAULT = os.getenv('PUBLISH_ASYNC', '0').lower() in ('1', 'true', 'yes')
+job_queue = JobQueue(
+    run_publish_job,
+    db_path=os.getenv('JOB_QUEUE_PATH', 'jobs.db'),
+    workers=int(os.getenv('JOB_WORKERS', '2')),
+    max_attempts=int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+)
+
+# 发布状态跟踪：按递增间隔轮询 publish_id，结束后 POST 到 webhook（持久化到SQLite，重启后继续跟踪）
+# 请求中的 webhook 只能指向 PUBLISH_WEBHOOK_HOSTS（逗号分隔的 host 或 host:port）或 PUBLISH_WEBHOOK 所在主机
+PUBLISH_WEBHOOK = os.getenv('PUBLISH_WEBHOOK', '')
+PUBLISH_WEBHOOK_HOSTS = [host.strip() for host in os.getenv('PUBLISH_WEBHOOK_HOSTS', '').split(',') if host.strip()]
+if PUBLISH_WEBHOOK:
+    PUBLISH_WEBHOOK_HOSTS.append(urlparse(PUBLISH_WEBHOOK).netloc)
+publish_tracker = PublishTracker(
+    lambda name: accounts.get(name).api,
+    db_path=os.getenv('PUBLISH_TRACKER_PATH', 'publish_tracker.db'),
+    initial_interval=float(os.getenv('PUBLISH_TRACK_INTERVAL', '5')),
+    max_interval=float(os.getenv('PUBLISH_TRACK_MAX_INTERVAL', '300')),
+    workers=int(os.getenv('PUBLISH_TRACK_WORKERS', '4')),
+    webhook_hosts=PUBLISH_WEBHOOK_HOSTS
+)
+
+# 后台线程按进程启动：不在导入时启动（gunicorn --preload 时线程只存在于 master，fork 后丢失），
+# 而是每个进程收到第一个请求时启动；也可以在 gunicorn 的 post_fork 钩子里调用 start_background_workers()
+_workers_pid = None
+_workers_lock = threading.Lock()
+
+def start_background_workers():
+    """在当前进程启动任务队列 worker、发布状态跟踪和令牌主动刷新线程（每个进程只启动一次）"""
+    global _workers_pid
+    with _workers_lock:
+        if _workers_pid == os.getpid():
+            return
+        job_queue.start()
+        publish_tracker.start()
+        accounts.start_token_refreshers(ahead=float(os.getenv('WECHAT_TOKEN_REFRESH_AHEAD', '300')))
+        _workers_pid = os.getpid()
+
+@app.before_request
+def ensure_background_workers():
+    start_background_workers()
+
 if __name__ == '__main__':
     print("\nWeChat Draft API Server")
     print("Running on: http://localhost:8001")
     print("Endpoint: POST http://localhost:8001/publish-draft")
+    print("Batch:    POST http://localhost:8001/publish-drafts  (每个草稿最多 8 篇)")
+    print("Async:    POST http://localhost:8001/publish-draft?async=1  ->  GET /jobs/<job_id>")
+    print("Status:   GET  http://localhost:8001/publish-status/<publish_id>")
     print("\nReady for N8N workflow\n")
+    start_background_workers()
     app.run(host='0.0.0.0', port=8001, debug=False)
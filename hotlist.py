@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热榜采集
+可插拔的热榜源注册表 + 并发采集：所有源共用一个连接池同时请求，整体有截止时间，超时的源不影响其他源的结果
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import CachedSession, HTTPCache
+
+# 热榜聚合接口（未单独注册的源默认走这里）
+HOTLIST_API = 'https://top.miyucaicai.cn/api/s?id={source}'
+
+# 热榜源采集函数：fetcher(session, timeout) -> 热点列表
+Fetcher = Callable[[requests.Session, float], List[Dict]]
+
+SOURCE_REGISTRY: Dict[str, Fetcher] = {}
+
+
+def register_source(name: str) -> Callable[[Fetcher], Fetcher]:
+    """注册热榜源（装饰器）"""
+    def decorator(fetcher: Fetcher) -> Fetcher:
+        SOURCE_REGISTRY[name] = fetcher
+        return fetcher
+    return decorator
+
+
+def miyucaicai_fetcher(source_id: str) -> Fetcher:
+    """热榜聚合接口的采集函数"""
+    def fetch(session: requests.Session, timeout: float) -> List[Dict]:
+        resp = session.get(HOTLIST_API.format(source=source_id), timeout=timeout)
+        resp.raise_for_status()
+        return resp.json().get('items', [])
+    return fetch
+
+
+def get_fetcher(name: str) -> Fetcher:
+    """获取热榜源的采集函数"""
+    return SOURCE_REGISTRY.get(name) or miyucaicai_fetcher(name)
+
+
+def create_session(pool_size: int = 20, cache: Optional[HTTPCache] = None) -> requests.Session:
+    """
+    创建带连接池的会话，供所有热榜源复用
+
+    Args:
+        pool_size: 连接池大小
+        cache: HTTP 缓存，传入时 GET 请求走条件请求缓存
+    """
+    session = CachedSession(cache) if cache is not None else requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def collect_hotlists(sources: Iterable[str], session: Optional[requests.Session] = None,
+                     timeout: float = 15, deadline: float = 20,
+                     max_workers: int = 16) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """
+    并发采集多个热榜源
+
+    Args:
+        sources: 热榜源名称列表
+        session: 共享会话，默认新建带连接池的会话
+        timeout: 单个源的请求超时（秒）
+        deadline: 整个采集阶段的截止时间（秒），到时仍未返回的源记为超时
+        max_workers: 最大并发数
+
+    Returns:
+        Tuple[List[Dict], Dict[str, Dict]]: (按源顺序合并的热点列表, 各源采集情况)
+    """
+    sources = list(dict.fromkeys(sources))
+    if not sources:
+        return [], {}
+
+    session = session or create_session(max(len(sources), 1))
+    started = time.time()
+
+    def run(source: str) -> Tuple[List[Dict], float]:
+        source_started = time.time()
+        items = get_fetcher(source)(session, timeout)
+        return items, time.time() - source_started
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources))), thread_name_prefix='hotlist')
+    try:
+        futures = {source: executor.submit(run, source) for source in sources}
+        wait(futures.values(), timeout=deadline)
+    finally:
+        # 不等待超时的源，直接返回已完成的部分结果
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    all_items = []
+    report = {}
+    for source, future in futures.items():
+        if not future.done():
+            report[source] = {'ok': False, 'count': 0, 'error': f'超过截止时间 {deadline}s',
+                              'elapsed': round(time.time() - started, 3)}
+            continue
+        try:
+            items, elapsed = future.result()
+        except Exception as e:
+            report[source] = {'ok': False, 'count': 0, 'error': str(e),
+                              'elapsed': round(time.time() - started, 3)}
+            continue
+
+        for position, item in enumerate(items, 1):
+            item['_source'] = source
+            item['_rank'] = position
+        all_items.extend(items)
+        report[source] = {'ok': True, 'count': len(items), 'error': None, 'elapsed': round(elapsed, 3)}
+
+    return all_items, report
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式网页正文提取
+边下载边用 HTMLParser 分词，跳过脚本/样式/导航等模板区域，优先提取 article/main 等正文容器中的文本，够用即停止下载
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import List
+
+import requests
+
+# 内容整段跳过的标签
+SKIP_TAGS = {
+    'script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe', 'object',
+    'head', 'nav', 'header', 'footer', 'aside', 'form', 'button', 'select', 'textarea',
+}
+
+# 布局类的跳过标签：与模板类名一样，其中出现 article/main 时仍提取正文
+LAYOUT_SKIP_TAGS = {'nav', 'header', 'footer', 'aside', 'form'}
+
+# 块级标签：开始/结束时切分文本块
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'br', 'li', 'ul', 'ol', 'dl', 'dt', 'dd',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'table', 'tr', 'td', 'th',
+    'figure', 'figcaption', 'hr', 'body',
+}
+
+# 无结束标签的元素（不入栈）
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr',
+}
+
+# 正文容器标签
+MAIN_TAGS = {'article', 'main'}
+
+# class/id 命中时视为正文容器或模板区域
+_MAIN_HINT = re.compile(r'article|content|post|entry|main|detail|text|body|story', re.IGNORECASE)
+# 模板区域按完整单词匹配：class/id 按空白和 -/_ 切分后的任一单词命中即可（如 site-header、ad_box）
+_BOILERPLATE_TOKENS = {
+    'nav', 'navbar', 'menu', 'footer', 'header', 'sidebar', 'breadcrumb', 'breadcrumbs', 'comment', 'comments',
+    'share', 'social', 'recommend', 'related', 'advert', 'ad', 'ads', 'banner', 'copyright', 'login',
+    'subscribe', 'toolbar', 'popup', 'modal',
+}
+# 只按完整 class/id 匹配的名称（overflow-hidden 之类的工具类不算）
+_BOILERPLATE_NAMES = {'hidden', 'is-hidden', 'side-bar'}
+_HINT_SPLIT = re.compile(r'[\s\-_]+')
+
+_WHITESPACE = re.compile(r'\s+')
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w-]+)', re.IGNORECASE)
+
+# 链接文字占比超过该值的文本块视为导航/推荐列表
+MAX_LINK_DENSITY = 0.5
+
+
+def _is_boilerplate(hint: str) -> bool:
+    """class/id 是否表示导航、页脚、广告等模板区域"""
+    hint = hint.lower()
+    if any(name in _BOILERPLATE_NAMES for name in hint.split()):
+        return True
+    return any(token in _BOILERPLATE_TOKENS for token in _HINT_SPLIT.split(hint))
+
+
+class MainTextExtractor(HTMLParser):
+    """
+    增量正文提取器
+
+    通过 feed() 逐块喂入 HTML，正文容器内的文本达到 max_chars 后 done 为 True，调用方即可停止读取；
+    没有识别到正文容器时，退回使用所有链接密度低的非模板文本块
+    """
+
+    def __init__(self, max_chars: int = 8000, min_main_chars: int = 200):
+        """
+        Args:
+            max_chars: 最多提取的字符数
+            min_main_chars: 正文容器中的文本少于该值时改用全页文本
+        """
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.min_main_chars = min_main_chars
+        # 栈元素: (标签, 跳过原因, 是否正文容器, 是否在链接中)；
+        # 跳过原因: '' 不跳过，'tag' 脚本/样式等整段跳过，'hint' 布局标签或模板类名（其中的正文容器不跳过）
+        self._stack: List[tuple] = []
+        self._parts: List[str] = []
+        self._link_chars = 0
+        self._main_blocks: List[str] = []
+        self._other_blocks: List[str] = []
+        self._main_chars = 0
+        self._other_chars = 0
+
+    @property
+    def done(self) -> bool:
+        """是否已提取到足够的正文"""
+        return self._main_chars >= self.max_chars or (
+            self._main_chars == 0 and self._other_chars >= self.max_chars * 3
+        )
+
+    def _state(self) -> tuple:
+        return self._stack[-1][1:] if self._stack else ('', False, False)
+
+    def handle_starttag(self, tag, attrs):
+        skip, main, link = self._state()
+        if tag in BLOCK_TAGS:
+            self._flush()
+
+        if tag in VOID_TAGS:
+            return
+
+        if skip == 'hint' and tag in MAIN_TAGS:
+            # 包在布局标签或模板类名的容器（如整页 form、overflow 容器）里的 article/main 不跳过
+            skip = ''
+        if not skip:
+            hint = ' '.join(value for name, value in attrs if name in ('class', 'id') and value)
+            if tag in LAYOUT_SKIP_TAGS or (hint and tag not in MAIN_TAGS and _is_boilerplate(hint)):
+                skip = 'hint'
+            elif tag in SKIP_TAGS:
+                skip = 'tag'
+            elif tag in MAIN_TAGS or (hint and tag in ('div', 'section') and _MAIN_HINT.search(hint)):
+                main = True
+        self._stack.append((tag, skip, main, link or tag == 'a'))
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        # 容忍未闭合的标签：弹出到最近的同名标签为止
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                if tag in BLOCK_TAGS or any(entry[0] in BLOCK_TAGS for entry in self._stack[i + 1:]):
+                    self._flush()
+                del self._stack[i:]
+                break
+
+    def handle_data(self, data):
+        skip, main, link = self._state()
+        if skip or not data:
+            return
+        self._parts.append(data)
+        if link:
+            self._link_chars += len(data.strip())
+
+    def _flush(self):
+        if not self._parts:
+            return
+        text = _WHITESPACE.sub(' ', ''.join(self._parts)).strip()
+        link_chars = self._link_chars
+        self._parts = []
+        self._link_chars = 0
+        if not text or link_chars / len(text) > MAX_LINK_DENSITY:
+            return
+
+        _, main, _ = self._state()
+        if main:
+            self._main_blocks.append(text)
+            self._main_chars += len(text) + 1
+        else:
+            self._other_blocks.append(text)
+            self._other_chars += len(text) + 1
+
+    def text(self) -> str:
+        """返回提取结果（文本块以换行分隔，截断到 max_chars）"""
+        self._flush()
+        blocks = self._main_blocks if self._main_chars >= self.min_main_chars else self._other_blocks
+        return '\n'.join(blocks)[:self.max_chars]
+
+
+def extract_text(html: str, max_chars: int = 8000) -> str:
+    """从完整 HTML 中提取正文"""
+    extractor = MainTextExtractor(max_chars=max_chars)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.text()
+
+
+def detect_encoding(resp: requests.Response, head: bytes) -> str:
+    """确定网页编码：响应头 charset > HTML meta charset > UTF-8"""
+    content_type = resp.headers.get('Content-Type', '')
+    if 'charset=' in content_type.lower():
+        return resp.encoding or 'utf-8'
+    match = _META_CHARSET.search(head)
+    if match:
+        encoding = match.group(1).decode('ascii', 'ignore')
+        try:
+            codecs.lookup(encoding)
+            return encoding
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def extract_from_response(resp: requests.Response, max_chars: int = 8000,
+                          max_bytes: int = 2 * 1024 * 1024, chunk_size: int = 16 * 1024) -> str:
+    """
+    从流式响应中提取正文（请求需以 stream=True 发出）
+
+    Args:
+        resp: 响应对象
+        max_chars: 最多提取的字符数
+        max_bytes: 最多读取的字节数，超出后不再下载
+        chunk_size: 每次读取的块大小
+
+    Returns:
+        str: 正文文本
+    """
+    extractor = MainTextExtractor(max_chars=max_chars)
+    decoder = None
+    received = 0
+    try:
+        for chunk in resp.iter_content(chunk_size=chunk_size):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(detect_encoding(resp, chunk[:4096]))(errors='replace')
+            received += len(chunk)
+            extractor.feed(decoder.decode(chunk))
+            if extractor.done or received >= max_bytes:
+                break
+        else:
+            if decoder is not None:
+                extractor.feed(decoder.decode(b'', final=True))
+    finally:
+        # 提前停止时关闭连接，不再接收剩余内容
+        resp.close()
+    extractor.close()
+    return extractor.text()
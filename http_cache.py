@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+磁盘 HTTP 缓存（条件请求）
+按 Cache-Control / Expires 判断新鲜度，过期后带 If-None-Match / If-Modified-Since 重新验证，304 时直接使用缓存；
+内容压缩后存入 SQLite，超出容量按最近使用时间淘汰
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# 缓存条目中保留的响应头
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Expires', 'Date')
+
+
+@dataclass
+class CachedResult:
+    """一次经过缓存的请求结果"""
+    status_code: int
+    body: bytes = b''
+    headers: Dict[str, str] = field(default_factory=dict)
+    # 未发请求，直接使用新鲜的缓存
+    from_cache: bool = False
+    # 发了条件请求，服务端返回 304
+    revalidated: bool = False
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """解析 Cache-Control 头"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if arg else None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers, default_ttl: float = 0) -> Optional[float]:
+    """
+    计算响应的新鲜期（秒）
+
+    Returns:
+        Optional[float]: 新鲜期；不允许缓存（no-store）时返回 None
+    """
+    directives = parse_cache_control(headers.get('Cache-Control', ''))
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+
+    age = str(headers.get('Age') or '')
+    age = int(age) if age.isdigit() else 0
+    for name in ('s-maxage', 'max-age'):
+        if directives.get(name) and directives[name].isdigit():
+            return max(0.0, int(directives[name]) - age)
+
+    expires = _http_date(headers.get('Expires'))
+    if expires is not None:
+        date = _http_date(headers.get('Date')) or time.time()
+        return max(0.0, expires - date)
+
+    # 没有显式新鲜期时按 Last-Modified 启发式估算（距上次修改时长的 10%，最多一天）
+    last_modified = _http_date(headers.get('Last-Modified'))
+    if last_modified is not None:
+        date = _http_date(headers.get('Date')) or time.time()
+        return min(max(0.0, (date - last_modified) * 0.1), 24 * 3600)
+    return default_ttl
+
+
+class HTTPCache:
+    """基于 SQLite 的 HTTP 响应缓存（支持条件请求、压缩存储与按容量LRU淘汰）"""
+
+    def __init__(self, db_path: str = 'http_cache.db', max_bytes: int = 200 * 1024 * 1024,
+                 default_ttl: float = 0, compress_level: int = 6):
+        """
+        初始化 HTTP 缓存
+
+        Args:
+            db_path: SQLite 数据库文件路径
+            max_bytes: 缓存内容（压缩后）的总容量上限
+            default_ttl: 响应没有任何新鲜度信息时的新鲜期（秒），0 表示每次都重新验证
+            compress_level: zlib 压缩级别
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.compress_level = compress_level
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                cache_key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL NOT NULL,
+                stored_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_http_cache_last_used ON http_cache(last_used)')
+        self._conn.commit()
+
+    @staticmethod
+    def _key(namespace: str, url: str) -> str:
+        return f'{namespace}:{url}'
+
+    def _load(self, cache_key: str) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT body, headers, etag, last_modified, expires_at FROM http_cache WHERE cache_key = ?',
+                (cache_key,)
+            ).fetchone()
+
+    def _touch(self, cache_key: str, expires_at: Optional[float] = None):
+        now = time.time()
+        with self._lock:
+            if expires_at is None:
+                self._conn.execute('UPDATE http_cache SET last_used = ? WHERE cache_key = ?', (now, cache_key))
+            else:
+                self._conn.execute(
+                    'UPDATE http_cache SET last_used = ?, expires_at = ? WHERE cache_key = ?',
+                    (now, expires_at, cache_key)
+                )
+            self._conn.commit()
+
+    def _store(self, cache_key: str, body: bytes, headers, lifetime: float):
+        now = time.time()
+        compressed = zlib.compress(body, self.compress_level)
+        kept = {name: headers[name] for name in KEPT_HEADERS if headers.get(name)}
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO http_cache '
+                '(cache_key, body, size, headers, etag, last_modified, expires_at, stored_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (cache_key, compressed, len(compressed), json.dumps(kept), headers.get('ETag'),
+                 headers.get('Last-Modified'), now + lifetime, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """总容量超限时按最近使用时间淘汰（调用方持有锁）"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM http_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute('SELECT cache_key, size FROM http_cache ORDER BY last_used').fetchall()
+        for cache_key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM http_cache WHERE cache_key = ?', (cache_key,))
+            total -= size
+
+    def fetch(self, url: str, session: Optional[requests.Session] = None, namespace: str = 'raw',
+              read: Callable[[requests.Response], bytes] = lambda resp: resp.content,
+              headers: Optional[Dict[str, str]] = None, timeout: float = 15) -> CachedResult:
+        """
+        经缓存发起 GET 请求
+
+        Args:
+            url: 请求地址
+            session: 使用的会话，默认 requests.get
+            namespace: 缓存命名空间（同一URL缓存不同的处理结果时区分）
+            read: 从 200 响应（stream=True）读取要缓存的内容，可只读取需要的部分
+            headers: 请求头
+            timeout: 超时（秒）
+
+        Returns:
+            CachedResult: 请求结果，缓存命中或 304 时 body 为缓存内容
+        """
+        cache_key = self._key(namespace, url)
+        row = self._load(cache_key)
+        now = time.time()
+
+        if row and row[4] > now:
+            self._touch(cache_key)
+            with self._lock:
+                self.hits += 1
+            return CachedResult(200, zlib.decompress(row[0]), json.loads(row[1]), from_cache=True)
+
+        request_headers = dict(headers or {})
+        if row:
+            if row[2]:
+                request_headers['If-None-Match'] = row[2]
+            if row[3]:
+                request_headers['If-Modified-Since'] = row[3]
+
+        get = session.get if session is not None else requests.get
+        try:
+            resp = get(url, headers=request_headers, timeout=timeout, stream=True)
+        except requests.RequestException:
+            if row:
+                # 网络异常时退回使用过期缓存
+                return CachedResult(200, zlib.decompress(row[0]), json.loads(row[1]), from_cache=True)
+            raise
+
+        if resp.status_code == 304 and row:
+            resp.close()
+            stored_headers = json.loads(row[1])
+            stored_headers.update({name: resp.headers[name] for name in KEPT_HEADERS if resp.headers.get(name)})
+            lifetime = freshness_lifetime(stored_headers, self.default_ttl) or 0
+            self._touch(cache_key, now + lifetime)
+            with self._lock:
+                self.revalidations += 1
+            return CachedResult(200, zlib.decompress(row[0]), stored_headers, revalidated=True)
+
+        with self._lock:
+            self.misses += 1
+        if resp.status_code != 200:
+            resp.close()
+            return CachedResult(resp.status_code, headers=dict(resp.headers))
+
+        try:
+            body = read(resp)
+        finally:
+            resp.close()
+
+        lifetime = freshness_lifetime(resp.headers, self.default_ttl)
+        if lifetime is not None and (lifetime > 0 or resp.headers.get('ETag') or resp.headers.get('Last-Modified')):
+            self._store(cache_key, body, resp.headers, lifetime)
+        return CachedResult(200, body, dict(resp.headers))
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute('DELETE FROM http_cache')
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """缓存容量与命中统计"""
+        with self._lock:
+            entries, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache').fetchone()
+            return {
+                'entries': entries,
+                'bytes': size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'revalidations': self.revalidations,
+                'misses': self.misses
+            }
+
+
+class CachedSession(requests.Session):
+    """GET 请求（非流式）自动经过 HTTPCache 的会话，供只调用 session.get(...).json() 的代码透明使用"""
+
+    def __init__(self, cache: HTTPCache):
+        super().__init__()
+        self.cache = cache
+
+    def get(self, url, **kwargs):
+        if kwargs.get('stream') or kwargs.get('params'):
+            return super().get(url, **kwargs)
+
+        # 经父类 get 发出实际请求（复用本会话的连接池），避免再次进入缓存
+        result = self.cache.fetch(
+            url,
+            session=super(),
+            headers=kwargs.get('headers'),
+            timeout=kwargs.get('timeout', 15)
+        )
+        resp = requests.Response()
+        resp.status_code = result.status_code
+        resp._content = result.body
+        resp.headers = CaseInsensitiveDict(result.headers)
+        resp.url = url
+        resp.from_cache = result.from_cache or result.revalidated
+        return resp
+
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发布请求幂等控制
+同一幂等键在有效期内重复提交时直接返回首次发布的结果，避免重复创建草稿和重复上传图片
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+
+
+def derive_idempotency_key(title: str, content: str) -> str:
+    """根据标题和内容生成幂等键"""
+    digest = hashlib.sha256()
+    digest.update((title or '').encode('utf-8'))
+    digest.update(b'\0')
+    digest.update((content or '').encode('utf-8'))
+    return f'auto:{digest.hexdigest()}'
+
+
+class IdempotencyStore:
+    """基于 SQLite 的幂等记录（进程间共享同一个数据库文件即可共享记录）"""
+
+    def __init__(self, db_path: str = 'idempotency.db', window: int = 24 * 3600, pending_timeout: int = 600,
+                 job_active: Optional[Callable[[str], bool]] = None):
+        """
+        初始化幂等存储
+
+        Args:
+            db_path: SQLite 数据库文件路径
+            window: 成功结果的保留时长（秒），窗口内的重复提交直接返回该结果
+            pending_timeout: 处理中记录的超时时长（秒），超时视为处理进程已异常退出
+            job_active: 判断异步任务是否仍在排队或执行中的函数；关联任务的处理中记录在任务结束前不会超时，
+                避免任务排队超过 pending_timeout 时重复提交再发布一次
+        """
+        self.db_path = db_path
+        self.window = window
+        self.pending_timeout = pending_timeout
+        self.job_active = job_active
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS idempotency (
+                key TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                job_id TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用独立连接（autocommit 模式，事务手动控制）；fork 出的子进程不复用父进程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _row_to_dict(self, row) -> Dict:
+        return {
+            'key': row[0],
+            'status': row[1],
+            'job_id': row[2],
+            'result': json.loads(row[3]) if row[3] else None,
+            'created_at': row[4],
+            'updated_at': row[5]
+        }
+
+    def _is_live(self, row, now: float) -> bool:
+        status, job_id, updated_at = row[1], row[2], row[5]
+        if status == STATUS_DONE:
+            return now - updated_at < self.window
+        if now - updated_at < self.pending_timeout:
+            return True
+        # 超时的处理中记录：关联的任务仍在排队或执行中（租约未过期）时继续有效
+        return bool(job_id and self.job_active and now - updated_at < self.window and self.job_active(job_id))
+
+    def get(self, key: str) -> Optional[Dict]:
+        """查询有效的幂等记录"""
+        row = self._conn().execute(
+            'SELECT key, status, job_id, result, created_at, updated_at FROM idempotency WHERE key = ?',
+            (key,)
+        ).fetchone()
+        if row and self._is_live(row, time.time()):
+            return self._row_to_dict(row)
+        return None
+
+    def begin(self, key: str, job_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        占用幂等键
+
+        Args:
+            key: 幂等键
+            job_id: 异步模式下对应的任务ID
+
+        Returns:
+            Optional[Dict]: 键已被占用（处理中或已完成）时返回已有记录；占用成功返回 None
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT key, status, job_id, result, created_at, updated_at FROM idempotency WHERE key = ?',
+                (key,)
+            ).fetchone()
+            if row and self._is_live(row, now):
+                conn.execute('COMMIT')
+                return self._row_to_dict(row)
+
+            conn.execute(
+                'INSERT OR REPLACE INTO idempotency (key, status, job_id, result, created_at, updated_at) '
+                'VALUES (?, ?, ?, NULL, ?, ?)',
+                (key, STATUS_PENDING, job_id, now, now)
+            )
+            # 顺带清理过期记录（关联任务的处理中记录由任务结束时释放，最多保留 window）
+            conn.execute(
+                'DELETE FROM idempotency WHERE (status = ? AND updated_at < ?) OR '
+                '(status = ? AND updated_at < ? AND (job_id IS NULL OR updated_at < ?))',
+                (STATUS_DONE, now - self.window, STATUS_PENDING, now - self.pending_timeout, now - self.window)
+            )
+            conn.execute('COMMIT')
+            return None
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def complete(self, key: str, result: Optional[Dict]):
+        """
+        记录处理结果：成功时保存结果供重复提交复用，失败时释放幂等键以便重试
+        """
+        if result and result.get('success'):
+            self._conn().execute(
+                'UPDATE idempotency SET status = ?, result = ?, updated_at = ? WHERE key = ?',
+                (STATUS_DONE, json.dumps(result, ensure_ascii=False), time.time(), key)
+            )
+        else:
+            self._conn().execute('DELETE FROM idempotency WHERE key = ?', (key,))
+
+    def wait(self, key: str, timeout: float = 60, interval: float = 0.5) -> Optional[Dict]:
+        """
+        等待处理中的记录完成
+
+        Returns:
+            Optional[Dict]: 完成后的记录；记录被释放（处理失败）或等待超时返回 None
+        """
+        deadline = time.time() + timeout
+        while True:
+            record = self.get(key)
+            if not record or record['status'] == STATUS_DONE:
+                return record
+            if time.time() >= deadline:
+                return None
+            time.sleep(interval)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传前的图片预处理
+按文件头（魔数）识别真实格式，微信不支持的格式转码，超宽图片等比缩小，
+再按字节预算逐级降低 JPEG 质量压缩；封面（thumb）强制为不超过 64KB 的 JPEG。
+全部在内存中完成；未安装 Pillow 时只识别格式、修正 Content-Type 和扩展名
+"""
+
+import io
+import os
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+# 格式 -> (Content-Type, 扩展名)
+FORMATS = {
+    'jpeg': ('image/jpeg', 'jpg'),
+    'png': ('image/png', 'png'),
+    'gif': ('image/gif', 'gif'),
+    'bmp': ('image/bmp', 'bmp'),
+    'webp': ('image/webp', 'webp'),
+    'tiff': ('image/tiff', 'tiff'),
+    'ico': ('image/x-icon', 'ico'),
+    'avif': ('image/avif', 'avif'),
+    'heic': ('image/heic', 'heic'),
+}
+
+# 识别格式需要的文件头字节数
+SNIFF_BYTES = 32
+
+# 只读文件头判断是否需要预处理时读取的字节数（需包含 JPEG 的 SOF 段，EXIF 缩略图可能有几十 KB）
+PROBE_BYTES = 128 * 1024
+
+# HEIF 系列 ftyp 品牌
+_HEIC_BRANDS = {b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'mif1', b'msf1'}
+_AVIF_BRANDS = {b'avif', b'avis'}
+
+
+@dataclass(frozen=True)
+class MediaLimits:
+    """微信对某类素材的限制"""
+    formats: FrozenSet[str]
+    max_bytes: int
+
+
+# 微信永久素材限制：图片 10MB、bmp/png/jpeg/gif；缩略图（封面）64KB、仅 JPG
+MEDIA_LIMITS = {
+    'image': MediaLimits(frozenset({'jpeg', 'png', 'gif', 'bmp'}), 10 * 1024 * 1024),
+    'thumb': MediaLimits(frozenset({'jpeg'}), 64 * 1024),
+}
+
+# 缩小到预算内时 JPEG 质量的下限，以及继续缩小尺寸时每次的比例和最小宽度
+MIN_QUALITY = 40
+SHRINK_RATIO = 0.75
+MIN_WIDTH = 64
+
+
+@dataclass
+class PreparedImage:
+    """预处理结果"""
+    data: bytes
+    format: Optional[str]
+    content_type: str
+    extension: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    # 是否重新编码过（False 表示原样上传）
+    converted: bool = False
+
+    def filename(self, filename: Optional[str] = None) -> str:
+        """把文件名的扩展名改成与实际格式一致"""
+        return with_extension(filename or 'image', self.extension)
+
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """按文件头识别图片格式，无法识别时返回 None"""
+    head = bytes(data[:SNIFF_BYTES])
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head.startswith((b'II*\x00', b'MM\x00*')):
+        return 'tiff'
+    if head.startswith(b'\x00\x00\x01\x00'):
+        return 'ico'
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand in _AVIF_BRANDS:
+            return 'avif'
+        if brand in _HEIC_BRANDS:
+            return 'heic'
+    return None
+
+
+def with_extension(filename: str, extension: str) -> str:
+    """替换文件名的扩展名"""
+    root, ext = os.path.splitext(filename)
+    if ext.lower().lstrip('.') in ('jpg', 'jpeg') and extension == 'jpg':
+        return filename
+    return f'{root or filename}.{extension}'
+
+
+def _is_animated(image) -> bool:
+    return getattr(image, 'is_animated', False) and getattr(image, 'n_frames', 1) > 1
+
+
+def _has_alpha(image) -> bool:
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _to_rgb(image):
+    """转为 RGB，透明区域铺白底（JPEG 不支持透明）"""
+    if _has_alpha(image):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _resize(image, width: int):
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def _encode(image, fmt: str, quality: int) -> bytes:
+    buf = io.BytesIO()
+    if fmt == 'jpeg':
+        image.save(buf, 'JPEG', quality=quality, optimize=True, progressive=True)
+    elif fmt == 'png':
+        image.save(buf, 'PNG', optimize=True)
+    else:
+        image.save(buf, fmt.upper())
+    return buf.getvalue()
+
+
+def _encode_jpeg_within(image, max_bytes: int, quality: int, min_quality: int) -> Optional[bytes]:
+    """在 [min_quality, quality] 内二分查找不超过预算的最高质量，做不到时返回 None"""
+    data = _encode(image, 'jpeg', quality)
+    if len(data) <= max_bytes:
+        return data
+    best = None
+    low, high = min_quality, quality - 1
+    while low <= high:
+        mid = (low + high) // 2
+        candidate = _encode(image, 'jpeg', mid)
+        if len(candidate) <= max_bytes:
+            best, low = candidate, mid + 1
+        else:
+            high = mid - 1
+    return best
+
+
+def _result(data: bytes, fmt: Optional[str], image=None, converted: bool = False) -> PreparedImage:
+    # 无法识别的格式沿用原来的 image/jpeg
+    content_type, extension = FORMATS.get(fmt, ('image/jpeg', 'jpg'))
+    return PreparedImage(
+        data, fmt, content_type, extension,
+        width=image.width if image is not None else None,
+        height=image.height if image is not None else None,
+        converted=converted
+    )
+
+
+def probe_image(head: bytes):
+    """
+    只根据文件头识别格式和尺寸（不解码像素）
+
+    Returns:
+        (格式, 宽度)：无法识别时为 None
+    """
+    fmt = sniff_format(head)
+    width = None
+    if Image is not None:
+        try:
+            width = Image.open(io.BytesIO(head)).size[0]
+        except Exception:
+            pass
+    return fmt, width
+
+
+def needs_preparation(head: bytes, length: int, media_type: str = 'image', max_width: int = 1080,
+                      max_bytes: Optional[int] = None) -> bool:
+    """
+    根据文件头和总长度判断 prepare_image 是否可能改动图片；返回 False 时可以直接流式上传原图，不必读入内存解码
+
+    GIF 只看是否超出微信上限（动图原样保留）；文件头中读不到尺寸时保守地返回 True
+    """
+    limits = MEDIA_LIMITS.get(media_type)
+    if limits is None or Image is None:
+        return False
+    fmt, width = probe_image(head)
+    if fmt not in limits.formats:
+        return True
+    if fmt == 'gif':
+        return length > limits.max_bytes
+    budget = min(max_bytes, limits.max_bytes) if max_bytes else limits.max_bytes
+    return length > budget or width is None or (max_width > 0 and width > max_width)
+
+
+def prepare_image(data: bytes, media_type: str = 'image', max_width: int = 1080,
+                  max_bytes: Optional[int] = None, quality: int = 85,
+                  min_quality: int = MIN_QUALITY) -> PreparedImage:
+    """
+    上传前预处理图片
+
+    格式受支持、宽度和大小都在限制内的图片原样返回，不重新编码；否则：
+    不支持的格式转为 JPEG（PNG 在图片素材中保留），宽度超过 max_width 时等比缩小，
+    超出字节预算时先降低 JPEG 质量（不低于 min_quality），仍超出则继续缩小尺寸。
+    动图（GIF）重新编码会丢失动画：只要格式受支持且不超过微信的大小上限就原样保留（不受 max_bytes、max_width 约束），
+    只有微信会拒收时才转为静态图
+
+    Args:
+        data: 图片原始字节
+        media_type: 素材类型（image / thumb），决定允许的格式和大小上限
+        max_width: 最大宽度（像素），<=0 表示不限
+        max_bytes: 字节预算，默认使用该素材类型的微信上限（取两者较小值）
+        quality: 初始 JPEG 质量
+        min_quality: 降低质量的下限
+
+    Returns:
+        PreparedImage: 处理后的字节、格式、Content-Type 和扩展名
+
+    Raises:
+        ValueError: 图片无法解码，或缩到最小仍超出字节预算
+    """
+    fmt = sniff_format(data)
+    limits = MEDIA_LIMITS.get(media_type)
+    if limits is None:
+        return _result(data, fmt)
+    budget = min(max_bytes, limits.max_bytes) if max_bytes else limits.max_bytes
+
+    if Image is None:
+        # 未安装 Pillow：无法转码，只保证 Content-Type 与扩展名正确
+        return _result(data, fmt)
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        # 按原始尺寸判断是否超宽（draft 会改变解码后的尺寸）
+        width, height = image.size
+        oversize = max_width > 0 and width > max_width
+        if fmt in limits.formats and len(data) <= budget and not oversize:
+            return PreparedImage(data, fmt, *FORMATS[fmt], width=width, height=height)
+        if _is_animated(image):
+            if fmt in limits.formats and len(data) <= limits.max_bytes:
+                return PreparedImage(data, fmt, *FORMATS[fmt], width=width, height=height)
+            print(f"    动图超出微信限制（{fmt}, {len(data)} 字节），转为静态图，动画将丢失")
+        if fmt == 'jpeg' and oversize:
+            # 确定要缩小时，JPEG 解码直接按 1/2、1/4、1/8 缩小，大图不必先完整解码
+            image.draft('RGB', (max_width, max(1, height * max_width // width)))
+        image.load()
+    except Exception as e:
+        raise ValueError(f'无法解码图片: {e}') from e
+
+    # 按 EXIF 方向摆正（重新编码后方向信息会丢失）
+    image = ImageOps.exif_transpose(image)
+    if max_width > 0:
+        image = _resize(image, max_width)
+
+    # 图片素材中的 PNG（如截图、带透明的图）先尝试保持 PNG
+    if fmt == 'png' and 'png' in limits.formats:
+        encoded = _encode(image, 'png', quality)
+        if len(encoded) <= budget:
+            return _result(encoded, 'png', image, converted=True)
+
+    image = _to_rgb(image)
+    while True:
+        encoded = _encode_jpeg_within(image, budget, quality, min_quality)
+        if encoded is not None:
+            return _result(encoded, 'jpeg', image, converted=True)
+        width = int(image.width * SHRINK_RATIO)
+        if width < MIN_WIDTH:
+            raise ValueError(f'图片压缩到最小仍超过 {budget} 字节')
+        image = _resize(image, width)
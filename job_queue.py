@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化后台任务队列
+任务写入 SQLite 后立即返回任务ID，由 worker 线程池异步执行；
+领取的任务带执行者和租约，执行期间定时续约，进程退出后租约过期的任务由其他 worker 重新领取
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+# 任务状态
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+
+# 领取任务的默认租约时长（秒），执行期间每 1/3 租约续约一次
+LEASE = 60
+
+# 同一任务最多被领取的次数：执行者反复异常退出（如任务本身导致进程崩溃）时不再无限重试
+MAX_ATTEMPTS = 3
+
+
+class JobQueue:
+    """基于 SQLite 的任务队列 + worker 线程池（多个进程可共用同一个数据库文件）"""
+
+    def __init__(self, handler: Callable[[Dict], Dict], db_path: str = 'jobs.db',
+                 workers: int = 2, poll_interval: float = 1.0, result_ttl: int = 7 * 24 * 3600,
+                 lease: float = LEASE, max_attempts: int = MAX_ATTEMPTS):
+        """
+        初始化任务队列
+
+        Args:
+            handler: 任务处理函数，接收任务参数，返回结果字典（含 success 字段）
+            db_path: SQLite 数据库文件路径
+            workers: worker 线程数
+            poll_interval: 空闲时轮询数据库的间隔（秒），用于发现其他进程提交的任务
+            result_ttl: 已完成任务保留时长（秒）
+            lease: 任务租约时长（秒），执行者超过该时长没有续约（进程已退出）时任务重新排队
+            max_attempts: 最多领取次数，租约过期且已达到该次数的任务标记为失败，<=0 表示不限
+        """
+        self.handler = handler
+        self.db_path = db_path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self.lease = lease
+        self.max_attempts = max_attempts
+        # 执行者标识，start() 时按当前进程生成
+        self.owner = ''
+        self._pid = None
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lease_until REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(jobs)')]
+        if 'owner' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+            conn.execute('ALTER TABLE jobs ADD COLUMN lease_until REAL')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)')
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用独立连接（autocommit 模式，事务手动控制）；fork 出的子进程不复用父进程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def start(self):
+        """
+        在当前进程启动 worker 线程和续约线程（每个进程调用一次，fork 后的子进程需要重新调用）
+
+        不会改动其他进程正在执行的任务：只有租约过期的 running 任务才会被重新领取
+        """
+        if self._threads and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.owner = f'{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}'
+        self._threads = []
+        self._stop.clear()
+        for i in range(max(1, self.workers)):
+            thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止 worker 线程（正在执行的任务会执行完）"""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    @staticmethod
+    def new_job_id() -> str:
+        """生成任务ID（需要在提交前就拿到ID时使用）"""
+        return uuid.uuid4().hex
+
+    def submit(self, payload: Dict, job_id: Optional[str] = None) -> str:
+        """
+        提交任务
+
+        Args:
+            payload: 任务参数（需可 JSON 序列化）
+            job_id: 预先生成的任务ID，默认自动生成
+
+        Returns:
+            str: 任务ID
+        """
+        job_id = job_id or self.new_job_id()
+        now = time.time()
+        self._conn().execute(
+            'INSERT INTO jobs (id, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+            (job_id, STATUS_QUEUED, json.dumps(payload, ensure_ascii=False), now, now)
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """查询任务状态，不存在时返回 None"""
+        row = self._conn().execute(
+            'SELECT id, status, result, error, attempts, created_at, updated_at FROM jobs WHERE id = ?',
+            (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            'job_id': row[0],
+            'status': row[1],
+            'result': json.loads(row[2]) if row[2] else None,
+            'error': row[3],
+            'attempts': row[4],
+            'created_at': row[5],
+            'updated_at': row[6]
+        }
+
+    def is_active(self, job_id: str) -> bool:
+        """任务是否仍在排队，或正在执行且租约未过期"""
+        row = self._conn().execute('SELECT status, lease_until FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if not row:
+            return False
+        return row[0] == STATUS_QUEUED or (row[0] == STATUS_RUNNING and (row[1] or 0) >= time.time())
+
+    def stats(self) -> Dict:
+        """各状态任务数"""
+        rows = self._conn().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+    def _claim(self) -> Optional[tuple]:
+        """原子地领取一个排队中的任务，或租约已过期（执行者已退出）的任务；已达到最多领取次数的过期任务标记为失败"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self.max_attempts > 0:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? '
+                    'WHERE status = ? AND COALESCE(lease_until, 0) < ? AND attempts >= ?',
+                    (STATUS_FAILED, f'执行者异常退出，已领取 {self.max_attempts} 次，不再重试', now,
+                     STATUS_RUNNING, now, self.max_attempts)
+                )
+            row = conn.execute(
+                'SELECT id, payload FROM jobs WHERE status = ? OR (status = ? AND COALESCE(lease_until, 0) < ?) '
+                'ORDER BY created_at LIMIT 1',
+                (STATUS_QUEUED, STATUS_RUNNING, now)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, attempts = attempts + 1, owner = ?, lease_until = ?, updated_at = ? '
+                    'WHERE id = ?',
+                    (STATUS_RUNNING, self.owner, now + self.lease, now, row[0])
+                )
+            conn.execute('COMMIT')
+            return row
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated_at = ? '
+            'WHERE id = ? AND owner = ?',
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error, now, job_id,
+             self.owner)
+        )
+        if self.result_ttl > 0:
+            conn.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+                (STATUS_SUCCEEDED, STATUS_FAILED, now - self.result_ttl)
+            )
+
+    def _heartbeat(self):
+        """定时为本进程正在执行的任务续约"""
+        while not self._stop.wait(self.lease / 3):
+            try:
+                self._conn().execute(
+                    'UPDATE jobs SET lease_until = ? WHERE status = ? AND owner = ?',
+                    (time.time() + self.lease, STATUS_RUNNING, self.owner)
+                )
+            except sqlite3.OperationalError as e:
+                print(f"任务续约失败: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.OperationalError as e:
+                print(f"领取任务失败: {e}")
+                job = None
+
+            if not job:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            job_id, payload = job
+            try:
+                result = self.handler(json.loads(payload))
+                status = STATUS_SUCCEEDED if result.get('success') else STATUS_FAILED
+                self._finish(job_id, status, result=result, error=None if result.get('success') else str(result.get('error')))
+            except Exception as e:
+                self._finish(job_id, STATUS_FAILED, error=str(e))
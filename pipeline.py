@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发流水线
+各阶段之间用有界队列传递条目，每个阶段有独立的 worker 数；下游处理不过来时上游阻塞（背压），
+单条目出错只影响该条目，运行结束后给出各阶段的统计汇总
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from queue import Queue
+from typing import Any, Callable, Dict, Iterable, List
+
+# 队列结束标记
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    流水线阶段
+
+    func 处理单个条目并返回交给下一阶段的条目；返回 None 表示丢弃该条目（如重复），抛出异常表示该条目失败
+    """
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    # 输入队列容量，0 表示 workers 的两倍
+    queue_size: int = 0
+
+
+@dataclass
+class StageStats:
+    """单个阶段的统计"""
+    name: str
+    workers: int
+    received: int = 0
+    passed: int = 0
+    dropped: int = 0
+    failed: int = 0
+    # 各 worker 处理条目的累计耗时（秒）
+    busy: float = 0.0
+
+
+@dataclass
+class PipelineSummary:
+    """一次运行的汇总"""
+    stages: List[StageStats]
+    results: List[Any] = field(default_factory=list)
+    errors: List[Dict] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def lines(self) -> List[str]:
+        """汇总文本（每个阶段一行，之后是失败明细）"""
+        lines = [
+            f"{stats.name}: 输入{stats.received} 通过{stats.passed} 跳过{stats.dropped} "
+            f"失败{stats.failed} (并发{stats.workers}, 累计{stats.busy:.1f}s)"
+            for stats in self.stages
+        ]
+        lines.append(f"完成: {len(self.results)}条, 总耗时 {self.elapsed:.1f}s")
+        for error in self.errors:
+            lines.append(f"[{error['stage']}] {error['item']}: {error['error']}")
+        return lines
+
+
+class Pipeline:
+    """多阶段并发流水线"""
+
+    def __init__(self, stages: List[Stage], describe: Callable[[Any], str] = lambda item: str(item)[:60]):
+        """
+        Args:
+            stages: 按顺序执行的阶段
+            describe: 失败明细中描述条目的函数
+        """
+        if not stages:
+            raise ValueError('流水线至少需要一个阶段')
+        self.stages = stages
+        self.describe = describe
+
+    def run(self, items: Iterable[Any]) -> PipelineSummary:
+        """
+        运行流水线，全部条目处理完后返回
+
+        Args:
+            items: 输入条目（可以是生成器，按下游消费速度逐个读取）
+
+        Returns:
+            PipelineSummary: 运行汇总，results 为通过最后一个阶段的条目
+        """
+        started = time.time()
+        queues = [Queue(maxsize=stage.queue_size or max(1, stage.workers) * 2) for stage in self.stages]
+        lock = threading.Lock()
+        workers = [max(1, stage.workers) for stage in self.stages]
+        summary = PipelineSummary(stages=[StageStats(stage.name, n) for stage, n in zip(self.stages, workers)])
+        remaining = list(workers)
+
+        def feed():
+            try:
+                for item in items:
+                    # 队列满时阻塞，直到第一个阶段有空闲
+                    queues[0].put(item)
+            except Exception as e:
+                with lock:
+                    summary.errors.append({'stage': 'source', 'item': '-', 'error': str(e)})
+            finally:
+                for _ in range(workers[0]):
+                    queues[0].put(_DONE)
+
+        def work(index: int):
+            stage = self.stages[index]
+            stats = summary.stages[index]
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                with lock:
+                    stats.received += 1
+
+                item_started = time.time()
+                try:
+                    result = stage.func(item)
+                except Exception as e:
+                    with lock:
+                        stats.failed += 1
+                        stats.busy += time.time() - item_started
+                        summary.errors.append({'stage': stage.name, 'item': self._describe(item), 'error': str(e)})
+                    continue
+
+                with lock:
+                    stats.busy += time.time() - item_started
+                    if result is None:
+                        stats.dropped += 1
+                        continue
+                    stats.passed += 1
+                    if outbox is None:
+                        summary.results.append(result)
+                if outbox is not None:
+                    outbox.put(result)
+
+            # 本阶段最后一个退出的 worker 通知下一阶段结束
+            with lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and outbox is not None:
+                for _ in range(workers[index + 1]):
+                    outbox.put(_DONE)
+
+        threads = [threading.Thread(target=feed, name='pipeline-source', daemon=True)]
+        for index, stage in enumerate(self.stages):
+            for i in range(workers[index]):
+                threads.append(threading.Thread(target=work, args=(index,), name=f'pipeline-{stage.name}-{i}',
+                                                daemon=True))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        summary.elapsed = time.time() - started
+        return summary
+
+    def _describe(self, item: Any) -> str:
+        try:
+            return self.describe(item)
+        except Exception:
+            return repr(item)[:60]
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发布状态跟踪
+提交发布后登记 publish_id，由一个调度线程按指数递增的间隔轮询 freepublish/get，
+到达终态（0 成功 / 2~6 失败）后通过回调、Future 或 webhook 通知；跟踪记录持久化到 SQLite，进程重启后继续轮询
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from rate_limit import backoff_delay
+from wechat_sdk import PUBLISH_STATUS_MAP, PUBLISH_TERMINAL_STATUSES
+
+# 跟踪状态
+STATE_TRACKING = 'tracking'
+STATE_DONE = 'done'
+STATE_EXPIRED = 'expired'
+
+# 调度线程领取一条记录后占用的时长（秒），防止多个进程同时轮询同一个 publish_id
+CLAIM_LEASE = 60
+
+
+def webhook_allowed(url: str, hosts: Iterable[str]) -> bool:
+    """webhook 是否为 http(s) 地址且主机在允许列表中（列表项为 host 或 host:port）"""
+    try:
+        parsed = urlparse(url)
+        port = parsed.port
+    except ValueError:
+        return False
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return False
+    host = parsed.hostname.lower()
+    netloc = f'{host}:{port}' if port else host
+    return any(entry.lower() in (host, netloc) for entry in hosts)
+
+
+class PublishTracker:
+    """发布状态跟踪器（一个调度线程 + 少量轮询线程，可同时跟踪大量 publish_id）"""
+
+    def __init__(self, api, db_path: str = 'publish_tracker.db', initial_interval: float = 5,
+                 max_interval: float = 300, multiplier: float = 2, max_age: float = 24 * 3600,
+                 workers: int = 4, scan_interval: float = 5, webhook_timeout: float = 10,
+                 webhook_retries: int = 3, result_ttl: int = 7 * 24 * 3600,
+                 webhook_hosts: Optional[Iterable[str]] = None):
+        """
+        初始化跟踪器
+
+        Args:
+            api: 查询发布状态的客户端（WeChatAPI），多账号时为按账号名返回客户端的函数
+            db_path: SQLite 数据库文件路径
+            initial_interval: 提交后第一次查询的等待时间（秒）
+            max_interval: 两次查询的最大间隔（秒）
+            multiplier: 每次查询后间隔的增长倍数
+            max_age: 超过该时长仍未到达终态时停止跟踪（秒）
+            workers: 并发查询线程数
+            scan_interval: 空闲时扫描数据库的间隔（秒），用于发现其他进程登记的记录
+            webhook_timeout: webhook 请求超时（秒）
+            webhook_retries: webhook 失败重试次数
+            result_ttl: 已结束记录保留时长（秒）
+            webhook_hosts: 允许 POST 的 webhook 主机（host 或 host:port），None 表示不限制；
+                webhook 地址来自客户端时必须配置，防止服务端被用来请求内网地址
+        """
+        self.api = api
+        self.db_path = db_path
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.max_age = max_age
+        self.workers = workers
+        self.scan_interval = scan_interval
+        self.webhook_timeout = webhook_timeout
+        self.webhook_retries = webhook_retries
+        self.result_ttl = result_ttl
+        self.webhook_hosts = None if webhook_hosts is None else list(webhook_hosts)
+        self._listeners: List[Callable[[Dict], None]] = []
+        # publish_id -> [(回调, Future)]，只在本进程内有效
+        self._waiters: Dict[str, List[tuple]] = {}
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS publish_tracking (
+                publish_id TEXT PRIMARY KEY,
+                account TEXT NOT NULL DEFAULT '',
+                state TEXT NOT NULL,
+                publish_status INTEGER,
+                result TEXT,
+                webhook TEXT,
+                context TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                notified INTEGER NOT NULL DEFAULT 0,
+                next_poll_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(publish_tracking)')]
+        if 'account' not in columns:
+            conn.execute("ALTER TABLE publish_tracking ADD COLUMN account TEXT NOT NULL DEFAULT ''")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_publish_tracking_due ON publish_tracking(state, next_poll_at)')
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用独立连接（autocommit 模式，事务手动控制）；fork 出的子进程不复用父进程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def start(self):
+        """
+        在当前进程启动调度线程（每个进程调用一次，fork 后的子进程需要重新调用），
+        并补发上次退出前未送达的 webhook（多个进程同时启动时每条只由一个进程补发）
+        """
+        if self._thread and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='publish-poll')
+        now = time.time()
+        conn = self._conn()
+        rows = conn.execute(
+            'SELECT publish_id, updated_at FROM publish_tracking '
+            'WHERE state != ? AND notified = 0 AND webhook IS NOT NULL AND updated_at < ?',
+            (STATE_TRACKING, now - CLAIM_LEASE)
+        ).fetchall()
+        for publish_id, updated_at in rows:
+            # 改写 updated_at 领取补发任务，其他进程的条件更新会落空；刚结束的记录由结束它的进程通知
+            claimed = conn.execute(
+                'UPDATE publish_tracking SET updated_at = ? WHERE publish_id = ? AND notified = 0 AND updated_at = ?',
+                (now, publish_id, updated_at)
+            ).rowcount
+            if claimed:
+                self._executor.submit(self._notify_webhook, self.get(publish_id))
+        self._thread = threading.Thread(target=self._run, name='publish-tracker', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止调度（正在进行的查询会执行完）"""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """注册全局回调：任意 publish_id 结束时调用（参数同 get() 的返回值）"""
+        self._listeners.append(callback)
+
+    def check_webhook(self, webhook: Optional[str]):
+        """webhook 不在允许列表中时抛出 ValueError"""
+        if webhook and self.webhook_hosts is not None and not webhook_allowed(webhook, self.webhook_hosts):
+            raise ValueError(f'webhook 主机不在允许列表中: {urlparse(webhook).netloc}')
+
+    def track(self, publish_id: str, callback: Optional[Callable[[Dict], None]] = None,
+              webhook: Optional[str] = None, context: Optional[Dict] = None, account: str = '') -> Future:
+        """
+        登记要跟踪的 publish_id（重复登记不会重复轮询）
+
+        Args:
+            publish_id: 发布任务ID
+            callback: 结束时调用的回调（只在本进程内有效）
+            webhook: 结束时 POST 结果的地址（持久化，重启后仍会通知）
+            context: 附带在结果中的自定义数据（需可 JSON 序列化）
+            account: 发布所用的账号名（多账号时按该账号查询状态）
+
+        Returns:
+            Future: 结束时以 get() 的返回值完成
+
+        Raises:
+            ValueError: webhook 不在允许列表中
+        """
+        self.check_webhook(webhook)
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR IGNORE INTO publish_tracking '
+            '(publish_id, account, state, webhook, context, next_poll_at, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (publish_id, account or '', STATE_TRACKING, webhook,
+             json.dumps(context, ensure_ascii=False) if context else None, now + self.initial_interval, now, now)
+        )
+        if webhook:
+            conn.execute('UPDATE publish_tracking SET webhook = ? WHERE publish_id = ?', (webhook, publish_id))
+
+        future = Future()
+        with self._lock:
+            record = self.get(publish_id)
+            if record['state'] == STATE_TRACKING:
+                self._waiters.setdefault(publish_id, []).append((callback, future))
+                record = None
+        if record is not None:
+            # 已经结束的记录直接返回结果
+            self._call(callback, record)
+            future.set_result(record)
+
+        with self._wakeup:
+            self._wakeup.notify()
+        return future
+
+    def get(self, publish_id: str) -> Optional[Dict]:
+        """查询跟踪记录，不存在时返回 None"""
+        row = self._conn().execute(
+            'SELECT publish_id, state, publish_status, result, webhook, context, attempts, next_poll_at, '
+            'created_at, updated_at, account FROM publish_tracking WHERE publish_id = ?',
+            (publish_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            'publish_id': row[0],
+            'account': row[10],
+            'state': row[1],
+            'publish_status': row[2],
+            'publish_status_desc': PUBLISH_STATUS_MAP.get(row[2], '未知状态') if row[2] is not None else None,
+            'result': json.loads(row[3]) if row[3] else None,
+            'webhook': row[4],
+            'context': json.loads(row[5]) if row[5] else None,
+            'attempts': row[6],
+            'next_poll_at': row[7] if row[1] == STATE_TRACKING else None,
+            'created_at': row[8],
+            'updated_at': row[9]
+        }
+
+    def stats(self) -> Dict:
+        """各状态记录数"""
+        rows = self._conn().execute('SELECT state, COUNT(*) FROM publish_tracking GROUP BY state').fetchall()
+        return {state: count for state, count in rows}
+
+    def _interval(self, attempts: int) -> float:
+        """第 attempts 次查询后到下一次查询的间隔"""
+        return min(self.max_interval, self.initial_interval * (self.multiplier ** attempts))
+
+    def _claim_due(self, limit: int) -> List[str]:
+        """原子地领取到期的记录（顺延 CLAIM_LEASE 秒，查询完成后按实际间隔改写）"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT publish_id FROM publish_tracking WHERE state = ? AND next_poll_at <= ? '
+                'ORDER BY next_poll_at LIMIT ?',
+                (STATE_TRACKING, now, limit)
+            ).fetchall()
+            ids = [row[0] for row in rows]
+            conn.executemany(
+                'UPDATE publish_tracking SET next_poll_at = ? WHERE publish_id = ?',
+                [(now + CLAIM_LEASE, publish_id) for publish_id in ids]
+            )
+            conn.execute('COMMIT')
+            return ids
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _next_due(self) -> Optional[float]:
+        row = self._conn().execute(
+            'SELECT MIN(next_poll_at) FROM publish_tracking WHERE state = ?', (STATE_TRACKING,)
+        ).fetchone()
+        return row[0]
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                free = max(0, self.workers * 2 - len(self._inflight))
+            try:
+                due = self._claim_due(free) if free else []
+                next_due = self._next_due()
+            except sqlite3.OperationalError as e:
+                # 数据库被锁等错误：等一个扫描间隔后再试，避免空转
+                print(f"领取跟踪记录失败: {e}")
+                self._stop.wait(self.scan_interval)
+                continue
+
+            for publish_id in due:
+                with self._lock:
+                    self._inflight.add(publish_id)
+                self._executor.submit(self._poll, publish_id)
+
+            # 睡到最早的下一次查询时间；有到期记录但轮询线程已满时，等某次查询完成（新登记或查询完成都会提前唤醒）
+            wait = self.scan_interval if next_due is None else min(self.scan_interval, next_due - time.time())
+            if wait <= 0 and len(due) < free:
+                continue
+            with self._wakeup:
+                self._wakeup.wait(wait if wait > 0 else self.scan_interval)
+
+    def _poll(self, publish_id: str):
+        try:
+            record = self.get(publish_id)
+            if record is None or record['state'] != STATE_TRACKING:
+                return
+            try:
+                api = self.api(record['account']) if callable(self.api) else self.api
+                result = api.get_publish_status(publish_id)
+            except Exception as e:
+                result = {'success': False, 'error': str(e), 'message': f'状态查询异常: {str(e)}'}
+
+            now = time.time()
+            attempts = record['attempts'] + 1
+            status = result.get('publish_status') if result.get('success') else None
+
+            if status in PUBLISH_TERMINAL_STATUSES:
+                self._finish(publish_id, STATE_DONE, status, result, attempts)
+            elif now - record['created_at'] >= self.max_age:
+                result = {**result, 'message': '跟踪超时，未到达终态'}
+                self._finish(publish_id, STATE_EXPIRED, status, result, attempts)
+            else:
+                self._conn().execute(
+                    'UPDATE publish_tracking SET publish_status = COALESCE(?, publish_status), attempts = ?, '
+                    'next_poll_at = ?, updated_at = ? WHERE publish_id = ?',
+                    (status, attempts, now + self._interval(attempts), now, publish_id)
+                )
+        except Exception as e:
+            print(f"查询发布状态失败 {publish_id}: {e}")
+        finally:
+            with self._lock:
+                self._inflight.discard(publish_id)
+            with self._wakeup:
+                self._wakeup.notify()
+
+    def _finish(self, publish_id: str, state: str, status: Optional[int], result: Dict, attempts: int):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'UPDATE publish_tracking SET state = ?, publish_status = COALESCE(?, publish_status), result = ?, '
+            'attempts = ?, updated_at = ? WHERE publish_id = ?',
+            (state, status, json.dumps(result, ensure_ascii=False), attempts, now, publish_id)
+        )
+        if self.result_ttl > 0:
+            conn.execute(
+                'DELETE FROM publish_tracking WHERE state != ? AND updated_at < ?',
+                (STATE_TRACKING, now - self.result_ttl)
+            )
+
+        record = self.get(publish_id)
+        with self._lock:
+            waiters = self._waiters.pop(publish_id, [])
+        for callback in self._listeners:
+            self._call(callback, record)
+        for callback, future in waiters:
+            self._call(callback, record)
+            if not future.done():
+                future.set_result(record)
+        self._notify_webhook(record)
+
+    @staticmethod
+    def _call(callback: Optional[Callable[[Dict], None]], record: Dict):
+        if callback is None:
+            return
+        try:
+            callback(record)
+        except Exception as e:
+            print(f"发布状态回调异常 {record['publish_id']}: {e}")
+
+    def _notify_webhook(self, record: Optional[Dict]):
+        """把结果 POST 到 webhook，成功（2xx）后标记为已通知"""
+        if not record or not record.get('webhook'):
+            return
+        try:
+            self.check_webhook(record['webhook'])
+        except ValueError as e:
+            # 允许列表收紧前登记的记录
+            print(f"跳过 webhook 通知 {record['publish_id']}: {e}")
+            return
+        for attempt in range(self.webhook_retries + 1):
+            try:
+                resp = requests.post(record['webhook'], json=record, timeout=self.webhook_timeout)
+                if resp.status_code < 300:
+                    self._conn().execute(
+                        'UPDATE publish_tracking SET notified = 1 WHERE publish_id = ?', (record['publish_id'],)
+                    )
+                    return
+            except requests.RequestException:
+                pass
+            if attempt < self.webhook_retries:
+                time.sleep(backoff_delay(attempt))
+        print(f"webhook 通知失败 {record['publish_id']}: {record['webhook']}")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点相关性打分与 Top-K 选择
+综合标签权重、跨源出现次数、热榜排名和时效性打分，用堆取前 K 条，把抓取和改写的预算留给最有希望的热点
+"""
+
+import heapq
+import math
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# 标题归一化时去掉的字符（空白、标点）
+_TITLE_NOISE = re.compile(r'[\s\W_]+', re.UNICODE)
+
+# 热榜条目中可能表示发布时间的字段
+TIMESTAMP_FIELDS = ('pubDate', 'pub_date', 'publishTime', 'publish_time', 'timestamp', 'time', 'date', 'created_at')
+
+
+@dataclass
+class RankWeights:
+    """各项得分的权重"""
+    tag: float = 1.0
+    frequency: float = 0.5
+    rank: float = 1.0
+    recency: float = 0.5
+    # 时效性半衰期（秒）：发布超过该时长得分减半
+    half_life: float = 6 * 3600
+
+
+def normalize_title(title: str) -> str:
+    """归一化标题，用于识别不同热榜上的同一条热点"""
+    return _TITLE_NOISE.sub('', title or '').lower()
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """解析时间字段（秒/毫秒时间戳或 ISO 格式字符串），无法解析返回 None"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.isdigit()):
+        ts = float(value)
+        return ts / 1000 if ts > 1e11 else ts
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def item_timestamp(item: Dict) -> Optional[float]:
+    """取热点的发布时间"""
+    for field in TIMESTAMP_FIELDS:
+        ts = parse_timestamp(item.get(field))
+        if ts is not None:
+            return ts
+    return None
+
+
+def score_item(item: Dict, source_count: int, weights: RankWeights, now: float) -> float:
+    """
+    计算单条热点的得分
+
+    Args:
+        item: 热点，需包含 matched_tags（标签 -> 权重），可选 rank（榜单名次，从1开始）和发布时间
+        source_count: 该热点出现在几个热榜源
+        weights: 各项权重
+        now: 当前时间戳
+    """
+    tag_score = sum((item.get('matched_tags') or {}).values())
+
+    # 同一热点每多出现在一个源上加分，按对数递减
+    frequency_score = math.log2(source_count) if source_count > 1 else 0.0
+
+    rank = item.get('rank')
+    rank_score = 1 / math.log2(rank + 1) if rank and rank > 0 else 0.0
+
+    ts = item.get('published_at')
+    if ts is None:
+        recency_score = 0.0
+    else:
+        age = max(0.0, now - ts)
+        recency_score = 0.5 ** (age / weights.half_life) if weights.half_life > 0 else 0.0
+
+    return (weights.tag * tag_score
+            + weights.frequency * frequency_score
+            + weights.rank * rank_score
+            + weights.recency * recency_score)
+
+
+def rank_items(items: Iterable[Dict], k: int = 10, weights: Optional[RankWeights] = None,
+               now: Optional[float] = None, key: Optional[Callable[[Dict], Any]] = None) -> List[Dict]:
+    """
+    打分并选出得分最高的 K 条热点
+
+    同一话题出现在多个源时只保留得分最高的一条，并记录所有来源
+
+    Args:
+        key: 话题键，默认按归一化标题；可传入近似去重得到的话题编号
+
+    Returns:
+        List[Dict]: 按得分从高到低排列的热点，每条增加 score 和 sources 字段
+    """
+    weights = weights or RankWeights()
+    now = time.time() if now is None else now
+    key = key or (lambda item: normalize_title(item.get('title')))
+    items = list(items)
+
+    # 统计每个话题出现在哪些源
+    sources_by_topic: Dict[Any, List[str]] = {}
+    for item in items:
+        sources = sources_by_topic.setdefault(key(item), [])
+        if item.get('source') not in sources:
+            sources.append(item.get('source'))
+
+    best: Dict[Any, Dict] = {}
+    for item in items:
+        topic = key(item)
+        sources = sources_by_topic[topic]
+        score = score_item(item, len(sources), weights, now)
+        if topic not in best or score > best[topic]['score']:
+            best[topic] = dict(item, score=round(score, 4), sources=sources)
+
+    # 堆选 Top-K，不对全部候选排序；得分相同时保持原顺序
+    return [item for _, _, item in heapq.nlargest(
+        k, ((item['score'], -i, item) for i, item in enumerate(best.values()))
+    )]
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量 SSE（Server-Sent Events）解析
+边接收边解析 COZE 工作流的流式输出，收到第一条 Message 事件即可交给下一步处理
+"""
+
+import codecs
+import json
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+
+@dataclass
+class SSEEvent:
+    """一条完整的 SSE 事件"""
+    event: str = 'message'
+    data: str = ''
+    id: Optional[str] = None
+
+
+class SSEParser:
+    """
+    增量 SSE 解析器
+
+    通过 feed() 逐块喂入响应内容（str 或 bytes，可在任意位置切分），
+    每遇到空行即产出一条事件；多行 data 按规范以换行拼接
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._partial: List[str] = []
+        self._event = ''
+        self._data: List[str] = []
+        self._id = None
+
+    def feed(self, chunk: Union[str, bytes]) -> List[SSEEvent]:
+        """喂入一块数据，返回其中已完整的事件"""
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        if not chunk:
+            return []
+
+        # 没有换行时只暂存，避免长行被反复拼接扫描
+        if '\n' not in chunk:
+            self._partial.append(chunk)
+            return []
+
+        self._partial.append(chunk)
+        text = ''.join(self._partial)
+        lines = text.split('\n')
+        tail = lines.pop()
+        self._partial = [tail] if tail else []
+
+        events = []
+        for line in lines:
+            event = self._process_line(line[:-1] if line.endswith('\r') else line)
+            if event:
+                events.append(event)
+        return events
+
+    def close(self) -> List[SSEEvent]:
+        """流结束：处理残留的最后一行，并派发未以空行结尾的事件"""
+        events = self.feed(self._decoder.decode(b'', final=True) + '\n')
+        event = self._dispatch()
+        if event:
+            events.append(event)
+        return events
+
+    def _process_line(self, line: str) -> Optional[SSEEvent]:
+        if not line:
+            return self._dispatch()
+        if line.startswith(':'):
+            # 注释行（心跳）
+            return None
+
+        field, sep, value = line.partition(':')
+        if sep and value.startswith(' '):
+            value = value[1:]
+
+        if field == 'event':
+            self._event = value
+        elif field == 'data':
+            self._data.append(value)
+        elif field == 'id':
+            self._id = value
+        return None
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if not self._data and not self._event:
+            return None
+        event = SSEEvent(event=self._event or 'message', data='\n'.join(self._data), id=self._id)
+        self._event = ''
+        self._data = []
+        return event
+
+
+def iter_sse_events(chunks: Iterable[Union[str, bytes]]) -> Iterator[SSEEvent]:
+    """
+    将数据块流转换为事件流
+
+    Args:
+        chunks: 如 requests 的 resp.iter_content(chunk_size=None)，或完整的 SSE 文本列表
+    """
+    parser = SSEParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def decode_coze_message(event: SSEEvent) -> Optional[Dict]:
+    """
+    解析 COZE 的 Message 事件
+
+    data 是 JSON，其中 content 字段又是一层 JSON 字符串（双重编码），
+    返回解码后的 content（包含 title / output / cover 等字段），非 Message 或解析失败返回 None
+    """
+    try:
+        message = json.loads(event.data)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(message, dict):
+        return None
+    # 事件名可能在 event: 行，也可能在 data 的 JSON 里
+    if event.event != 'Message' and message.get('event') != 'Message':
+        return None
+
+    content = message.get('content', '{}')
+    if isinstance(content, dict):
+        return content
+    try:
+        content_data = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    return content_data if isinstance(content_data, dict) else None
+
+
+def decode_coze_error(event: SSEEvent) -> Optional[Dict]:
+    """
+    解析 COZE 的 Error 事件（HTTP 200 的流中途报错，如频率超限）
+
+    Returns:
+        Optional[Dict]: {'code': 错误码（无法解析时为 None）, 'message': 错误信息}；非 Error 事件返回 None
+    """
+    try:
+        data = json.loads(event.data)
+    except (json.JSONDecodeError, TypeError):
+        data = None
+    if not isinstance(data, dict):
+        data = {}
+    if event.event != 'Error' and data.get('event') != 'Error':
+        return None
+
+    # 错误详情可能直接在 data 里，也可能在 data.content 里（与 Message 一样再编码一层）
+    detail = data.get('content', data)
+    if isinstance(detail, str):
+        try:
+            detail = json.loads(detail)
+        except (json.JSONDecodeError, TypeError):
+            detail = {'error_message': detail}
+    if not isinstance(detail, dict):
+        detail = {}
+    code = detail.get('error_code', detail.get('code'))
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        code = None
+    message = detail.get('error_message') or detail.get('msg') or event.data
+    return {'code': code, 'message': str(message)}
+
+
+def first_coze_message(events: Iterable[SSEEvent]) -> Optional[Dict]:
+    """返回事件流中第一条可解析的 Message，一旦拿到就停止读取"""
+    for event in events:
+        message = decode_coze_message(event)
+        if message is not None:
+            return message
+    return None
+
+
+def parse_coze_sse_text(text: str) -> Optional[Dict]:
+    """解析完整的 COZE SSE 文本，返回第一条 Message 的内容"""
+    if not isinstance(text, str) or 'data' not in text:
+        return None
+    return first_coze_message(iter_sse_events([text]))
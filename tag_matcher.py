@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+偏好标签多模式匹配
+用全部标签（及同义词）一次性构建 Aho-Corasick 自动机，每个标题只扫描一遍即可得到所有命中的标签和权重
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+TagSpec = Union[Iterable[str], Dict[str, float]]
+
+
+class TagMatcher:
+    """
+    Aho-Corasick 标签匹配器（不区分大小写，子串匹配）
+
+    标签的先后顺序即优先级：first_match() 返回优先级最高的命中标签，
+    与逐个标签依次判断、命中即停止的结果一致
+    """
+
+    def __init__(self, tags: TagSpec, synonyms: Optional[Dict[str, Iterable[str]]] = None,
+                 default_weight: float = 1.0):
+        """
+        Args:
+            tags: 标签列表（权重均为 default_weight），或「标签 -> 权重」字典
+            synonyms: 「标签 -> 同义词列表」，命中同义词记为命中该标签
+            default_weight: 标签列表的默认权重
+        """
+        if isinstance(tags, dict):
+            weights = {tag: float(weight) for tag, weight in tags.items()}
+        else:
+            weights = {tag: default_weight for tag in tags}
+
+        self.tags: List[str] = list(weights)
+        self.weights: Dict[str, float] = weights
+        self._priority = {tag: i for i, tag in enumerate(self.tags)}
+
+        # 状态机：_goto[状态][字符] -> 状态，_output[状态] -> 命中的标签下标
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        for tag in self.tags:
+            self._add(tag, self._priority[tag])
+            for synonym in (synonyms or {}).get(tag, ()):
+                self._add(synonym, self._priority[tag])
+        self._build()
+
+    def _add(self, pattern: str, tag_index: int):
+        pattern = pattern.lower()
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        if tag_index not in self._output[state]:
+            self._output[state] += (tag_index,)
+
+    def _build(self):
+        """BFS 计算失败指针，并把失败链上的输出合并到每个状态"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                inherited = self._output[self._fail[next_state]]
+                if inherited:
+                    self._output[next_state] += tuple(i for i in inherited if i not in self._output[next_state])
+
+    def _scan(self, text: str) -> Iterable[int]:
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                yield from output[state]
+
+    def match(self, text: str) -> Dict[str, float]:
+        """
+        返回文本命中的所有标签及权重
+
+        Returns:
+            Dict[str, float]: 标签 -> 权重，按标签优先级排序
+        """
+        if not text:
+            return {}
+        hit = set(self._scan(text))
+        return {self.tags[i]: self.weights[self.tags[i]] for i in sorted(hit)}
+
+    def first_match(self, text: str) -> Optional[str]:
+        """返回优先级最高的命中标签，没有命中返回 None"""
+        if not text:
+            return None
+        best = None
+        for index in self._scan(text):
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return self.tags[best] if best is not None else None
+
+    def score(self, text: str) -> float:
+        """命中标签的权重之和"""
+        return sum(self.match(text).values())
@@ -6,11 +6,20 @@
 """
 
 import requests
-import json
-import re
 import os
+import threading
 from dotenv import load_dotenv
 
+from coze_client import CozeClient, CozeError, CozeResultCache
+from dedupe import (NGRAM, STATUS_PUBLISHED, DedupeIndex, group_near_duplicates,
+                    minhash, similarity)
+from hotlist import collect_hotlists, create_session
+from http_cache import HTTPCache
+from html_extract import extract_from_response
+from pipeline import Pipeline, Stage
+from ranking import item_timestamp, rank_items
+from tag_matcher import TagMatcher
+
 load_dotenv()
 
 # 配置
@@ -18,6 +27,15 @@ COZE_TOKEN = os.getenv('COZE_AUTH_TOKEN')
 COZE_WORKFLOW_ID = '7573873083216707599'
 DRAFT_API_URL = 'http://127.0.0.1:8001/publish-draft'
 
+# COZE 客户端：令牌桶限流 + 并发上限 + 重试 + 按输入缓存改写结果
+COZE_CLIENT = CozeClient(
+    COZE_TOKEN or '',
+    rate=float(os.getenv('COZE_RATE', '1')),
+    max_concurrency=int(os.getenv('COZE_MAX_CONCURRENCY', '2')),
+    max_retries=int(os.getenv('COZE_MAX_RETRIES', '4')),
+    cache=CozeResultCache(os.getenv('COZE_CACHE_PATH', 'coze_cache.db'))
+)
+
 # 偏好标签
 TAGS = [
     '新能源', '数据标注', '金融', '充电桩', '储能', '光伏',
@@ -26,9 +44,33 @@ TAGS = [
     '芯片', '半导体', '科技', '创业'
 ]
 
+# 标签匹配器（按 TAGS 构建一次，所有热点共用）
+TAG_MATCHER = TagMatcher(TAGS)
+
 # 热榜源
 SOURCES = ['bilibili', 'weibo', '36kr', 'ithome']
 
+# 单个热榜源的请求超时 / 整个采集阶段的截止时间（秒）
+HOTLIST_TIMEOUT = float(os.getenv('HOTLIST_TIMEOUT', '15'))
+HOTLIST_DEADLINE = float(os.getenv('HOTLIST_DEADLINE', '20'))
+
+# 热榜和网页正文的磁盘缓存（条件请求，未变化时不重新下载）
+HTTP_CACHE = HTTPCache(
+    os.getenv('HTTP_CACHE_PATH', 'http_cache.db'),
+    max_bytes=int(os.getenv('HTTP_CACHE_MAX_MB', '200')) * 1024 * 1024
+)
+
+# 进入抓取/改写阶段的热点数（按相关性得分取前K条）
+TOP_K = int(os.getenv('TOP_K', '10'))
+
+# 跨运行的话题指纹索引：已发布过的近似话题不再抓取和改写
+DEDUPE_INDEX = DedupeIndex(os.getenv('DEDUPE_INDEX_PATH', 'dedupe.db'))
+
+# 流水线各阶段并发数：抓取可以多开，COZE 改写受限流约束，发布串行
+FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', '8'))
+REWRITE_WORKERS = int(os.getenv('REWRITE_WORKERS', '2'))
+PUBLISH_WORKERS = int(os.getenv('PUBLISH_WORKERS', '1'))
+
 
 def step1_collect_hotlist():
     """步骤1: 采集热榜数据"""
@@ -36,20 +78,15 @@ def step1_collect_hotlist():
     print("步骤1: 采集热榜数据")
     print("=" * 60)
 
-    all_items = []
+    # 所有源并发采集，超过截止时间的源跳过，只用已返回的部分结果
+    session = create_session(len(SOURCES), cache=HTTP_CACHE)
+    all_items, report = collect_hotlists(SOURCES, session=session, timeout=HOTLIST_TIMEOUT, deadline=HOTLIST_DEADLINE)
     for source in SOURCES:
-        try:
-            url = f'https://top.miyucaicai.cn/api/s?id={source}'
-            resp = requests.get(url, timeout=15)
-            if resp.status_code == 200:
-                data = resp.json()
-                items = data.get('items', [])
-                print(f"  {source}: {len(items)}条")
-                for item in items:
-                    item['_source'] = source
-                all_items.extend(items)
-        except Exception as e:
-            print(f"  {source}: 错误 - {str(e)[:30]}")
+        status = report[source]
+        if status['ok']:
+            print(f"  {source}: {status['count']}条 ({status['elapsed']:.1f}s)")
+        else:
+            print(f"  {source}: 错误 - {status['error'][:30]}")
 
     print(f"\n  总计: {len(all_items)}条热点")
     return all_items
@@ -63,23 +100,34 @@ def step2_filter_by_tags(items):
 
     filtered = []
     for item in items:
-        title = item.get('title', '').lower()
-        for tag in TAGS:
-            if tag.lower() in title or tag in item.get('title', ''):
-                filtered.append({
-                    'title': item.get('title'),
-                    'url': item.get('url') or item.get('link') or item.get('mobileUrl'),
-                    'source': item.get('_source'),
-                    'matched_tag': tag
-                })
-                break
-
-    # 限制10条
-    filtered = filtered[:10]
+        # 一次扫描得到所有命中标签，matched_tag 仍取 TAGS 中排在最前的那个
+        matched = TAG_MATCHER.match(item.get('title') or '')
+        if matched:
+            filtered.append({
+                'title': item.get('title'),
+                'url': item.get('url') or item.get('link') or item.get('mobileUrl'),
+                'source': item.get('_source'),
+                'matched_tag': next(iter(matched)),
+                'matched_tags': matched,
+                'rank': item.get('_rank'),
+                'published_at': item_timestamp(item)
+            })
 
     print(f"  匹配偏好标签: {len(filtered)}条")
+
+    # 标题近似的热点归为同一话题，并跳过以前已发布的话题
+    group_near_duplicates(filtered)
+    fresh = [item for item in filtered if not DEDUPE_INDEX.find(item['signature'], 'title')]
+    if len(fresh) < len(filtered):
+        print(f"  跳过已发布话题: {len(filtered) - len(fresh)}条")
+    filtered = fresh
+
+    # 按标签权重、跨源热度、榜单名次和时效性打分，取前K条（同一话题只保留一条）
+    filtered = rank_items(filtered, k=TOP_K, key=lambda item: item['topic'])
+
+    print(f"  按得分取前{TOP_K}条: {len(filtered)}条")
     for i, item in enumerate(filtered[:5]):
-        print(f"    {i+1}. [{item['matched_tag']}] {item['title'][:35]}...")
+        print(f"    {i+1}. [{item['matched_tag']}] ({item['score']:.2f}) {item['title'][:35]}...")
 
     return filtered
 
@@ -93,24 +141,23 @@ def step3_fetch_content(url):
     }
 
     try:
-        resp = requests.get(url, headers=headers, timeout=15)
-        if resp.status_code == 200:
-            html = resp.text
-
-            # 简单清理HTML
-            text = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
-            text = re.sub(r'<style[^>]*>.*?</style>', '', text, flags=re.DOTALL | re.IGNORECASE)
-            text = re.sub(r'<[^>]+>', ' ', text)
-            text = re.sub(r'\s+', ' ', text).strip()
-
-            # 限制长度
-            if len(text) > 8000:
-                text = text[:8000]
+        # 缓存提取后的正文；过期后条件请求，网页未变化（304）时不重新下载
+        result = HTTP_CACHE.fetch(
+            url,
+            namespace='text',
+            # 边下载边提取正文，够 8000 字符即停止下载
+            read=lambda resp: extract_from_response(resp, max_chars=8000).encode('utf-8'),
+            headers=headers,
+            timeout=15
+        )
+        if result.status_code == 200:
+            text = result.body.decode('utf-8')
 
-            print(f"    提取内容: {len(text)}字符")
+            cached = '（缓存）' if result.from_cache or result.revalidated else ''
+            print(f"    提取内容: {len(text)}字符{cached}")
             return text
         else:
-            print(f"    HTTP错误: {resp.status_code}")
+            print(f"    HTTP错误: {result.status_code}")
             return None
     except Exception as e:
         print(f"    错误: {str(e)[:50]}")
@@ -125,51 +172,24 @@ def step4_coze_rewrite(content, title):
         print("    错误: COZE_TOKEN未配置")
         return None
 
-    headers = {
-        'Authorization': f'Bearer {COZE_TOKEN}',
-        'Content-Type': 'application/json'
-    }
-
-    payload = {
-        'workflow_id': COZE_WORKFLOW_ID,
-        'parameters': {
-            'input': content[:5000]  # COZE有输入限制
-        }
+    parameters = {
+        'input': content[:5000]  # COZE有输入限制
     }
 
     try:
-        resp = requests.post(
-            'https://api.coze.cn/v1/workflow/stream_run',
-            headers=headers,
-            json=payload,
-            timeout=120
-        )
+        # 限流、并发上限、429/5xx 重试和结果缓存都由 COZE_CLIENT 处理
+        result_data = COZE_CLIENT.run_workflow(COZE_WORKFLOW_ID, parameters)
 
-        if resp.status_code == 200:
-            # 解析SSE响应
-            result_data = None
-            for line in resp.text.split('\n'):
-                if line.startswith('data:'):
-                    try:
-                        data = json.loads(line[5:].strip())
-                        if data.get('event') == 'Message':
-                            content_str = data.get('content', '{}')
-                            result_data = json.loads(content_str)
-                    except:
-                        pass
-
-            if result_data:
-                print(f"    改写成功!")
-                print(f"    标题: {result_data.get('title', '')[:30]}...")
-                return result_data
-            else:
-                print(f"    解析响应失败")
-                print(f"    响应: {resp.text[:200]}")
-                return None
+        if result_data:
+            print(f"    改写成功!")
+            print(f"    标题: {result_data.get('title', '')[:30]}...")
+            return result_data
         else:
-            print(f"    COZE错误: {resp.status_code}")
-            print(f"    响应: {resp.text[:200]}")
+            print(f"    解析响应失败: 流中没有可解析的Message事件")
             return None
+    except CozeError as e:
+        print(f"    {str(e)[:200]}")
+        return None
     except Exception as e:
         print(f"    错误: {str(e)[:50]}")
         return None
@@ -194,6 +214,72 @@ def step5_publish_draft(data):
         return False
 
 
+# 本次运行中已抓取的正文签名（同批次内正文重复的热点只处理一条）
+_seen_contents = []
+_seen_lock = threading.Lock()
+
+
+def fetch_stage(item):
+    """流水线阶段: 抓取正文并按正文去重"""
+    content = step3_fetch_content(item['url'])
+    if not content:
+        raise Exception('无法抓取网页内容')
+
+    signature = minhash(content, NGRAM['content'])
+    with _seen_lock:
+        duplicate = DEDUPE_INDEX.find(signature, 'content')
+        in_run = duplicate is None and any(
+            similarity(signature, seen) >= DEDUPE_INDEX.threshold for seen in _seen_contents
+        )
+        if duplicate is None and not in_run:
+            _seen_contents.append(signature)
+
+    if in_run:
+        # 本次运行中的另一条热点可能还会发布失败，不记录，下次运行仍可重新选中
+        print("    正文与本次运行中的其他热点重复，跳过")
+        return None
+    if duplicate:
+        print(f"    正文与已发布话题重复: {(duplicate['title'] or '')[:30]}，跳过")
+        DEDUPE_INDEX.add(item['signature'], 'title', item['title'], item['url'], duplicate['status'])
+        return None
+    return dict(item, content=content, content_signature=signature)
+
+
+def rewrite_stage(item):
+    """流水线阶段: COZE改写"""
+    rewritten = step4_coze_rewrite(item['content'], item['title'])
+    if not rewritten:
+        raise Exception('COZE改写失败')
+
+    return dict(item, rewritten=rewritten)
+
+
+def publish_stage(item):
+    """流水线阶段: 发布草稿"""
+    rewritten = item['rewritten']
+    draft_data = {
+        'title': rewritten.get('title', item['title']),
+        'content': rewritten.get('output', ''),
+        'cover_url': rewritten.get('cover', '')
+    }
+    if not step5_publish_draft(draft_data):
+        raise Exception('发布草稿失败')
+
+    # 发布成功后才记录话题：抓取、改写或发布中途失败的话题下次运行仍会被选中重试
+    DEDUPE_INDEX.add(item['signature'], 'title', item['title'], item['url'], STATUS_PUBLISHED)
+    DEDUPE_INDEX.add(item['content_signature'], 'content', item['title'], item['url'], STATUS_PUBLISHED)
+    return item
+
+
+def build_pipeline():
+    """抓取 -> 改写 -> 发布 流水线"""
+    return Pipeline([
+        Stage('抓取', fetch_stage, workers=FETCH_WORKERS),
+        Stage('改写', rewrite_stage, workers=REWRITE_WORKERS),
+        Stage('发布', publish_stage, workers=PUBLISH_WORKERS),
+    ], describe=lambda item: item['title'][:30])
+
+
 def main():
     print("\n" + "=" * 60)
     print("完整自动采集流程测试")
@@ -211,47 +297,23 @@ def main():
         print("\n[失败] 没有匹配偏好标签的热点")
         return
 
-    # 只测试第一条
-    test_item = filtered[0]
-    print(f"\n测试热点: {test_item['title']}")
-    print(f"URL: {test_item['url']}")
-
-    # 步骤3: 抓取内容
+    # 步骤3-5: 各条热点在 抓取 -> 改写 -> 发布 流水线中并发处理，单条失败不影响其他热点
     print("\n" + "=" * 60)
-    print("步骤3: 抓取网页内容")
+    print("步骤3-5: 抓取网页内容 -> COZE AI改写 -> 发布微信草稿")
     print("=" * 60)
-    content = step3_fetch_content(test_item['url'])
-    if not content:
-        print("\n[失败] 无法抓取网页内容")
-        return
-
-    # 步骤4: COZE改写
-    print("\n" + "=" * 60)
-    print("步骤4: COZE AI改写")
-    print("=" * 60)
-    rewritten = step4_coze_rewrite(content, test_item['title'])
-    if not rewritten:
-        print("\n[失败] COZE改写失败")
-        return
+    summary = build_pipeline().run(filtered)
 
-    # 步骤5: 发布草稿
     print("\n" + "=" * 60)
-    print("步骤5: 发布微信草稿")
+    print("运行汇总")
     print("=" * 60)
-
-    draft_data = {
-        'title': rewritten.get('title', test_item['title']),
-        'content': rewritten.get('output', ''),
-        'cover_url': rewritten.get('cover', '')
-    }
-
-    success = step5_publish_draft(draft_data)
+    for line in summary.lines():
+        print(f"  {line}")
 
     print("\n" + "=" * 60)
-    if success:
-        print("[成功] 完整流程测试通过!")
+    if summary.results:
+        print(f"[成功] 完整流程测试通过! 发布 {len(summary.results)}/{len(filtered)} 条")
     else:
-        print("[失败] 发布草稿失败")
+        print("[失败] 没有热点完成发布")
     print("=" * 60)
 
 
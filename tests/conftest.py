@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""测试公共设施：把仓库根目录加入 sys.path，并提供不走网络的 requests 假适配器"""
+
+import io
+import json
+import os
+import sys
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeAdapter(BaseAdapter):
+    """
+    按 handler(request) 的返回值构造响应的 requests 适配器
+
+    handler 返回 dict（200 JSON）、(状态码, dict/bytes) 或异常实例（抛出）
+    """
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        result = self.handler(request)
+        if isinstance(result, Exception):
+            raise result
+        status, body = result if isinstance(result, tuple) else (200, result)
+        response = requests.Response()
+        response.status_code = status
+        response.request = request
+        response.url = request.url
+        response._content = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+        # stream=True 时 iter_content 从 raw 读取
+        response.raw = io.BytesIO(response._content)
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_session():
+    """返回工厂：fake_session(handler) -> (requests.Session, FakeAdapter)"""
+    def make(handler):
+        session = requests.Session()
+        adapter = FakeAdapter(handler)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session, adapter
+    return make
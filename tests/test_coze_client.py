@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""COZE 客户端：HTTP 错误与流中 Error 事件的重试、结果缓存"""
+
+import json
+
+import pytest
+
+import coze_client
+from coze_client import CozeClient, CozeError, CozeResultCache
+
+
+def sse(*events):
+    """把 (事件名, data 对象) 拼成 SSE 文本"""
+    return ''.join(f'event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n' for name, data in events).encode()
+
+
+MESSAGE = ('Message', {'content': json.dumps({'title': '标题', 'output': '正文'})})
+RATE_LIMITED = ('Error', {'error_code': 4013, 'error_message': 'Request frequency exceeds limit'})
+
+
+@pytest.fixture
+def client(fake_session, monkeypatch):
+    delays = []
+    monkeypatch.setattr(coze_client.time, 'sleep', delays.append)
+
+    def make(replies, **kwargs):
+        replies = iter(replies)
+        session, adapter = fake_session(lambda request: next(replies))
+        coze = CozeClient('token', rate=0, backoff_base=1, backoff_max=8, **kwargs)
+        coze.session = session
+        return coze, adapter, delays
+    return make
+
+
+def test_rate_limit_error_event_is_retried_with_backoff(client):
+    coze, adapter, delays = client([(200, sse(RATE_LIMITED)), (200, sse(RATE_LIMITED)), (200, sse(MESSAGE))])
+    assert coze.run_workflow('wf', {'input': 'x'}) == {'title': '标题', 'output': '正文'}
+    assert len(adapter.requests) == 3
+    assert len(delays) == 2 and all(0 <= delay <= 8 for delay in delays)
+
+
+def test_non_retryable_error_event_raises(client):
+    coze, adapter, _ = client([(200, sse(('Error', {'error_code': 4000, 'error_message': 'bad param'})))])
+    with pytest.raises(CozeError) as info:
+        coze.run_workflow('wf', {'input': 'x'})
+    assert info.value.error_code == 4000
+    assert 'bad param' in str(info.value)
+    assert len(adapter.requests) == 1
+
+
+def test_retries_exhausted_on_persistent_rate_limit(client):
+    coze, adapter, _ = client([(200, sse(RATE_LIMITED))] * 3, max_retries=2)
+    with pytest.raises(CozeError) as info:
+        coze.run_workflow('wf', {'input': 'x'})
+    assert info.value.error_code == 4013
+    assert len(adapter.requests) == 3
+
+
+def test_http_429_retried_then_cached(client, tmp_path):
+    cache = CozeResultCache(str(tmp_path / 'coze.db'))
+    coze, adapter, _ = client([(429, b'busy'), (200, sse(MESSAGE))], cache=cache)
+    assert coze.run_workflow('wf', {'input': 'x'})['title'] == '标题'
+    assert coze.run_workflow('wf', {'input': 'x'})['title'] == '标题'
+    assert len(adapter.requests) == 2
+    assert cache.stats()['hits'] == 1
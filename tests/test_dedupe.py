@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""MinHash / LSH 近似去重：签名相似度、批次内归并与跨运行索引"""
+
+import time
+
+from dedupe import NGRAM, NUM_PERM, STATUS_PUBLISHED, DedupeIndex, band_keys, group_near_duplicates, minhash, \
+    similarity
+
+TITLE = '某公司发布新一代人工智能芯片，性能提升三倍'
+NEAR = '某公司发布新一代人工智能芯片 性能提升三倍！'
+OTHER = '今日多地迎来强降雨，气象台发布暴雨预警'
+
+
+def test_signature_properties():
+    signature = minhash(TITLE)
+    assert len(signature) == NUM_PERM
+    assert minhash(TITLE) == signature
+    assert minhash('') is None and minhash('，。 ') is None
+    assert similarity(signature, minhash(NEAR)) == 1.0
+    assert similarity(signature, minhash(OTHER)) < 0.2
+    assert len(set(band_keys(signature))) == len(band_keys(signature))
+
+
+def test_similarity_tracks_jaccard():
+    base = '一二三四五六七八九十甲乙丙丁戊己庚辛壬癸'
+    edited = base[:14] + '子丑寅卯卯辰'
+    estimate = similarity(minhash(base), minhash(edited))
+    grams = lambda text: {text[i:i + 2] for i in range(len(text) - 1)}
+    jaccard = len(grams(base) & grams(edited)) / len(grams(base) | grams(edited))
+    assert abs(estimate - jaccard) < 0.2
+
+
+def test_group_near_duplicates_in_batch():
+    items = [{'title': TITLE}, {'title': OTHER}, {'title': NEAR}, {'title': ''}]
+    group_near_duplicates(items)
+    assert [item['topic'] for item in items] == [0, 1, 0, 3]
+    assert items[3]['signature'] is None
+
+
+def test_index_finds_across_runs_and_expires(tmp_path):
+    path = str(tmp_path / 'dedupe.db')
+    DedupeIndex(path).add(minhash(TITLE), 'title', TITLE, 'http://a', STATUS_PUBLISHED)
+
+    index = DedupeIndex(path)
+    found = index.find(minhash(NEAR), 'title')
+    assert found['url'] == 'http://a' and found['status'] == STATUS_PUBLISHED
+    assert index.find(minhash(OTHER), 'title') is None
+    # 类型互相隔离
+    assert index.find(minhash(NEAR), 'content') is None
+    assert index.find_text(NEAR, 'title') is not None
+    assert index.stats() == {f'title:{STATUS_PUBLISHED}': 1}
+
+    index._conn.execute('UPDATE topics SET created_at = ?', (time.time() - index.ttl - 1,))
+    index._conn.commit()
+    assert index.find(minhash(NEAR), 'title') is None
+    index.add_text(OTHER, 'content')
+    assert index.stats() == {'content:processed': 1}
+    assert NGRAM['content'] == 3
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""幂等存储：占用、完成、失败释放，以及多线程 / fork 后各自使用独立连接"""
+
+import os
+import threading
+
+import pytest
+
+from idempotency import STATUS_DONE, STATUS_PENDING, IdempotencyStore, derive_idempotency_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IdempotencyStore(str(tmp_path / 'idem.db'))
+
+
+def test_begin_is_exclusive_until_completed(store):
+    assert store.begin('k', job_id='j1') is None
+    existing = store.begin('k', job_id='j2')
+    assert existing['status'] == STATUS_PENDING and existing['job_id'] == 'j1'
+
+    store.complete('k', {'success': True, 'media_id': 'D1'})
+    record = store.begin('k')
+    assert record['status'] == STATUS_DONE
+    assert record['result']['media_id'] == 'D1'
+
+
+def test_failure_releases_key(store):
+    store.begin('k')
+    store.complete('k', {'success': False})
+    assert store.get('k') is None
+    assert store.begin('k') is None
+
+
+def test_expired_pending_can_be_taken_over(tmp_path):
+    store = IdempotencyStore(str(tmp_path / 'idem.db'), pending_timeout=0)
+    store.begin('k', job_id='j1')
+    assert store.begin('k', job_id='j2') is None
+    assert store.get('k') is None
+
+
+def test_concurrent_begin_grants_key_once(store):
+    winners = []
+    barrier = threading.Barrier(8)
+
+    def claim():
+        barrier.wait()
+        if store.begin('same') is None:
+            winners.append(threading.get_ident())
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(winners) == 1
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='需要 fork')
+def test_forked_child_uses_its_own_connection(store):
+    store.begin('parent')
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            if store.get('parent') and store.begin('child') is None:
+                code = 0
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert store.get('child')['status'] == STATUS_PENDING
+
+
+def test_derived_key_depends_on_title_and_content():
+    assert derive_idempotency_key('a', 'bc') != derive_idempotency_key('ab', 'c')
+    assert derive_idempotency_key('a', 'b') == derive_idempotency_key('a', 'b')
+
+
+def test_pending_record_lives_while_its_job_is_active(tmp_path):
+    active = {'j1'}
+    store = IdempotencyStore(str(tmp_path / 'idem.db'), pending_timeout=0, job_active=lambda job_id: job_id in active)
+    assert store.begin('k', job_id='j1') is None
+    # 任务排队超过 pending_timeout：重复提交仍返回处理中记录，不会再发布一次
+    assert store.begin('k', job_id='j2')['job_id'] == 'j1'
+
+    active.clear()
+    assert store.begin('k', job_id='j3') is None
+    assert store.get('k') is None
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""图片预处理：动图保留与只读文件头的预判"""
+
+import hashlib
+import io
+
+import pytest
+
+from image_prep import MEDIA_LIMITS, PROBE_BYTES, needs_preparation, prepare_image
+from upload_cache import HashingReader
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def animated_gif(width=1500, height=900, frames=3):
+    images = [Image.effect_noise((width, height), 80).convert('P') for _ in range(frames)]
+    buf = io.BytesIO()
+    images[0].save(buf, 'GIF', save_all=True, append_images=images[1:])
+    return buf.getvalue()
+
+
+def jpeg(width, height, quality=90):
+    buf = io.BytesIO()
+    Image.effect_noise((width, height), 50).convert('RGB').save(buf, 'JPEG', quality=quality)
+    return buf.getvalue()
+
+
+def test_animated_gif_over_budget_kept_while_within_wechat_limit():
+    data = animated_gif()
+    assert 2 * 1024 * 1024 < len(data) <= MEDIA_LIMITS['image'].max_bytes
+    prepared = prepare_image(data, 'image', 1080, 2 * 1024 * 1024)
+    assert prepared.data is data
+    assert prepared.format == 'gif'
+    assert not prepared.converted
+
+
+def test_animated_gif_flattened_when_wechat_would_reject(capsys):
+    prepared = prepare_image(animated_gif(400, 300), 'thumb', 900, 64 * 1024)
+    assert prepared.format == 'jpeg'
+    assert prepared.converted
+    assert '动画将丢失' in capsys.readouterr().out
+
+
+def test_needs_preparation_from_head_only():
+    data = animated_gif()
+    assert not needs_preparation(data[:PROBE_BYTES], len(data), 'image', 1080, 2 * 1024 * 1024)
+    wide = jpeg(2000, 600)
+    assert needs_preparation(wide[:PROBE_BYTES], len(wide), 'image', 1080, 2 * 1024 * 1024)
+    assert not needs_preparation(wide[:PROBE_BYTES], len(wide), 'image', 4000, 10 * 1024 * 1024)
+    assert needs_preparation(b'RIFF\x00\x00\x00\x00WEBPVP8 ', 100, 'image')
+
+
+def test_hashing_reader_serves_prefix_first():
+    data = bytes(range(256)) * 10
+    reader = HashingReader(io.BytesIO(data[100:]), length=len(data), prefix=data[:100])
+    out = reader.read(30) + reader.read(200) + reader.read()
+    assert out == data
+    assert reader.hexdigest() == hashlib.sha256(data).hexdigest()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""任务队列：租约领取、过期重领、最多领取次数与 worker 执行"""
+
+import time
+
+import pytest
+
+from job_queue import STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING, STATUS_SUCCEEDED, JobQueue
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(handler=lambda payload: {'success': True}, owner='worker-a', **kwargs):
+        queue = JobQueue(handler, db_path=str(tmp_path / 'jobs.db'), poll_interval=0.05, **kwargs)
+        queue.owner = owner
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop(timeout=2)
+
+
+def expire_lease(queue, job_id):
+    queue._conn().execute('UPDATE jobs SET lease_until = ? WHERE id = ?', (time.time() - 1, job_id))
+
+
+def test_live_lease_is_not_stolen(make_queue):
+    first = make_queue()
+    second = make_queue(owner='worker-b')
+    job_id = first.submit({'n': 1})
+    assert first._claim()[0] == job_id
+    assert second._claim() is None
+    assert first.is_active(job_id)
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_cannot_finish(make_queue):
+    first = make_queue()
+    second = make_queue(owner='worker-b')
+    job_id = first.submit({'n': 1})
+    first._claim()
+    expire_lease(first, job_id)
+    assert not first.is_active(job_id)
+    assert second._claim()[0] == job_id
+
+    first._finish(job_id, STATUS_SUCCEEDED, result={'success': True})
+    assert first.get(job_id)['status'] == STATUS_RUNNING
+    second._finish(job_id, STATUS_SUCCEEDED, result={'success': True})
+    job = first.get(job_id)
+    assert job['status'] == STATUS_SUCCEEDED and job['attempts'] == 2
+
+
+def test_job_failed_after_max_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    job_id = queue.submit({'n': 1})
+    for _ in range(2):
+        assert queue._claim()[0] == job_id
+        expire_lease(queue, job_id)
+    assert queue._claim() is None
+    job = queue.get(job_id)
+    assert job['status'] == STATUS_FAILED
+    assert job['attempts'] == 2
+    assert not queue.is_active(job_id)
+
+
+def test_workers_run_submitted_jobs(make_queue):
+    queue = make_queue(handler=lambda payload: {'success': payload['n'] % 2 == 0, 'error': 'odd'})
+    ids = [queue.submit({'n': n}) for n in range(4)]
+    assert queue.is_active(ids[0]) and queue.get(ids[0])['status'] == STATUS_QUEUED
+    queue.start()
+    deadline = time.time() + 5
+    while time.time() < deadline and any(queue.is_active(job_id) for job_id in ids):
+        time.sleep(0.05)
+    assert [queue.get(job_id)['status'] for job_id in ids] == [
+        STATUS_SUCCEEDED, STATUS_FAILED, STATUS_SUCCEEDED, STATUS_FAILED
+    ]
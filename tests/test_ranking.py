@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""热点打分与 Top-K：与全量排序一致、按话题合并来源、时间解析"""
+
+import random
+
+from ranking import RankWeights, normalize_title, parse_timestamp, rank_items, score_item
+
+NOW = 1_700_000_000
+
+
+def test_top_k_matches_full_sort():
+    rng = random.Random(3)
+    items = [{'title': f'热点{i}', 'source': rng.choice('abc'), 'rank': rng.randint(1, 50),
+              'matched_tags': {'t': rng.choice([0.5, 1, 2])},
+              'published_at': NOW - rng.randint(0, 48 * 3600)} for i in range(200)]
+    for k in (1, 10, 50, 500):
+        top = rank_items(items, k=k, now=NOW)
+        scores = [item['score'] for item in top]
+        assert len(top) == min(k, len(items))
+        assert scores == sorted(scores, reverse=True)
+        expected = sorted((round(score_item(item, 1, RankWeights(), NOW), 4) for item in items), reverse=True)[:k]
+        assert scores == expected
+
+
+def test_same_topic_merged_with_frequency_bonus():
+    items = [
+        {'title': 'A 事件！', 'source': 'weibo', 'rank': 5, 'matched_tags': {'x': 1}},
+        {'title': 'a事件', 'source': 'zhihu', 'rank': 1, 'matched_tags': {'x': 1}},
+        {'title': 'B 事件', 'source': 'weibo', 'rank': 1, 'matched_tags': {'x': 1}},
+    ]
+    top = rank_items(items, k=10, now=NOW)
+    assert [item['title'] for item in top] == ['a事件', 'B 事件']
+    assert top[0]['sources'] == ['weibo', 'zhihu']
+    assert top[0]['score'] > top[1]['score']
+
+
+def test_custom_topic_key_and_stable_ties():
+    items = [{'title': str(i), 'source': 's', 'topic': i % 3} for i in range(6)]
+    top = rank_items(items, k=3, now=NOW, key=lambda item: item['topic'])
+    assert [item['title'] for item in top] == ['0', '1', '2']
+
+
+def test_recency_half_life():
+    weights = RankWeights(tag=0, frequency=0, rank=0, recency=1, half_life=3600)
+    assert score_item({'published_at': NOW}, 1, weights, NOW) == 1
+    assert score_item({'published_at': NOW - 3600}, 1, weights, NOW) == 0.5
+    assert score_item({}, 1, weights, NOW) == 0
+
+
+def test_parse_timestamp_and_normalize():
+    assert parse_timestamp(NOW) == NOW
+    assert parse_timestamp(str(NOW * 1000)) == NOW
+    assert parse_timestamp('2023-11-14T22:13:20Z') == NOW
+    assert parse_timestamp('昨天') is None and parse_timestamp('') is None
+    assert normalize_title(' Hello, 世界！') == 'hello世界'
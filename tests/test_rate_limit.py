@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""令牌桶限流与带抖动的指数退避"""
+
+import random
+
+from rate_limit import TokenBucket, backoff_delay
+
+
+def test_bucket_allows_burst_then_reports_wait():
+    bucket = TokenBucket(rate=10, capacity=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.1
+    assert not bucket.acquire(timeout=0)
+
+
+def test_bucket_acquire_waits_for_refill():
+    bucket = TokenBucket(rate=50, capacity=1)
+    assert bucket.acquire()
+    assert bucket.acquire(timeout=1)
+
+
+def test_unlimited_bucket():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.try_acquire() == 0 for _ in range(1000))
+
+
+def test_backoff_is_jittered_and_capped():
+    random.seed(1)
+    for attempt in range(10):
+        delays = [backoff_delay(attempt, base=1, cap=8) for _ in range(50)]
+        assert all(0 <= delay <= min(8, 2 ** attempt) for delay in delays)
+        assert len(set(delays)) > 1
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""增量 SSE 解析：任意切分、CRLF、多行 data、注释，以及 COZE Message / Error 事件解码"""
+
+import json
+
+from sse_parser import (SSEEvent, SSEParser, decode_coze_error, decode_coze_message, first_coze_message,
+                        iter_sse_events, parse_coze_sse_text)
+
+STREAM = (
+    ': ping\n'
+    'id: 1\n'
+    'event: Message\n'
+    'data: {"content": "{\\"title\\": \\"标题\\", \\"output\\": \\"正文\\"}"}\n'
+    '\n'
+    'event: Done\n'
+    'data: line1\n'
+    'data: line2\n'
+    '\n'
+)
+
+
+def test_events_independent_of_chunking():
+    expected = list(iter_sse_events([STREAM]))
+    raw = STREAM.encode('utf-8')
+    for size in (1, 2, 3, 7, 64):
+        chunks = [raw[i:i + size] for i in range(0, len(raw), size)]
+        assert list(iter_sse_events(chunks)) == expected
+    assert [event.event for event in expected] == ['Message', 'Done']
+    assert expected[0].id == '1'
+    assert expected[1].data == 'line1\nline2'
+
+
+def test_crlf_and_unterminated_last_event():
+    parser = SSEParser()
+    events = parser.feed('event: a\r\ndata: x\r\n\r\ndata: tail')
+    assert events == [SSEEvent('a', 'x')]
+    assert parser.close() == [SSEEvent('message', 'tail')]
+
+
+def test_multibyte_character_split_across_chunks():
+    raw = 'data: 中文\n\n'.encode('utf-8')
+    split = raw.index('中'.encode('utf-8')) + 1
+    assert list(iter_sse_events([raw[:split], raw[split:]])) == [SSEEvent('message', '中文')]
+
+
+def test_decode_coze_message_double_encoded():
+    event = next(iter_sse_events([STREAM]))
+    assert decode_coze_message(event) == {'title': '标题', 'output': '正文'}
+    assert decode_coze_message(SSEEvent('Done', '{}')) is None
+    # 事件名写在 data 里
+    inline = SSEEvent('message', json.dumps({'event': 'Message', 'content': {'title': 't'}}))
+    assert decode_coze_message(inline) == {'title': 't'}
+
+
+def test_first_message_stops_reading():
+    consumed = []
+
+    def chunks():
+        for chunk in (STREAM, 'data: never\n\n'):
+            consumed.append(chunk)
+            yield chunk
+
+    assert first_coze_message(iter_sse_events(chunks()))['title'] == '标题'
+    assert len(consumed) == 1
+    assert parse_coze_sse_text(STREAM)['output'] == '正文'
+    assert parse_coze_sse_text('') is None
+
+
+def test_decode_coze_error_event():
+    error = decode_coze_error(SSEEvent('Error', '{"error_code": 4013, "error_message": "too many requests"}'))
+    assert error == {'code': 4013, 'message': 'too many requests'}
+    nested = SSEEvent('message', json.dumps({'event': 'Error', 'content': json.dumps({'code': '5000', 'msg': 'x'})}))
+    assert decode_coze_error(nested) == {'code': 5000, 'message': 'x'}
+    assert decode_coze_error(SSEEvent('Error', 'not json'))['code'] is None
+    assert decode_coze_error(SSEEvent('Message', '{"error_code": 1}')) is None
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Aho-Corasick 标签匹配：与逐个标签子串判断的结果一致"""
+
+import random
+
+from tag_matcher import TagMatcher
+
+
+def naive_match(tags, synonyms, text):
+    text = text.lower()
+    return [tag for tag in tags
+            if any(pattern.lower() in text for pattern in [tag, *synonyms.get(tag, ())] if pattern)]
+
+
+def test_overlapping_patterns_and_priority():
+    matcher = TagMatcher(['he', 'she', 'his', 'hers'])
+    assert list(matcher.match('ushers')) == ['he', 'she', 'hers']
+    assert matcher.first_match('ushers') == 'he'
+    assert matcher.first_match('this') == 'his'
+    assert matcher.match('') == {} and matcher.first_match('') is None
+
+
+def test_synonyms_weights_and_case():
+    matcher = TagMatcher({'AI': 2.0, '芯片': 1.5}, synonyms={'AI': ['人工智能', 'GPT'], '芯片': ['半导体']})
+    assert matcher.match('国产半导体与人工智能') == {'AI': 2.0, '芯片': 1.5}
+    assert matcher.first_match('新版 gpt 发布') == 'AI'
+    assert matcher.score('ai 芯片') == 3.5
+    assert matcher.match('天气预报') == {}
+
+
+def test_matches_naive_scan_on_random_text():
+    rng = random.Random(7)
+    alphabet = 'abc人工'
+    tags = sorted({''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(30)})
+    rng.shuffle(tags)
+    synonyms = {tag: [''.join(rng.choice(alphabet) for _ in range(3))] for tag in tags[:5]}
+    matcher = TagMatcher(tags, synonyms=synonyms)
+    for _ in range(300):
+        text = ''.join(rng.choice(alphabet + 'AB ') for _ in range(rng.randint(0, 20)))
+        expected = naive_match(tags, synonyms, text)
+        assert list(matcher.match(text)) == expected
+        assert matcher.first_match(text) == (expected[0] if expected else None)
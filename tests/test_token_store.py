@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""令牌存储：文件存储的并发写入，以及失效与刷新共用存储锁"""
+
+import os
+import threading
+import time
+
+from token_store import FileTokenStore, create_token_store
+from wechat_sdk import AccessTokenCache
+
+
+def test_concurrent_saves_use_unique_temp_files(tmp_path):
+    store = FileTokenStore(str(tmp_path / 'token.json'))
+    errors = []
+
+    def save(i):
+        try:
+            for j in range(30):
+                with store.lock(f'app{i}'):
+                    store.save(f'app{i}', f'T{i}-{j}', time.time() + 600)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert sorted(os.listdir(tmp_path)) == ['token.json', 'token.json.lock']
+    assert store.load('app0')[0] == 'T0-29'
+
+
+def test_invalidate_does_not_clear_token_refreshed_elsewhere(tmp_path):
+    path = str(tmp_path / 'token.json')
+    # 两个缓存对象模拟两个进程
+    first = AccessTokenCache(FileTokenStore(path), 'app')
+    second = AccessTokenCache(FileTokenStore(path), 'app')
+    first.refresh(lambda: {'access_token': 'T1', 'expires_in': 7200})
+
+    holding = threading.Event()
+    release = threading.Event()
+
+    def refresh_elsewhere():
+        with second.store.lock('app'):
+            holding.set()
+            release.wait(5)
+            second.update({'access_token': 'T2', 'expires_in': 7200})
+
+    worker = threading.Thread(target=refresh_elsewhere)
+    worker.start()
+    holding.wait(5)
+    invalidator = threading.Thread(target=first.invalidate, args=('T1',))
+    invalidator.start()
+    time.sleep(0.2)
+    # 另一方持有存储锁期间，失效操作必须等待
+    assert invalidator.is_alive()
+    release.set()
+    worker.join(5)
+    invalidator.join(5)
+
+    assert first.store.load('app')[0] == 'T2'
+    assert first.get() == 'T2'
+
+
+def test_create_token_store_specs(tmp_path):
+    assert create_token_store('') is None
+    assert create_token_store('memory') is None
+    store = create_token_store(f'file:{tmp_path}/t.json')
+    assert isinstance(store, FileTokenStore) and store.path == f'{tmp_path}/t.json'
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""账号限流：每分钟频率与每日配额的扣减顺序、未发出请求退还配额"""
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from wechat_accounts import AccountLimiter, DailyQuotaStore, QuotaExceededError
+from wechat_sdk import AccessTokenCache, WeChatAPI
+
+
+def test_minute_limit_timeout_does_not_spend_daily_quota():
+    store = DailyQuotaStore(':memory:')
+    limiter = AccountLimiter('a', per_minute=1, daily_quotas={'draft/add': 5}, max_wait=0, quota_store=store)
+    limiter.acquire('draft/add')
+    for _ in range(3):
+        with pytest.raises(QuotaExceededError):
+            limiter.acquire('draft/add')
+    assert store.usage('a') == {'draft/add': 1}
+
+
+def test_daily_quota_exhausted():
+    limiter = AccountLimiter('a', daily_quotas={'freepublish/submit': 2})
+    limiter.acquire('freepublish/submit')
+    limiter.acquire('freepublish/submit')
+    with pytest.raises(QuotaExceededError) as info:
+        limiter.acquire('freepublish/submit')
+    assert 0 < info.value.retry_after <= 24 * 3600
+
+
+def test_request_that_never_left_is_refunded(fake_session):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url)
+        if len(attempts) == 1:
+            return requests.ConnectionError(MaxRetryError(None, '/', NewConnectionError(None, 'refused')))
+        return {'errcode': 0, 'media_id': 'D1'}
+
+    session, _ = fake_session(handler)
+    store = DailyQuotaStore(':memory:')
+    limiter = AccountLimiter('a', daily_quotas={'draft/add': 10}, quota_store=store, quota_key='app')
+    cache = AccessTokenCache(app_id='app')
+    cache.update({'access_token': 'T', 'expires_in': 7200})
+    api = WeChatAPI('app', 'secret', token_cache=cache, session=session, rate_limiter=limiter,
+                    backoff_base=0, backoff_max=0)
+
+    result = api._request('POST', 'draft/add', json_data={'articles': []}, idempotent=False)
+    assert result['media_id'] == 'D1'
+    assert len(attempts) == 2
+    # 两次尝试只有一次真正到达微信
+    assert store.usage('app') == {'draft/add': 1}
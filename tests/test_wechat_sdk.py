@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""wechat_sdk 请求层：分类重试、令牌失效刷新与后台刷新（同步与异步客户端）"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from wechat_sdk import AccessTokenCache, AsyncWeChatAPI, WeChatAPI, _never_sent
+
+httpx = pytest.importorskip('httpx')
+
+
+def _query(request):
+    return {key: values[0] for key, values in parse_qs(urlparse(request.url).query).items()}
+
+
+def _token_handler(tokens, api_handler):
+    """/token 依次返回 T1、T2…，其他接口交给 api_handler(request, token)"""
+    def handler(request):
+        if urlparse(request.url).path.endswith('/token'):
+            tokens.append(f'T{len(tokens) + 1}')
+            return {'access_token': tokens[-1], 'expires_in': 7200}
+        return api_handler(request, _query(request).get('access_token'))
+    return handler
+
+
+def _api(session, **kwargs):
+    kwargs.setdefault('backoff_base', 0.001)
+    kwargs.setdefault('backoff_max', 0.002)
+    return WeChatAPI('app', 'secret', session=session, **kwargs)
+
+
+def test_transient_errcode_is_retried(fake_session):
+    tokens = []
+    replies = iter([{'errcode': -1}, {'errcode': 45009}, {'errcode': 0, 'publish_status': 0}])
+    session, adapter = fake_session(_token_handler(tokens, lambda request, token: next(replies)))
+    result = _api(session).get_publish_status('p1')
+    assert result['success']
+    assert sum('freepublish/get' in r.url for r in adapter.requests) == 3
+
+
+def test_token_error_refreshes_and_replays_once(fake_session):
+    tokens = []
+
+    def api_handler(request, token):
+        return {'errcode': 40001} if token == 'T1' else {'errcode': 0, 'publish_status': 0}
+
+    session, _ = fake_session(_token_handler(tokens, api_handler))
+    assert _api(session).get_publish_status('p1')['success']
+    assert tokens == ['T1', 'T2']
+
+
+def test_concurrent_token_expiry_refreshes_once(fake_session):
+    tokens = []
+
+    def api_handler(request, token):
+        time.sleep(0.01)
+        return {'errcode': 40001} if token == 'T1' else {'errcode': 0, 'publish_status': 0}
+
+    session, _ = fake_session(_token_handler(tokens, api_handler))
+    api = _api(session)
+    api.get_access_token()
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(lambda _: api.get_publish_status('p1'), range(20)))
+    assert all(result['success'] for result in results)
+    assert tokens == ['T1', 'T2']
+
+
+def test_background_refresher_renews_before_expiry(fake_session):
+    tokens = []
+    session, _ = fake_session(_token_handler(tokens, lambda request, token: {'errcode': 0}))
+    api = _api(session)
+    api.token_cache.update({'access_token': 'T0', 'expires_in': AccessTokenCache.REFRESH_MARGIN + 30})
+    api.start_token_refresher(ahead=60, interval=0.05)
+    try:
+        deadline = time.time() + 2
+        while not tokens and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        api.stop_token_refresher()
+    assert tokens == ['T1']
+    assert api.get_access_token() == 'T1'
+
+
+def test_non_idempotent_call_not_retried_after_read_timeout(fake_session):
+    tokens = []
+    session, adapter = fake_session(_token_handler(tokens, lambda request, token: requests.ReadTimeout('slow')))
+    with pytest.raises(requests.ReadTimeout):
+        _api(session).create_draft([{'title': 't'}])
+    assert sum('draft/add' in r.url for r in adapter.requests) == 1
+
+
+def test_non_idempotent_call_retried_when_never_sent(fake_session):
+    tokens = []
+    refused = requests.ConnectionError(MaxRetryError(None, '/', NewConnectionError(None, 'refused')))
+    replies = iter([refused, {'media_id': 'M1'}])
+    session, adapter = fake_session(_token_handler(tokens, lambda request, token: next(replies)))
+    assert _api(session).create_draft([{'title': 't'}])['success']
+    assert sum('draft/add' in r.url for r in adapter.requests) == 2
+
+
+def test_never_sent_rule():
+    assert _never_sent(requests.ConnectTimeout())
+    assert _never_sent(requests.ConnectionError(MaxRetryError(None, '/', NewConnectionError(None, 'x'))))
+    assert not _never_sent(requests.ConnectionError('connection aborted'))
+    assert not _never_sent(requests.ReadTimeout())
+    assert _never_sent(httpx.ConnectError('refused'))
+    assert not _never_sent(httpx.ReadError('reset'))
+
+
+def async_token_expiry_scenario():
+    """20 个并发请求，令牌 T1 全部返回 40001：只应刷新一次，且全部成功"""
+    state = {'tokens': 0, 'calls': 0}
+
+    async def handler(request):
+        if request.url.path.endswith('/token'):
+            state['tokens'] += 1
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={'access_token': f"T{state['tokens']}", 'expires_in': 7200})
+        state['calls'] += 1
+        # 响应错开到达：第一个 40001 触发刷新后，其余 40001 在刷新进行中陆续到达
+        await asyncio.sleep(0.005 * (state['calls'] % 20))
+        if request.url.params['access_token'] == 'T1':
+            return httpx.Response(200, json={'errcode': 40001})
+        return httpx.Response(200, json={'errcode': 0, 'publish_status': 0})
+
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        api = AsyncWeChatAPI('app', 'secret', client=client, backoff_base=0.001, backoff_max=0.002)
+        await api.get_access_token()
+        results = await asyncio.gather(*[api.get_publish_status(str(i)) for i in range(20)])
+        await client.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(result['success'] for result in results)
+    assert state['tokens'] == 2
+
+
+def test_async_concurrent_token_expiry_does_not_deadlock():
+    # 死锁时事件循环被阻塞（wait_for 不会触发），卡住的线程也会让解释器无法退出，所以在子进程中运行并限时
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([os.path.dirname(tests_dir), tests_dir])}
+    try:
+        proc = subprocess.run(
+            [sys.executable, '-c', 'import test_wechat_sdk; test_wechat_sdk.async_token_expiry_scenario()'],
+            cwd=tests_dir, env=env, capture_output=True, text=True, timeout=20
+        )
+    except subprocess.TimeoutExpired:
+        pytest.fail('事件循环被阻塞（令牌失效与刷新互相等待）')
+    assert proc.returncode == 0, proc.stderr
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+access_token 存储
+同一公众号的多个进程/实例通过共享存储复用同一个令牌，并用跨进程锁保证只有一个刷新者
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class TokenStore:
+    """
+    令牌存储接口：load/save/clear 读写令牌，lock 提供刷新时的互斥
+
+    save/clear 可能是读-改-写（如文件存储），调用方需持有 lock；lock 不可重入
+    """
+
+    def load(self, app_id: str) -> Optional[Tuple[str, float]]:
+        """返回 (access_token, expires_at)，不存在时返回 None"""
+        raise NotImplementedError
+
+    def save(self, app_id: str, access_token: str, expires_at: float):
+        raise NotImplementedError
+
+    def clear(self, app_id: str):
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, app_id: str) -> Iterator[None]:
+        yield
+
+
+class MemoryTokenStore(TokenStore):
+    """进程内存储（默认），同一进程内的多个客户端可共享一个实例"""
+
+    def __init__(self):
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def load(self, app_id: str) -> Optional[Tuple[str, float]]:
+        return self._tokens.get(app_id)
+
+    def save(self, app_id: str, access_token: str, expires_at: float):
+        self._tokens[app_id] = (access_token, expires_at)
+
+    def clear(self, app_id: str):
+        self._tokens.pop(app_id, None)
+
+    @contextmanager
+    def lock(self, app_id: str) -> Iterator[None]:
+        with self._guard:
+            app_lock = self._locks.setdefault(app_id, threading.Lock())
+        with app_lock:
+            yield
+
+
+class FileTokenStore(TokenStore):
+    """文件存储，适用于同一台机器上的多个 worker 进程（gunicorn 等）"""
+
+    def __init__(self, path: str = '.wechat_token.json'):
+        self.path = path
+        self.lock_path = f'{path}.lock'
+
+    def _read_all(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_all(self, data: Dict):
+        # 先写同目录下的唯一临时文件再原子替换，避免读到半截内容，也避免多个线程共用同一个临时文件
+        fd, tmp_path = tempfile.mkstemp(prefix=f'{os.path.basename(self.path)}.', suffix='.tmp',
+                                        dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def load(self, app_id: str) -> Optional[Tuple[str, float]]:
+        entry = self._read_all().get(app_id)
+        if not entry:
+            return None
+        return entry['access_token'], entry['expires_at']
+
+    def save(self, app_id: str, access_token: str, expires_at: float):
+        data = self._read_all()
+        data[app_id] = {'access_token': access_token, 'expires_at': expires_at}
+        self._write_all(data)
+
+    def clear(self, app_id: str):
+        data = self._read_all()
+        if data.pop(app_id, None) is not None:
+            self._write_all(data)
+
+    @contextmanager
+    def lock(self, app_id: str) -> Iterator[None]:
+        with open(self.lock_path, 'a+') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class RedisTokenStore(TokenStore):
+    """
+    Redis 存储，适用于多台机器共享令牌
+
+    client 只需实现 redis-py 的 get / set(nx, ex) / delete 接口，
+    因此也可以使用兼容 Redis 协议的本地替代服务
+    """
+
+    def __init__(self, client, prefix: str = 'wechat:token:', lock_timeout: int = 30):
+        self.client = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+
+    def load(self, app_id: str) -> Optional[Tuple[str, float]]:
+        raw = self.client.get(f'{self.prefix}{app_id}')
+        if not raw:
+            return None
+        entry = json.loads(raw)
+        return entry['access_token'], entry['expires_at']
+
+    def save(self, app_id: str, access_token: str, expires_at: float):
+        ttl = max(1, int(expires_at - time.time()))
+        value = json.dumps({'access_token': access_token, 'expires_at': expires_at})
+        self.client.set(f'{self.prefix}{app_id}', value, ex=ttl)
+
+    def clear(self, app_id: str):
+        self.client.delete(f'{self.prefix}{app_id}')
+
+    @contextmanager
+    def lock(self, app_id: str) -> Iterator[None]:
+        lock_key = f'{self.prefix}{app_id}:lock'
+        owner = uuid.uuid4().hex
+        deadline = time.time() + self.lock_timeout
+        # 拿不到锁时等待，超时后仍继续执行（锁本身也会过期），避免永久阻塞
+        while not self.client.set(lock_key, owner, nx=True, ex=self.lock_timeout):
+            if time.time() > deadline:
+                break
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            current = self.client.get(lock_key)
+            if isinstance(current, bytes):
+                current = current.decode()
+            if current == owner:
+                self.client.delete(lock_key)
+
+
+def create_token_store(spec: Optional[str]) -> Optional[TokenStore]:
+    """
+    按配置创建令牌存储
+
+    Args:
+        spec: 'memory'（或空）为进程内存储；'file:/path/to/token.json' 为文件存储；
+            'redis://host:6379/0'（或 rediss://）为 Redis 存储
+
+    Returns:
+        Optional[TokenStore]: 进程内存储时返回 None（由各客户端自行创建）
+    """
+    if not spec or spec == 'memory':
+        return None
+    if spec.startswith('file:'):
+        return FileTokenStore(spec[len('file:'):] or '.wechat_token.json')
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        if redis is None:
+            raise ImportError('使用 Redis 令牌存储需要安装 redis: pip install redis')
+        return RedisTokenStore(redis.Redis.from_url(spec))
+    raise ValueError(f'不支持的令牌存储配置: {spec}')
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+微信素材上传缓存
+按来源URL和内容哈希记录已上传素材的 media_id/url，避免重复上传同一图片；
+素材属于具体公众号，多账号时按账号分别缓存
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+def sha256_bytes(data: bytes) -> str:
+    """计算字节内容的 SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: str, chunk_size: int = 64 * 1024) -> str:
+    """分块计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashingReader:
+    """包装文件对象，在被读取的同时计算 SHA-256（用于流式上传后写入缓存）"""
+
+    def __init__(self, fileobj, length: Optional[int] = None, prefix: bytes = b''):
+        """
+        Args:
+            fileobj: 被包装的文件对象
+            length: 总长度（含 prefix）
+            prefix: 已经从 fileobj 中读出的开头部分（如探测格式时读的文件头），会先于 fileobj 返回
+        """
+        self._fileobj = fileobj
+        self._prefix = prefix
+        self._digest = hashlib.sha256()
+        # 已知长度时暴露 len 属性，便于上传时设置 Content-Length
+        self.len = length
+
+    def read(self, size: int = -1) -> bytes:
+        if self._prefix:
+            if size is None or size < 0:
+                data = self._prefix + self._fileobj.read()
+                self._prefix = b''
+            else:
+                data, self._prefix = self._prefix[:size], self._prefix[size:]
+        else:
+            data = self._fileobj.read() if size is None or size < 0 else self._fileobj.read(size)
+        self._digest.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+class UploadCache:
+    """基于 SQLite 的上传结果缓存（支持TTL与按条数LRU淘汰）"""
+
+    def __init__(self, db_path: str = 'upload_cache.db', ttl: int = 30 * 24 * 3600, max_entries: int = 5000):
+        """
+        初始化上传缓存
+
+        Args:
+            db_path: SQLite 数据库文件路径
+            ttl: 缓存有效期（秒），<=0 表示永不过期
+            max_entries: 最大缓存条数，超出后按最近使用时间淘汰
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # 只保护命中统计；数据库访问用每个线程自己的连接
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS uploads (
+                cache_key TEXT PRIMARY KEY,
+                media_type TEXT NOT NULL,
+                media_id TEXT NOT NULL,
+                url TEXT,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(uploads)')]
+        if 'account' not in columns:
+            # 旧数据库升级：已有条目属于默认账号
+            conn.execute("ALTER TABLE uploads ADD COLUMN account TEXT NOT NULL DEFAULT ''")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_uploads_media_id ON uploads(media_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_uploads_last_used ON uploads(last_used)')
+
+    def _conn(self) -> sqlite3.Connection:
+        """每个线程使用独立连接（autocommit 模式，事务手动控制）；fork 出的子进程不复用父进程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _url_key(media_type: str, url: str, account: str = '') -> str:
+        prefix = f'{account}/' if account else ''
+        return f'{prefix}{media_type}:url:{url}'
+
+    @staticmethod
+    def _hash_key(media_type: str, content_hash: str, account: str = '') -> str:
+        prefix = f'{account}/' if account else ''
+        return f'{prefix}{media_type}:sha256:{content_hash}'
+
+    def _get(self, cache_key: str) -> Optional[Dict]:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            'SELECT media_id, url, created_at FROM uploads WHERE cache_key = ?',
+            (cache_key,)
+        ).fetchone()
+        if row and self.ttl > 0 and now - row[2] > self.ttl:
+            conn.execute('DELETE FROM uploads WHERE cache_key = ?', (cache_key,))
+            row = None
+        if not row:
+            with self._lock:
+                self.misses += 1
+            return None
+        conn.execute('UPDATE uploads SET last_used = ? WHERE cache_key = ?', (now, cache_key))
+        with self._lock:
+            self.hits += 1
+        return {'success': True, 'media_id': row[0], 'url': row[1], 'cached': True}
+
+    def get_by_url(self, url: str, media_type: str = 'image', account: str = '') -> Optional[Dict]:
+        """按来源URL查询缓存（account 为空表示默认账号）"""
+        return self._get(self._url_key(media_type, url, account))
+
+    def get_by_hash(self, content_hash: str, media_type: str = 'image', account: str = '') -> Optional[Dict]:
+        """按内容哈希查询缓存（account 为空表示默认账号）"""
+        return self._get(self._hash_key(media_type, content_hash, account))
+
+    def put(self, media_type: str, media_id: str, url: str = '',
+            source_url: Optional[str] = None, content_hash: Optional[str] = None, account: str = ''):
+        """
+        写入上传结果，可同时以来源URL和内容哈希作为索引
+
+        Args:
+            media_type: 素材类型 (image, thumb 等)
+            media_id: 微信返回的 media_id
+            url: 微信返回的图片URL
+            source_url: 原始图片URL
+            content_hash: 图片内容 SHA-256
+            account: 素材所属账号，空字符串表示默认账号
+        """
+        keys = []
+        if source_url:
+            keys.append(self._url_key(media_type, source_url, account))
+        if content_hash:
+            keys.append(self._hash_key(media_type, content_hash, account))
+        if not keys or not media_id:
+            return
+
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO uploads (cache_key, media_type, media_id, url, created_at, last_used, account) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(key, media_type, media_id, url or '', now, now, account) for key in keys]
+            )
+            self._evict(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _evict(self, conn: sqlite3.Connection):
+        """清理过期条目，并在超出容量时淘汰最久未使用的条目（需在事务内调用）"""
+        if self.ttl > 0:
+            conn.execute('DELETE FROM uploads WHERE created_at < ?', (time.time() - self.ttl,))
+        if self.max_entries > 0:
+            count = conn.execute('SELECT COUNT(*) FROM uploads').fetchone()[0]
+            if count > self.max_entries:
+                conn.execute(
+                    'DELETE FROM uploads WHERE cache_key IN '
+                    '(SELECT cache_key FROM uploads ORDER BY last_used ASC LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+
+    def invalidate(self, source_url: Optional[str] = None, content_hash: Optional[str] = None,
+                   media_id: Optional[str] = None, media_type: Optional[str] = None,
+                   account: Optional[str] = None) -> int:
+        """
+        使缓存条目失效（例如素材已在公众号后台被删除）
+
+        Args:
+            source_url: 按来源URL失效
+            content_hash: 按内容哈希失效
+            media_id: 按 media_id 失效（会清除指向该素材的所有索引）
+            media_type: 仅失效指定类型，默认全部类型
+            account: 仅失效指定账号（空字符串为默认账号），默认全部账号
+
+        Returns:
+            int: 删除的条目数
+        """
+        conditions = []
+        params = []
+        prefix = "(CASE WHEN account = '' THEN '' ELSE account || '/' END)"
+        if source_url:
+            conditions.append(f"cache_key = {prefix} || media_type || ':url:' || ?")
+            params.append(source_url)
+        if content_hash:
+            conditions.append(f"cache_key = {prefix} || media_type || ':sha256:' || ?")
+            params.append(content_hash)
+        if media_id:
+            conditions.append('media_id = ?')
+            params.append(media_id)
+        if not conditions:
+            return 0
+
+        sql = f"DELETE FROM uploads WHERE ({' OR '.join(conditions)})"
+        if media_type:
+            sql += ' AND media_type = ?'
+            params.append(media_type)
+        if account is not None:
+            sql += ' AND account = ?'
+            params.append(account)
+
+        return self._conn().execute(sql, params).rowcount
+
+    def clear(self):
+        """清空全部缓存"""
+        self._conn().execute('DELETE FROM uploads')
+
+    def stats(self) -> Dict:
+        """返回缓存统计信息"""
+        count = self._conn().execute('SELECT COUNT(*) FROM uploads').fetchone()[0]
+        return {
+            'entries': count,
+            'hits': self.hits,
+            'misses': self.misses,
+            'db_path': os.path.abspath(self.db_path)
+        }
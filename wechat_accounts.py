@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多公众号账号池
+每个 app_id 一个 WeChatAPI 实例：共用一个 HTTP 连接池，令牌按 app_id 隔离，
+各账号有独立的限流器（每分钟频率 + 各接口每日配额），一篇文章发往多个账号时并行执行、互不阻塞；
+每日配额按自然日计数并持久化到 SQLite，多个进程共用同一份计数
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from rate_limit import TokenBucket
+from token_store import TokenStore
+from wechat_sdk import WeChatAPI, create_session
+
+# 默认账号名（由 WEIXIN_APP_ID / WEIXIN_APP_SECRET 配置）
+DEFAULT_ACCOUNT = 'default'
+
+# 每日配额的统计周期（秒）
+DAY = 24 * 3600
+
+# 微信接口每日调用次数按北京时间零点重置
+WECHAT_UTC_OFFSET = 8 * 3600
+
+
+class QuotaExceededError(Exception):
+    """账号调用频率或每日配额超限"""
+
+    def __init__(self, message: str, account: str = '', retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.account = account
+        # 预计多少秒后可以再次调用
+        self.retry_after = retry_after
+
+
+class DailyQuotaStore:
+    """
+    每日配额计数（固定窗口）：按 (账号, 接口, 日期) 计数，到微信的重置时间（北京时间零点）换新窗口
+
+    计数保存在 SQLite 中，同一台机器上的多个进程共用一个数据库文件即可共享配额
+    """
+
+    def __init__(self, db_path: str = 'wechat_quota.db', utc_offset: float = WECHAT_UTC_OFFSET, keep_days: int = 7):
+        """
+        Args:
+            db_path: SQLite 数据库文件路径，':memory:' 表示只在本进程内计数
+            utc_offset: 配额重置时区相对 UTC 的秒数
+            keep_days: 计数记录保留天数
+        """
+        self.db_path = db_path
+        self.utc_offset = utc_offset
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._pid = None
+        self._conn = None
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """单个连接 + 锁；fork 出的子进程重新连接"""
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30, check_same_thread=False)
+            self._pid = os.getpid()
+            if self.db_path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS quota_usage (
+                    account TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (account, path, day)
+                )
+            ''')
+        return self._conn
+
+    def day(self, now: Optional[float] = None) -> str:
+        """当前配额窗口（重置时区的日期）"""
+        return time.strftime('%Y-%m-%d', time.gmtime((now or time.time()) + self.utc_offset))
+
+    def seconds_until_reset(self, now: Optional[float] = None) -> float:
+        """距离下一次配额重置的秒数"""
+        now = now or time.time()
+        return DAY - (now + self.utc_offset) % DAY
+
+    def try_acquire(self, account: str, path: str, quota: int) -> bool:
+        """当日计数未达到 quota 时加一并返回 True，否则返回 False"""
+        now = time.time()
+        day = self.day(now)
+        with self._lock:
+            conn = self._connect()
+            # 单条语句原子地插入或加一，已达上限时不更新（rowcount 为 0）
+            acquired = conn.execute(
+                'INSERT INTO quota_usage (account, path, day, count) VALUES (?, ?, ?, 1) '
+                'ON CONFLICT (account, path, day) DO UPDATE SET count = count + 1 WHERE count < ?',
+                (account, path, day, quota)
+            ).rowcount > 0
+            self._calls += 1
+            if self._calls % 1000 == 0:
+                conn.execute('DELETE FROM quota_usage WHERE day < ?', (self.day(now - self.keep_days * DAY),))
+        return acquired
+
+    def release(self, account: str, path: str):
+        """退还一次当日计数（请求最终没有发出时调用）"""
+        with self._lock:
+            self._connect().execute(
+                'UPDATE quota_usage SET count = count - 1 WHERE account = ? AND path = ? AND day = ? AND count > 0',
+                (account, path, self.day())
+            )
+
+    def usage(self, account: str) -> Dict[str, int]:
+        """账号当日各接口的调用次数"""
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT path, count FROM quota_usage WHERE account = ? AND day = ?', (account, self.day())
+            ).fetchall()
+        return dict(rows)
+
+
+class AccountLimiter:
+    """
+    单个账号的限流器
+
+    每分钟频率用令牌桶平滑（超限时最多等待 max_wait 秒）；每日配额按接口路径在自然日内计数（DailyQuotaStore），
+    用完后立即抛出 QuotaExceededError 而不是阻塞到第二天。先等到每分钟的名额再扣每日配额，
+    等待超时不会消耗配额；请求确定没有发出时由客户端调用 release 退还
+    """
+
+    def __init__(self, account: str = '', per_minute: float = 0, daily_quotas: Optional[Dict[str, int]] = None,
+                 max_wait: float = 30, quota_store: Optional[DailyQuotaStore] = None,
+                 quota_key: Optional[str] = None):
+        """
+        Args:
+            account: 账号名（用于错误信息）
+            per_minute: 该账号每分钟最多调用次数，<=0 表示不限
+            daily_quotas: 各接口每日调用上限，如 {'draft/add': 1000, 'freepublish/submit': 100}
+            max_wait: 每分钟频率超限时最多等待的秒数
+            quota_store: 每日配额计数存储，多个进程共享配额时传入同一个数据库文件；默认只在本进程内计数
+            quota_key: 配额计数的键（微信按 app_id 计数），默认使用账号名
+        """
+        self.account = account
+        self.per_minute = per_minute
+        self.max_wait = max_wait
+        self.minute = TokenBucket(per_minute / 60, capacity=per_minute) if per_minute > 0 else None
+        self.daily = {path: quota for path, quota in (daily_quotas or {}).items() if quota > 0}
+        self.quota_store = quota_store or (DailyQuotaStore(':memory:') if self.daily else None)
+        self.quota_key = quota_key or account
+
+    def acquire(self, path: str):
+        """发送 path 接口请求前调用，超限时抛出 QuotaExceededError"""
+        if self.minute is not None and not self.minute.acquire(timeout=self.max_wait):
+            raise QuotaExceededError(f'账号 {self.account} 调用频率超限', self.account, 60 / self.per_minute)
+        quota = self.daily.get(path)
+        if quota is not None and not self.quota_store.try_acquire(self.quota_key, path, quota):
+            raise QuotaExceededError(f'账号 {self.account} 的 {path} 今日调用次数已用完', self.account,
+                                     self.quota_store.seconds_until_reset())
+
+    def release(self, path: str):
+        """请求没有发出（如连接失败）时退还每日配额"""
+        if path in self.daily:
+            self.quota_store.release(self.quota_key, path)
+
+
+@dataclass
+class WeChatAccount:
+    """账号池中的一个公众号"""
+    name: str
+    api: WeChatAPI
+    limiter: Optional[AccountLimiter] = None
+
+    @property
+    def app_id(self) -> str:
+        return self.api.app_id
+
+
+class AccountPool:
+    """公众号账号池（线程安全，按账号名或 app_id 路由）"""
+
+    def __init__(self, pool_size: int = 20, keep_alive: bool = True, token_store: Optional[TokenStore] = None,
+                 per_minute: float = 0, daily_quotas: Optional[Dict[str, int]] = None, max_wait: float = 30,
+                 quota_store: Optional[DailyQuotaStore] = None, **api_kwargs):
+        """
+        初始化账号池
+
+        Args:
+            pool_size: 共用连接池的大小（所有账号都访问同一个微信域名）
+            keep_alive: 是否复用连接
+            token_store: 令牌存储，各账号按 app_id 分别保存令牌
+            per_minute: 账号默认的每分钟调用上限，<=0 表示不限
+            daily_quotas: 账号默认的各接口每日配额
+            max_wait: 每分钟频率超限时最多等待的秒数
+            quota_store: 每日配额计数存储（所有账号共用，按 app_id 分别计数）
+            api_kwargs: 传给每个 WeChatAPI 的其他参数（超时、重试等）
+        """
+        self.session = create_session(pool_size, keep_alive)
+        self.token_store = token_store
+        self.per_minute = per_minute
+        self.daily_quotas = daily_quotas or {}
+        self.max_wait = max_wait
+        self.quota_store = quota_store
+        self.api_kwargs = api_kwargs
+        self._accounts: Dict[str, WeChatAccount] = {}
+        self._default: Optional[str] = None
+
+    def add(self, name: str, app_id: str, app_secret: str, per_minute: Optional[float] = None,
+            daily_quotas: Optional[Dict[str, int]] = None, default: bool = False) -> WeChatAccount:
+        """
+        添加账号（第一个添加的账号为默认账号）
+
+        Args:
+            name: 账号名（请求中的 account 字段）
+            app_id: 公众号 AppID
+            app_secret: 公众号 AppSecret
+            per_minute: 该账号的每分钟调用上限，默认使用账号池的设置
+            daily_quotas: 该账号的各接口每日配额（与账号池的设置合并）
+            default: 是否设为默认账号
+        """
+        limiter = AccountLimiter(
+            name,
+            per_minute=self.per_minute if per_minute is None else per_minute,
+            daily_quotas={**self.daily_quotas, **(daily_quotas or {})},
+            max_wait=self.max_wait,
+            quota_store=self.quota_store,
+            quota_key=app_id
+        )
+        api = WeChatAPI(app_id, app_secret, token_store=self.token_store, session=self.session,
+                        rate_limiter=limiter, **self.api_kwargs)
+        account = WeChatAccount(name, api, limiter)
+        self._accounts[name] = account
+        if default or self._default is None:
+            self._default = name
+        return account
+
+    @property
+    def default(self) -> WeChatAccount:
+        """默认账号"""
+        if self._default is None:
+            raise ValueError('账号池中没有账号')
+        return self._accounts[self._default]
+
+    def names(self) -> List[str]:
+        return list(self._accounts)
+
+    def get(self, name: Optional[str] = None) -> WeChatAccount:
+        """
+        按账号名或 app_id 取账号，None 或空字符串表示默认账号
+
+        Raises:
+            ValueError: 账号不存在
+        """
+        if not name:
+            return self.default
+        account = self._accounts.get(name)
+        if account is None:
+            account = next((item for item in self._accounts.values() if item.app_id == name), None)
+        if account is None:
+            raise ValueError(f'未知账号: {name}')
+        return account
+
+    def resolve(self, accounts: Union[None, str, Iterable[str]]) -> List[WeChatAccount]:
+        """把请求中的 accounts 字段（账号名、账号名列表或 'all'）解析为账号列表（去重、保持顺序）"""
+        if accounts == 'all':
+            return list(self._accounts.values())
+        if accounts is None or isinstance(accounts, str):
+            return [self.get(accounts)]
+        resolved = [self.get(name) for name in accounts]
+        return list({account.name: account for account in resolved}.values()) or [self.default]
+
+    def start_token_refreshers(self, ahead: float = 300, interval: float = 60):
+        """为所有账号启动后台令牌刷新线程（每个进程调用一次；共享存储时只有一个进程实际请求令牌接口）"""
+        for account in self._accounts.values():
+            account.api.start_token_refresher(ahead=ahead, interval=interval)
+
+    def fan_out(self, accounts: List[WeChatAccount], func: Callable[[WeChatAccount], Dict],
+                max_workers: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        对多个账号并行执行 func（每个账号一个线程，某个账号限流或失败不影响其他账号）
+
+        Returns:
+            Dict[str, Dict]: 账号名 -> func 的返回值（抛出异常时为 {'success': False, 'error': ...}）
+        """
+        def run(account):
+            try:
+                return func(account)
+            except Exception as e:
+                return {'success': False, 'error': str(e)}
+
+        if len(accounts) == 1:
+            return {accounts[0].name: run(accounts[0])}
+        workers = max(1, min(max_workers or len(accounts), len(accounts)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='account') as executor:
+            return dict(zip([account.name for account in accounts], executor.map(run, accounts)))
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Dict], **kwargs) -> 'AccountPool':
+        """
+        由配置创建账号池
+
+        Args:
+            config: {账号名: {"app_id", "app_secret", "per_minute", "daily_quotas", "default"}}
+            kwargs: 传给 AccountPool 的参数
+        """
+        pool = cls(**kwargs)
+        for name, item in config.items():
+            pool.add(name, item['app_id'], item['app_secret'], per_minute=item.get('per_minute'),
+                     daily_quotas=item.get('daily_quotas'), default=bool(item.get('default')))
+        return pool
+
+
+def load_accounts_config(value: Optional[str], app_id: Optional[str] = None,
+                         app_secret: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    读取账号配置：value 为 JSON 字符串或 JSON 文件路径；app_id/app_secret 存在时作为默认账号加入
+
+    Returns:
+        Dict[str, Dict]: 账号名 -> 账号配置
+    """
+    config = {}
+    if app_id and app_secret:
+        config[DEFAULT_ACCOUNT] = {'app_id': app_id, 'app_secret': app_secret}
+    if value:
+        if os.path.exists(value):
+            with open(value, 'r', encoding='utf-8') as f:
+                config.update(json.load(f))
+        else:
+            config.update(json.loads(value))
+    return config
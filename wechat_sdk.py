@@ -6,40 +6,642 @@
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+import asyncio
+import io
 import json
+import mimetypes
+import os
+import re
+import threading
 import time
-from typing import Dict, List, Optional, Union
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from image_prep import FORMATS, SNIFF_BYTES, sniff_format, with_extension
+from rate_limit import backoff_delay
+from token_store import MemoryTokenStore, TokenStore
+
+try:
+    import httpx
+except ImportError:  # 异步客户端为可选功能，未安装 httpx 时仅同步客户端可用
+    httpx = None
+
+# upload_media 支持的媒体来源：文件路径 / 字节 / 文件对象 / 流式HTTP响应
+MediaSource = Union[str, bytes, bytearray, memoryview, BinaryIO, requests.Response]
+
+
+class MultipartStream:
+    """
+    流式 multipart/form-data 请求体
+
+    以 read(size) 的方式依次输出表单头、媒体数据和结尾分隔符，
+    媒体数据按块从源对象读取，不落盘也不在内存中整体拼接
+    """
+
+    def __init__(self, field_name: str, filename: str, content_type: str,
+                 source: BinaryIO, length: int):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode('utf-8')
+        tail = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self._parts = [io.BytesIO(head), source, io.BytesIO(tail)]
+        # requests 通过 len 属性设置 Content-Length，避免分块传输
+        self.len = len(head) + length + len(tail)
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        chunks = []
+        remaining = size if size is not None and size >= 0 else None
+        while self._parts and (remaining is None or remaining > 0):
+            part = self._parts[0]
+            data = part.read() if remaining is None else part.read(remaining)
+            if not data:
+                self._parts.pop(0)
+                continue
+            chunks.append(data)
+            if remaining is not None:
+                remaining -= len(data)
+        return b''.join(chunks)
+
+
+def open_media_source(media: MediaSource, filename: Optional[str] = None,
+                      content_type: Optional[str] = None) -> Tuple[BinaryIO, int, str, str, bool]:
+    """
+    将各种媒体来源统一为 (文件对象, 长度, 文件名, Content-Type, 是否需要关闭)
+
+    长度未知的流会被读入内存，保证请求体能带上 Content-Length；
+    未指定 content_type 时优先按文件头识别图片格式，并修正文件名的扩展名
+    """
+    should_close = False
+    length = None
+    header_type = ''
+
+    if isinstance(media, str):
+        fileobj = open(media, 'rb')
+        should_close = True
+        length = os.path.getsize(media)
+        filename = filename or os.path.basename(media)
+    elif isinstance(media, (bytes, bytearray, memoryview)):
+        fileobj = io.BytesIO(media)
+        length = len(media)
+    elif isinstance(media, requests.Response):
+        fileobj = media.raw
+        fileobj.decode_content = True
+        # 有 Content-Encoding 时解码后的长度未知
+        if media.headers.get('Content-Length') and not media.headers.get('Content-Encoding'):
+            length = int(media.headers['Content-Length'])
+        filename = filename or os.path.basename(urlparse(media.url).path)
+        header_type = media.headers.get('Content-Type', '').split(';')[0].strip()
+        if not header_type.startswith('image/'):
+            header_type = ''
+    elif hasattr(media, 'read'):
+        fileobj = media
+        filename = filename or os.path.basename(getattr(media, 'name', '') or '')
+        # 优先使用对象自带的 len 属性（与 requests 的约定一致），否则尝试 seek 计算剩余长度
+        length = getattr(media, 'len', None)
+        if length is None:
+            try:
+                position = fileobj.tell()
+                fileobj.seek(0, os.SEEK_END)
+                length = fileobj.tell() - position
+                fileobj.seek(position)
+            except (AttributeError, OSError, ValueError):
+                length = None
+    else:
+        raise TypeError(f"不支持的媒体类型: {type(media).__name__}")
+
+    if length is None:
+        data = fileobj.read()
+        if should_close:
+            fileobj.close()
+            should_close = False
+        fileobj = io.BytesIO(data)
+        length = len(data)
+
+    filename = filename or 'media.jpg'
+    if not content_type:
+        fmt = _sniff_media(fileobj)
+        if fmt:
+            content_type, extension = FORMATS[fmt]
+            filename = with_extension(filename, extension)
+    content_type = content_type or header_type or mimetypes.guess_type(filename)[0] or 'image/jpeg'
+    return fileobj, length, filename, content_type, should_close
+
+
+def _sniff_media(fileobj) -> Optional[str]:
+    """读取可回退文件对象的文件头识别图片格式（读完回到原位置），不可回退时返回 None"""
+    start = _tell(fileobj)
+    if start is None:
+        return None
+    head = fileobj.read(SNIFF_BYTES)
+    fileobj.seek(start)
+    return sniff_format(head)
+
+
+def _never_sent(error: Exception) -> bool:
+    """网络错误发生在连接建立阶段（请求一定没有发出），非幂等接口也可以安全重试"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError):
+        # 连接被拒绝、DNS 解析失败：urllib3 的 NewConnectionError
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    return httpx is not None and isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+def _tell(fileobj) -> Optional[int]:
+    """返回可回退文件对象的当前位置，不可回退时返回 None"""
+    try:
+        if fileobj.seekable():
+            return fileobj.tell()
+    except (AttributeError, OSError, ValueError):
+        pass
+    return None
+
+
+class AccessTokenCache:
+    """
+    access_token 缓存
+
+    同步与异步客户端共用同一份令牌状态与解析逻辑，
+    同一公众号的多个客户端实例可共享一个缓存对象；
+    令牌同时写入 TokenStore，多个进程可通过文件/Redis 存储共享同一个令牌
+    """
+
+    # 提前刷新的秒数（提前5分钟刷新）
+    REFRESH_MARGIN = 300
+
+    def __init__(self, store: Optional[TokenStore] = None, app_id: str = ''):
+        """
+        Args:
+            store: 令牌存储，默认进程内存储
+            app_id: 存储中区分不同公众号的键
+        """
+        self.store = store or MemoryTokenStore()
+        self.app_id = app_id
+        self.access_token = None
+        self.expires_at = 0
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._refresher_stop = None
+
+    def get(self, min_ttl: float = 0) -> Optional[str]:
+        """返回剩余有效期大于 min_ttl 秒的令牌；本地缓存失效时从共享存储读取，都没有则返回 None"""
+        if self.access_token and time.time() + min_ttl < self.expires_at:
+            return self.access_token
+        entry = self.store.load(self.app_id)
+        if entry and time.time() + min_ttl < entry[1]:
+            self.access_token, self.expires_at = entry
+            return self.access_token
+        return None
+
+    def update(self, data: Dict) -> str:
+        """根据 /cgi-bin/token 的响应更新缓存（调用方需持有 store.lock）"""
+        if 'access_token' not in data:
+            raise Exception(f"获取访问令牌失败: {data}")
+        self.access_token = data['access_token']
+        self.expires_at = time.time() + data.get('expires_in', 7200) - self.REFRESH_MARGIN
+        self.store.save(self.app_id, self.access_token, self.expires_at)
+        return self.access_token
+
+    def refresh(self, fetch: Callable[[], Dict], min_ttl: float = 0) -> str:
+        """
+        单飞刷新令牌
+
+        同一时刻只有一个调用者执行 fetch（请求 /cgi-bin/token），
+        其余线程/进程等待锁释放后直接复用新令牌
+
+        Args:
+            fetch: 请求令牌接口并返回响应数据的函数
+            min_ttl: 令牌剩余有效期不足该秒数时才刷新
+        """
+        token = self.get(min_ttl)
+        if token:
+            return token
+        with self._lock:
+            token = self.get(min_ttl)
+            if token:
+                return token
+            with self.store.lock(self.app_id):
+                # 其他进程可能刚刚刷新过
+                token = self.get(min_ttl)
+                if token:
+                    return token
+                return self.update(fetch())
+
+    def invalidate(self, access_token: Optional[str] = None):
+        """
+        使令牌失效，下次调用时重新获取
+
+        Args:
+            access_token: 被判定无效的令牌；若当前令牌已被其他调用者换新则不做处理
+        """
+        with self._lock:
+            if access_token and access_token != self.access_token:
+                return
+            self.access_token = None
+            self.expires_at = 0
+            # 与刷新共用存储锁：避免清掉其他进程刚写入的新令牌
+            with self.store.lock(self.app_id):
+                entry = self.store.load(self.app_id)
+                if entry and (not access_token or entry[0] == access_token):
+                    self.store.clear(self.app_id)
+
+    def start_refresher(self, fetch: Callable[[], Dict], ahead: float = 300, interval: float = 60):
+        """
+        启动后台刷新线程，在令牌剩余有效期不足 ahead 秒前主动刷新，避免请求线程等待刷新
+
+        Args:
+            fetch: 请求令牌接口并返回响应数据的函数
+            ahead: 提前刷新的秒数
+            interval: 检查间隔（秒）
+        """
+        if self._refresher and self._refresher.is_alive():
+            return
+        stop = threading.Event()
+
+        def run():
+            while True:
+                try:
+                    self.refresh(fetch, min_ttl=ahead + interval)
+                except Exception as e:
+                    print(f"后台刷新访问令牌失败: {e}")
+                if stop.wait(interval):
+                    break
+
+        self._refresher_stop = stop
+        self._refresher = threading.Thread(target=run, name=f'wechat-token-{self.app_id}', daemon=True)
+        self._refresher.start()
+
+    def stop_refresher(self):
+        """停止后台刷新线程"""
+        if self._refresher_stop:
+            self._refresher_stop.set()
+        self._refresher = None
+        self._refresher_stop = None
+
+
+# 可重试的临时错误码：-1 系统繁忙，45009 接口调用超过频率限制
+TRANSIENT_ERRCODES = {-1, 45009}
+
+# 令牌无效/过期的错误码：刷新令牌后重放请求
+TOKEN_ERRCODES = {40001, 40014, 42001}
+
+# 可重试的 HTTP 状态码（仅用于幂等接口）
+RETRY_HTTP_STATUS = {429, 500, 502, 503, 504}
+
+
+def _json_body(data: Optional[Dict]) -> Tuple[Optional[bytes], Dict[str, str]]:
+    """UTF-8 JSON 请求体（不转义中文）"""
+    if data is None:
+        return None, {}
+    return json.dumps(data, ensure_ascii=False).encode('utf-8'), {'Content-Type': 'application/json; charset=utf-8'}
+
+
+def _errcode(result: Dict) -> int:
+    return result.get('errcode', 0) if isinstance(result, dict) else 0
+
+
+# 发布状态码映射
+PUBLISH_STATUS_MAP = {
+    0: '发布成功',
+    1: '发布中',
+    2: '原创失败',
+    3: '常规失败',
+    4: '平台审核不通过',
+    5: '成功后用户删除所有文章',
+    6: '成功后系统封禁所有文章'
+}
+
+# 发布终态：0 成功，2~6 失败或已下线；1 表示仍在发布中
+PUBLISH_TERMINAL_STATUSES = {0, 2, 3, 4, 5, 6}
+
+
+# 一个草稿（draft/add 的 articles 数组）最多包含的文章数
+MAX_DRAFT_ARTICLES = 8
+
+
+def build_article(title: str, content: str, summary: str = '', thumb_media_id: str = '') -> Dict:
+    """构造一篇文章的草稿参数"""
+    return {
+        'title': title,
+        'content': content,
+        'digest': summary,
+        'thumb_media_id': thumb_media_id,
+        'need_open_comment': 0,
+        'only_fans_can_comment': 0
+    }
+
+
+def build_articles(title: str, content: str, summary: str = '', thumb_media_id: str = '') -> List[Dict]:
+    """构造单篇文章的草稿 articles 参数"""
+    return [build_article(title, content, summary, thumb_media_id)]
+
+
+def chunk_articles(articles: List[Dict], size: int = MAX_DRAFT_ARTICLES) -> List[List[Dict]]:
+    """按顺序把文章分组，每组对应一个多图文草稿"""
+    size = max(1, min(size, MAX_DRAFT_ARTICLES))
+    return [articles[i:i + size] for i in range(0, len(articles), size)]
+
+
+def _format_create_draft(result: Dict) -> Dict:
+    """整理 draft/add 响应"""
+    # 成功时返回 {'media_id': '...', 'item': [...]}
+    # 失败时返回 {'errcode': xxx, 'errmsg': '...'}
+    if 'media_id' in result:
+        return {
+            'success': True,
+            'data': result,
+            'message': '草稿创建成功',
+            'media_id': result.get('media_id')
+        }
+    return {
+        'success': False,
+        'error': result,
+        'message': '草稿创建失败'
+    }
+
+
+def _format_draft_list(result: Dict) -> Dict:
+    """整理 draft/batchget 响应"""
+    # 成功时直接返回 {'total_count', 'item_count', 'item'}，不一定带 errcode
+    if result.get('errcode', 0) == 0 and 'item' in result:
+        return {
+            'success': True,
+            'data': result,
+            'message': '草稿列表获取成功'
+        }
+    return {
+        'success': False,
+        'error': result,
+        'message': '获取草稿列表失败'
+    }
+
+
+DraftPredicate = Callable[[Dict], bool]
+
+# 批量删除结果中最多保留的失败明细条数
+MAX_FAILED_DETAILS = 100
+
+
+def draft_titles(draft: Dict) -> List[str]:
+    """草稿（draft/batchget 的 item）中各篇文章的标题"""
+    return [news.get('title', '') for news in draft.get('content', {}).get('news_item', [])]
+
+
+def draft_update_time(draft: Dict) -> int:
+    """草稿最后更新时间（Unix 时间戳）"""
+    return draft.get('update_time') or draft.get('content', {}).get('update_time') or 0
+
+
+def draft_older_than(days: float, now: Optional[float] = None) -> DraftPredicate:
+    """过滤条件：最后更新时间早于 days 天前"""
+    cutoff = (now or time.time()) - days * 24 * 3600
+    return lambda draft: draft_update_time(draft) < cutoff
+
+
+def draft_title_matches(pattern: str) -> DraftPredicate:
+    """过滤条件：任一篇文章标题匹配正则 pattern"""
+    regex = re.compile(pattern)
+    return lambda draft: any(regex.search(title) for title in draft_titles(draft))
+
+
+def _page_items(result: Dict, offset: int) -> Tuple[List[Dict], int]:
+    """取出一页草稿和草稿总数；请求失败时抛出异常"""
+    if not result['success']:
+        raise Exception(f"获取草稿列表失败 (offset={offset}): {result['error']}")
+    data = result['data']
+    return data.get('item') or [], data.get('total_count', 0)
+
+
+def _new_delete_summary(dry_run: bool) -> Dict:
+    return {'scanned': 0, 'matched': 0, 'deleted': 0, 'failed': 0, 'failures': [], 'dry_run': dry_run}
+
+
+def _record_delete(summary: Dict, media_id: str, result: Dict) -> bool:
+    """记录一次删除结果，返回是否删除成功"""
+    if result.get('success'):
+        summary['deleted'] += 1
+        return True
+    summary['failed'] += 1
+    if len(summary['failures']) < MAX_FAILED_DETAILS:
+        summary['failures'].append({'media_id': media_id, 'error': result.get('error')})
+    return False
+
+
+def _format_delete_drafts(summary: Dict) -> Dict:
+    """整理批量删除的结果"""
+    if summary['dry_run']:
+        message = f"共扫描 {summary['scanned']} 个草稿，{summary['matched']} 个符合条件（未删除）"
+    else:
+        message = f"共扫描 {summary['scanned']} 个草稿，删除 {summary['deleted']} 个，失败 {summary['failed']} 个"
+    return {'success': summary['failed'] == 0, **summary, 'message': message}
+
+
+def _format_delete_draft(result: Dict) -> Dict:
+    """整理 draft/delete 响应"""
+    if result.get('errcode') == 0:
+        return {
+            'success': True,
+            'data': result,
+            'message': '草稿删除成功',
+            'warning': '此操作不可逆，请谨慎操作'
+        }
+    return {
+        'success': False,
+        'error': result,
+        'message': '草稿删除失败'
+    }
+
+
+def _format_publish(result: Dict) -> Dict:
+    """整理 freepublish/submit 响应"""
+    if result.get('errcode') == 0:
+        return {
+            'success': True,
+            'data': result,
+            'message': '发布任务提交成功！请使用 publish_id 查询发布状态',
+            'publish_id': result.get('publish_id'),
+            'next_step': f"调用 publish_status 查询发布状态，publish_id: {result.get('publish_id')}"
+        }
+    return {
+        'success': False,
+        'error': result,
+        'message': '发布任务提交失败'
+    }
+
+
+def _format_publish_status(result: Dict) -> Dict:
+    """整理 freepublish/get 响应"""
+    if result.get('errcode') != 0:
+        return {
+            'success': False,
+            'error': result,
+            'message': '状态查询失败'
+        }
+
+    status_code = result.get('publish_status')
+    response_data = {
+        'success': True,
+        'data': result,
+        'message': '状态查询成功',
+        'publish_status': status_code,
+        'publish_status_desc': PUBLISH_STATUS_MAP.get(status_code, '未知状态')
+    }
+
+    # 如果发布成功，添加文章链接
+    if status_code == 0 and 'article_detail' in result:
+        articles = result['article_detail'].get('item', [])
+        if articles:
+            response_data['article_links'] = [
+                {'idx': item['idx'], 'url': item['article_url']}
+                for item in articles
+            ]
+
+    return response_data
+
+
+def _format_upload(result: Dict) -> Dict:
+    """整理 material/add_material 响应"""
+    if 'media_id' in result:
+        return {
+            'success': True,
+            'data': result,
+            'message': '媒体文件上传成功',
+            'media_id': result.get('media_id'),
+            'url': result.get('url')
+        }
+    return {
+        'success': False,
+        'error': result,
+        'message': '媒体文件上传失败'
+    }
+
+
+def _format_complete_publish(access_token: str, media_id: str, publish: Dict, steps: Dict) -> Dict:
+    """整理一键发布流程的成功结果"""
+    steps['✅ 流程完成'] = '所有步骤执行成功'
+    return {
+        'success': True,
+        'data': {
+            'access_token': access_token,
+            'media_id': media_id,
+            'publish_id': publish['publish_id'],
+            'steps': steps
+        },
+        'message': '发布任务提交成功！请使用 publish_id 查询发布状态',
+        'next_step': publish['next_step'],
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    }
+
+
+def _batch_group(index: int, group: List[Dict]) -> Dict:
+    """批量发布中一个分组的初始结果"""
+    return {'index': index, 'titles': [article.get('title', '') for article in group], 'success': False}
+
+
+def _fail_batch_group(entry: Dict, error, message: str) -> Dict:
+    entry.update({'error': error, 'message': message})
+    return entry
+
+
+def _format_batch_publish(groups: List[Dict], publish: bool) -> Dict:
+    """整理批量发布的结果"""
+    succeeded = sum(1 for group in groups if group['success'])
+    action = '发布' if publish else '草稿创建'
+    return {
+        'success': succeeded == len(groups),
+        'groups': groups,
+        'article_count': sum(len(group['titles']) for group in groups),
+        'draft_count': succeeded,
+        'message': f'{action}完成: {succeeded}/{len(groups)} 个草稿成功'
+    }
+
+
+def create_session(pool_size: int = 20, keep_alive: bool = True) -> requests.Session:
+    """
+    创建访问微信接口的会话（禁用代理，直接连接）
+
+    Args:
+        pool_size: 连接池大小
+        keep_alive: 是否复用连接
+
+    Returns:
+        requests.Session: 会话
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'User-Agent': 'WeChat-Python-SDK/1.0'})
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    # 禁用代理，确保使用本地公网 IP
+    session.trust_env = False
+    session.proxies = {
+        'http': None,
+        'https': None
+    }
+    return session
+
 
 class WeChatAPI:
     """微信公众号 API 客户端"""
     
-    def __init__(self, app_id: str, app_secret: str):
+    def __init__(self, app_id: str, app_secret: str, token_cache: Optional[AccessTokenCache] = None,
+                 token_store: Optional[TokenStore] = None, connect_timeout: float = 5, read_timeout: float = 30,
+                 upload_timeout: float = 120, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8, pool_size: int = 20, keep_alive: bool = True,
+                 session: Optional[requests.Session] = None, rate_limiter=None):
         """
         初始化微信 API 客户端
 
         Args:
             app_id: 微信公众号 AppID
             app_secret: 微信公众号 AppSecret
+            token_cache: 令牌缓存，可与其他客户端（如 AsyncWeChatAPI）共享
+            token_store: 令牌存储（进程内/文件/Redis），多个进程共享令牌时使用
+            connect_timeout: 连接超时（秒）
+            read_timeout: 读取超时（秒）
+            upload_timeout: 上传素材的读取超时（秒）
+            max_retries: 临时错误（网络异常、5xx、errcode -1/45009）的最大重试次数
+            backoff_base: 重试退避基数（秒）
+            backoff_max: 单次重试退避上限（秒）
+            pool_size: 连接池大小（同时保持的到微信服务器的连接数）
+            keep_alive: 是否复用连接，关闭后每个请求都重新建立 TCP+TLS 连接
+            session: 外部传入的会话（多个账号可共用一个连接池），传入时 pool_size/keep_alive 不生效
+            rate_limiter: 限流器，每次发送请求前调用其 acquire(接口路径)，请求确定没有发出时调用其 release(接口路径)
+                退还配额（可选实现，见 wechat_accounts.AccountLimiter）
         """
         self.app_id = app_id
         self.app_secret = app_secret
-        self.access_token = None
-        self.token_expires_at = 0
+        self.token_cache = token_cache or AccessTokenCache(token_store, app_id)
         self.base_url = "https://api.weixin.qq.com/cgi-bin"
+        self.timeout = (connect_timeout, read_timeout)
+        self.upload_timeout = (connect_timeout, upload_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # 所有接口（包括素材上传）共用一个会话的连接池；Content-Type 由每个请求自己设置
+        self.session = session or create_session(pool_size, keep_alive)
+        self.rate_limiter = rate_limiter
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self.token_cache.access_token
+
+    @property
+    def token_expires_at(self) -> float:
+        return self.token_cache.expires_at
 
-        # 会话管理（禁用代理，直接连接）
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'WeChat-Python-SDK/1.0',
-            'Content-Type': 'application/json'
-        })
-        # 禁用代理，确保使用本地公网 IP
-        self.session.trust_env = False
-        self.session.proxies = {
-            'http': None,
-            'https': None
-        }
-    
     def get_access_token(self) -> str:
         """
         获取访问令牌（带缓存）
@@ -48,25 +650,113 @@ class WeChatAPI:
             str: 访问令牌
         """
         # 检查缓存是否有效
-        if self.access_token and time.time() < self.token_expires_at:
-            return self.access_token
-        
-        url = f"{self.base_url}/token"
+        token = self.token_cache.get()
+        if token:
+            return token
+
+        # 单飞刷新：并发请求只会有一个去调用令牌接口
+        return self.token_cache.refresh(self._fetch_access_token)
+
+    def _fetch_access_token(self) -> Dict:
+        """请求 /cgi-bin/token 接口"""
         params = {
             'grant_type': 'client_credential',
             'appid': self.app_id,
             'secret': self.app_secret
         }
         
-        response = self.session.get(url, params=params)
-        data = response.json()
-        
-        if 'access_token' in data:
-            self.access_token = data['access_token']
-            self.token_expires_at = time.time() + data.get('expires_in', 7200) - 300  # 提前5分钟刷新
-            return self.access_token
-        else:
-            raise Exception(f"获取访问令牌失败: {data}")
+        return self._request('GET', 'token', params=params, with_token=False)
+
+    def _request(self, method: str, path: str, params: Optional[Dict] = None, json_data: Optional[Dict] = None,
+                 body: Optional[Callable[[], Optional[Tuple]]] = None, with_token: bool = True,
+                 idempotent: bool = True, timeout: Optional[Tuple[float, float]] = None) -> Dict:
+        """
+        所有接口调用共用的请求层：超时、分类重试、令牌失效自动刷新后重放
+
+        - 连接未建立（连接超时、连接被拒绝、DNS 失败）时请求一定没有发出，总是重试；读超时、连接中断和 5xx 只对幂等接口重试（非幂等接口可能已生效）
+        - errcode -1/45009 表示请求未被处理，按退避重试
+        - errcode 40001/40014/42001 表示令牌无效，刷新令牌后重放一次
+
+        Args:
+            method: HTTP 方法
+            path: 接口路径（相对 base_url）
+            params: 查询参数（access_token 自动添加）
+            json_data: JSON 请求体
+            body: 每次发送前调用，返回 (请求体, 请求头)；返回 None 表示请求体无法重放，不再重试
+            with_token: 是否附带 access_token
+            idempotent: 接口是否幂等（重复调用没有副作用）
+            timeout: (连接超时, 读取超时)，默认 self.timeout
+
+        Returns:
+            Dict: 接口响应数据
+        """
+        url = f"{self.base_url}/{path}"
+        attempt = 0
+        token_refreshed = False
+        result = None
+
+        while True:
+            query = dict(params or {})
+            token = None
+            if with_token:
+                token = self.get_access_token()
+                query['access_token'] = token
+
+            prepared = body() if body else _json_body(json_data)
+            if prepared is None:
+                # 请求体（如不可回退的流）无法重放，返回上一次的结果
+                if result is not None:
+                    return result
+                raise Exception(f"请求体无法重放: {path}")
+            data, headers = prepared
+
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(path)
+
+            retry = False
+            try:
+                response = self.session.request(method, url, params=query, data=data, headers=headers,
+                                                timeout=timeout or self.timeout)
+            except requests.RequestException as e:
+                never_sent = _never_sent(e)
+                if never_sent and hasattr(self.rate_limiter, 'release'):
+                    # 请求没有到达微信，不占用每日配额
+                    self.rate_limiter.release(path)
+                if not (never_sent or
+                        (idempotent and isinstance(e, (requests.ConnectionError, requests.Timeout)))):
+                    raise
+                if attempt >= self.max_retries:
+                    raise
+                retry = True
+            else:
+                try:
+                    result = response.json()
+                except ValueError:
+                    if idempotent and response.status_code in RETRY_HTTP_STATUS and attempt < self.max_retries:
+                        retry = True
+                    else:
+                        raise Exception(f"微信接口响应无法解析: HTTP {response.status_code} {response.text[:200]}")
+
+            if not retry:
+                errcode = _errcode(result)
+                if errcode in TOKEN_ERRCODES and with_token and not token_refreshed:
+                    # 令牌被其他地方刷新或提前失效：作废后重新获取，立即重放
+                    self.token_cache.invalidate(token)
+                    token_refreshed = True
+                    continue
+                if errcode not in TRANSIENT_ERRCODES or attempt >= self.max_retries:
+                    return result
+
+            time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+            attempt += 1
+
+    def start_token_refresher(self, ahead: float = 300, interval: float = 60):
+        """启动后台线程，在令牌过期前 ahead 秒主动刷新"""
+        self.token_cache.start_refresher(self._fetch_access_token, ahead=ahead, interval=interval)
+
+    def stop_token_refresher(self):
+        """停止后台令牌刷新线程"""
+        self.token_cache.stop_refresher()
     
     def switch_draft_box(self, check_only: bool = False) -> Dict:
         """
@@ -78,15 +768,11 @@ class WeChatAPI:
         Returns:
             Dict: API 响应结果
         """
-        token = self.get_access_token()
-        url = f"{self.base_url}/draft/switch"
-        
-        params = {'access_token': token}
+        params = {}
         if check_only:
             params['checkonly'] = '1'
         
-        response = self.session.post(url, params=params)
-        data = response.json()
+        data = self._request('POST', 'draft/switch', params=params)
         
         if data.get('errcode') == 0:
             status = '已开启' if data.get('is_open') == 1 else '未开启'
@@ -120,39 +806,11 @@ class WeChatAPI:
         Returns:
             Dict: API 响应结果
         """
-        token = self.get_access_token()
-        url = f"{self.base_url}/draft/add"
-
         data = {'articles': articles}
 
-        # 手动序列化JSON，确保中文不被转义（使用ensure_ascii=False）
-        # 使用data参数发送UTF-8字节，而不是json参数（json参数会转义中文为\uXXXX）
-        json_str = json.dumps(data, ensure_ascii=False)
-        json_bytes = json_str.encode('utf-8')
-
-        response = self.session.post(
-            url,
-            params={'access_token': token},
-            data=json_bytes,
-            headers={'Content-Type': 'application/json; charset=utf-8'}
-        )
-        result = response.json()
-
-        # 成功时返回 {'media_id': '...', 'item': [...]}
-        # 失败时返回 {'errcode': xxx, 'errmsg': '...'}
-        if 'media_id' in result:
-            return {
-                'success': True,
-                'data': result,
-                'message': '草稿创建成功',
-                'media_id': result.get('media_id')
-            }
-        else:
-            return {
-                'success': False,
-                'error': result,
-                'message': '草稿创建失败'
-            }
+        # 请求层以 UTF-8 字节发送 JSON，确保中文不被转义为\uXXXX
+        # 重复提交会生成重复草稿，按非幂等接口处理
+        return _format_create_draft(self._request('POST', 'draft/add', json_data=data, idempotent=False))
     
     def get_draft_list(self, offset: int = 0, count: int = 20, no_content: int = 0) -> Dict:
         """
@@ -166,30 +824,13 @@ class WeChatAPI:
         Returns:
             Dict: API 响应结果
         """
-        token = self.get_access_token()
-        url = f"{self.base_url}/draft/batchget"
-        
         data = {
             'offset': offset,
             'count': count,
             'no_content': no_content
         }
         
-        response = self.session.post(url, params={'access_token': token}, json=data)
-        result = response.json()
-        
-        if result.get('errcode') == 0:
-            return {
-                'success': True,
-                'data': result,
-                'message': '草稿列表获取成功'
-            }
-        else:
-            return {
-                'success': False,
-                'error': result,
-                'message': '获取草稿列表失败'
-            }
+        return _format_draft_list(self._request('POST', 'draft/batchget', json_data=data))
     
     def delete_draft(self, media_id: str) -> Dict:
         """
@@ -201,27 +842,76 @@ class WeChatAPI:
         Returns:
             Dict: API 响应结果
         """
-        token = self.get_access_token()
-        url = f"{self.base_url}/draft/delete"
-        
         data = {'media_id': media_id}
         
-        response = self.session.post(url, params={'access_token': token}, json=data)
-        result = response.json()
-        
-        if result.get('errcode') == 0:
-            return {
-                'success': True,
-                'data': result,
-                'message': '草稿删除成功',
-                'warning': '此操作不可逆，请谨慎操作'
-            }
-        else:
-            return {
-                'success': False,
-                'error': result,
-                'message': '草稿删除失败'
-            }
+        return _format_delete_draft(self._request('POST', 'draft/delete', json_data=data))
+
+    def iter_drafts(self, predicate: Optional[DraftPredicate] = None, page_size: int = 20,
+                    no_content: bool = True) -> Iterator[Dict]:
+        """
+        逐页遍历整个草稿箱（按需请求下一页，内存中只保留一页）
+
+        Args:
+            predicate: 过滤条件（如 draft_older_than(30)），None 表示全部
+            page_size: 每页数量（最多 20）
+            no_content: 是否不返回正文（只需元数据时可大幅减小响应）
+
+        Yields:
+            Dict: 草稿（draft/batchget 的 item：media_id、content.news_item、update_time）
+        """
+        offset = 0
+        while True:
+            items, total = _page_items(self.get_draft_list(offset, page_size, int(no_content)), offset)
+            for item in items:
+                if predicate is None or predicate(item):
+                    yield item
+            offset += len(items)
+            if not items or offset >= total:
+                return
+
+    def delete_drafts(self, predicate: DraftPredicate, max_workers: int = 4, page_size: int = 20,
+                      dry_run: bool = False, limit: Optional[int] = None) -> Dict:
+        """
+        批量删除符合条件的草稿（逐页扫描，每页内并发删除）
+
+        删除会让后面的草稿前移，因此每页删除完成后按实际删除数调整下一页的偏移量。
+
+        Args:
+            predicate: 过滤条件（清空草稿箱可传 lambda draft: True）
+            max_workers: 并发删除数
+            page_size: 每页扫描数量（最多 20）
+            dry_run: 只统计符合条件的草稿，不删除
+            limit: 最多删除的数量，None 表示不限
+
+        Returns:
+            Dict: 扫描/匹配/删除/失败数量，failures 为前 100 条失败明细
+        """
+        summary = _new_delete_summary(dry_run)
+        offset = 0
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='draft-delete') as executor:
+            while limit is None or summary['matched'] < limit:
+                items, total = _page_items(self.get_draft_list(offset, page_size, 1), offset)
+                summary['scanned'] += len(items)
+                matched = [item['media_id'] for item in items if predicate(item)]
+                if limit is not None:
+                    matched = matched[:limit - summary['matched']]
+                summary['matched'] += len(matched)
+
+                deleted = 0
+                if not dry_run:
+                    for media_id, result in zip(matched, executor.map(self._safe_delete_draft, matched)):
+                        deleted += _record_delete(summary, media_id, result)
+
+                offset += len(items) - deleted
+                if not items or offset >= total - deleted:
+                    break
+        return _format_delete_drafts(summary)
+
+    def _safe_delete_draft(self, media_id: str) -> Dict:
+        try:
+            return self.delete_draft(media_id)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
     
     def publish_article(self, media_id: str) -> Dict:
         """
@@ -233,28 +923,9 @@ class WeChatAPI:
         Returns:
             Dict: API 响应结果
         """
-        token = self.get_access_token()
-        url = f"{self.base_url}/freepublish/submit"
-        
         data = {'media_id': media_id}
         
-        response = self.session.post(url, params={'access_token': token}, json=data)
-        result = response.json()
-        
-        if result.get('errcode') == 0:
-            return {
-                'success': True,
-                'data': result,
-                'message': '发布任务提交成功！请使用 publish_id 查询发布状态',
-                'publish_id': result.get('publish_id'),
-                'next_step': f"调用 publish_status 查询发布状态，publish_id: {result.get('publish_id')}"
-            }
-        else:
-            return {
-                'success': False,
-                'error': result,
-                'message': '发布任务提交失败'
-            }
+        return _format_publish(self._request('POST', 'freepublish/submit', json_data=data, idempotent=False))
     
     def get_publish_status(self, publish_id: str) -> Dict:
         """
@@ -266,95 +937,47 @@ class WeChatAPI:
         Returns:
             Dict: API 响应结果
         """
-        token = self.get_access_token()
-        url = f"{self.base_url}/freepublish/get"
-        
         data = {'publish_id': publish_id}
         
-        response = self.session.post(url, params={'access_token': token}, json=data)
-        result = response.json()
-        
-        # 状态码映射
-        status_map = {
-            0: '发布成功',
-            1: '发布中',
-            2: '原创失败',
-            3: '常规失败',
-            4: '平台审核不通过',
-            5: '成功后用户删除所有文章',
-            6: '成功后系统封禁所有文章'
-        }
-        
-        if result.get('errcode') == 0:
-            status_code = result.get('publish_status')
-            status_desc = status_map.get(status_code, '未知状态')
-            
-            response_data = {
-                'success': True,
-                'data': result,
-                'message': '状态查询成功',
-                'publish_status': status_code,
-                'publish_status_desc': status_desc
-            }
-            
-            # 如果发布成功，添加文章链接
-            if status_code == 0 and 'article_detail' in result:
-                articles = result['article_detail'].get('item', [])
-                if articles:
-                    response_data['article_links'] = [
-                        {'idx': item['idx'], 'url': item['article_url']} 
-                        for item in articles
-                    ]
-            
-            return response_data
-        else:
-            return {
-                'success': False,
-                'error': result,
-                'message': '状态查询失败'
-            }
+        return _format_publish_status(self._request('POST', 'freepublish/get', json_data=data))
     
-    def upload_media(self, media_path: str, media_type: str = 'thumb') -> Dict:
+    def upload_media(self, media: MediaSource, media_type: str = 'thumb',
+                     filename: Optional[str] = None, content_type: Optional[str] = None) -> Dict:
         """
         上传媒体文件
 
         Args:
-            media_path: 文件路径
+            media: 文件路径、字节内容、文件对象或 stream=True 的 requests 响应
             media_type: 媒体类型 (thumb, image, voice, video等)
+            filename: 上传时使用的文件名，默认从来源推断
+            content_type: 媒体 Content-Type，默认从来源推断
 
         Returns:
             Dict: API 响应结果
         """
-        import os
+        fileobj, length, filename, content_type, should_close = open_media_source(media, filename, content_type)
+        start = _tell(fileobj)
+        sent = []
 
-        token = self.get_access_token()
-        url = f"{self.base_url}/material/add_material?access_token={token}&type={media_type}"
+        def build_body():
+            # 重试时把来源回退到起点重新构造请求体；不可回退的流无法重放
+            if sent:
+                if start is None:
+                    return None
+                fileobj.seek(start)
+            sent.append(True)
+            # 流式构造 multipart/form-data 请求体，媒体数据按块发送
+            body = MultipartStream('media', filename, content_type, fileobj, length)
+            return body, {'Content-Type': body.content_type}
 
-        filename = os.path.basename(media_path)
-
-        # 使用 requests 标准的文件上传方式
-        with open(media_path, 'rb') as f:
-            files = {'media': (filename, f, 'image/jpeg')}
-
-            # 文件上传不需要 Content-Type: application/json
-            # 让 requests 自动设置 multipart/form-data
-            response = requests.post(url, files=files, proxies={'http': None, 'https': None})
-            result = response.json()
+        try:
+            result = self._request('POST', 'material/add_material', params={'type': media_type}, body=build_body,
+                                   idempotent=False, timeout=self.upload_timeout)
+        finally:
+            if should_close:
+                fileobj.close()
 
-        if 'media_id' in result:
-            return {
-                'success': True,
-                'data': result,
-                'message': '媒体文件上传成功',
-                'media_id': result.get('media_id'),
-                'url': result.get('url')
-            }
-        else:
-            return {
-                'success': False,
-                'error': result,
-                'message': '媒体文件上传失败'
-            }
+        return _format_upload(result)
     
     def complete_publish(self, title: str, content: str, summary: str = '', thumb_media_id: str = '') -> Dict:
         """
@@ -373,14 +996,7 @@ class WeChatAPI:
         
         try:
             # Step 1: 创建草稿
-            articles = [{
-                'title': title,
-                'content': content,
-                'digest': summary,
-                'thumb_media_id': thumb_media_id,
-                'need_open_comment': 0,
-                'only_fans_can_comment': 0
-            }]
+            articles = build_articles(title, content, summary, thumb_media_id)
             
             draft_result = self.create_draft(articles)
             if draft_result['success']:
@@ -409,20 +1025,363 @@ class WeChatAPI:
                 }
             
             # 成功
-            steps['✅ 流程完成'] = '所有步骤执行成功'
+            return _format_complete_publish(self.access_token, media_id, publish_result, steps)
+            
+        except Exception as e:
             return {
-                'success': True,
-                'data': {
-                    'access_token': self.access_token,
-                    'media_id': media_id,
-                    'publish_id': publish_result['publish_id'],
-                    'steps': steps
-                },
-                'message': '发布任务提交成功！请使用 publish_id 查询发布状态',
-                'next_step': publish_result['next_step'],
-                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+                'success': False,
+                'error': str(e),
+                'message': f'发布流程异常: {str(e)}',
+                'steps': steps
             }
-            
+
+    def batch_publish(self, articles: List[Dict], group_size: int = MAX_DRAFT_ARTICLES,
+                      publish: bool = True) -> Dict:
+        """
+        批量发布：按顺序每 group_size 篇合成一个多图文草稿，每组只调用一次 create_draft 和 publish_article
+
+        Args:
+            articles: 文章列表（draft/add 的 article 参数，可用 build_article 构造）
+            group_size: 每个草稿的文章数（最多 8 篇）
+            publish: 是否在创建草稿后提交发布
+
+        Returns:
+            Dict: 汇总结果，groups 为每个草稿的 media_id / publish_id 或失败原因（一组失败不影响其他组）
+        """
+        groups = []
+        for index, group in enumerate(chunk_articles(articles, group_size)):
+            groups.append(self._publish_group(index, group, publish))
+        return _format_batch_publish(groups, publish)
+
+    def _publish_group(self, index: int, group: List[Dict], publish: bool) -> Dict:
+        entry = _batch_group(index, group)
+        try:
+            draft_result = self.create_draft(group)
+            if not draft_result['success']:
+                return _fail_batch_group(entry, draft_result['error'], '草稿创建失败')
+            entry['media_id'] = draft_result['media_id']
+
+            if publish:
+                publish_result = self.publish_article(entry['media_id'])
+                if not publish_result['success']:
+                    return _fail_batch_group(entry, publish_result['error'], '发布任务提交失败')
+                entry['publish_id'] = publish_result['publish_id']
+        except Exception as e:
+            return _fail_batch_group(entry, str(e), f'发布流程异常: {str(e)}')
+
+        entry['success'] = True
+        return entry
+
+
+async def _aiter_stream(stream: MultipartStream, in_memory: bool, chunk_size: int = 64 * 1024):
+    """将 MultipartStream 转为异步字节流；非内存来源的读取放到线程中执行，避免阻塞事件循环"""
+    while True:
+        if in_memory:
+            chunk = stream.read(chunk_size)
+        else:
+            chunk = await asyncio.to_thread(stream.read, chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class AsyncWeChatAPI:
+    """
+    微信公众号 API 异步客户端
+
+    基于 httpx.AsyncClient 连接池，接口与 WeChatAPI 保持一致（方法均为协程），
+    可通过 token_cache 或 from_sync() 与同步客户端共享令牌
+    """
+
+    def __init__(self, app_id: str, app_secret: str, token_cache: Optional[AccessTokenCache] = None,
+                 client=None, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 token_store: Optional[TokenStore] = None, connect_timeout: float = 5, read_timeout: float = 30,
+                 upload_timeout: float = 120, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8):
+        """
+        初始化微信 API 异步客户端
+
+        Args:
+            app_id: 微信公众号 AppID
+            app_secret: 微信公众号 AppSecret
+            token_cache: 令牌缓存，可与其他客户端共享
+            client: 外部传入的 httpx.AsyncClient（多个账号可共用一个连接池）
+            max_connections: 连接池最大连接数
+            max_keepalive_connections: 连接池最大保活连接数
+            token_store: 令牌存储（进程内/文件/Redis），多个进程共享令牌时使用
+            connect_timeout / read_timeout / upload_timeout / max_retries / backoff_base / backoff_max:
+                超时与重试设置，同 WeChatAPI
+        """
+        if httpx is None:
+            raise ImportError("AsyncWeChatAPI 需要安装 httpx: pip install httpx")
+
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.token_cache = token_cache or AccessTokenCache(token_store, app_id)
+        self.base_url = "https://api.weixin.qq.com/cgi-bin"
+        self._token_lock = None
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.upload_timeout = httpx.Timeout(upload_timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # 禁用代理，确保使用本地公网 IP
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(
+            headers={'User-Agent': 'WeChat-Python-SDK/1.0'},
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections
+            ),
+            timeout=self.timeout,
+            trust_env=False
+        )
+
+    @classmethod
+    def from_sync(cls, api: WeChatAPI, **kwargs) -> 'AsyncWeChatAPI':
+        """基于同步客户端创建异步客户端，两者共享令牌缓存"""
+        kwargs.setdefault('connect_timeout', api.timeout[0])
+        kwargs.setdefault('read_timeout', api.timeout[1])
+        kwargs.setdefault('upload_timeout', api.upload_timeout[1])
+        kwargs.setdefault('max_retries', api.max_retries)
+        client = cls(api.app_id, api.app_secret, token_cache=api.token_cache, **kwargs)
+        client.base_url = api.base_url
+        return client
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self.token_cache.access_token
+
+    async def close(self):
+        """关闭自有的连接池"""
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def __aenter__(self) -> 'AsyncWeChatAPI':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def get_access_token(self) -> str:
+        """
+        获取访问令牌（带缓存，同一事件循环内并发调用只会请求一次）
+
+        Returns:
+            str: 访问令牌
+        """
+        token = self.token_cache.get()
+        if token:
+            return token
+
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            token = self.token_cache.get()
+            if token:
+                return token
+
+            # 与同步客户端共用单飞刷新逻辑；锁等待放在线程中，不阻塞事件循环
+            loop = asyncio.get_running_loop()
+
+            def fetch() -> Dict:
+                return asyncio.run_coroutine_threadsafe(self._fetch_access_token(), loop).result()
+
+            return await asyncio.to_thread(self.token_cache.refresh, fetch)
+
+    async def _fetch_access_token(self) -> Dict:
+        """请求 /cgi-bin/token 接口"""
+        params = {
+            'grant_type': 'client_credential',
+            'appid': self.app_id,
+            'secret': self.app_secret
+        }
+        return await self._request('GET', 'token', params=params, with_token=False)
+
+    async def _request(self, method: str, path: str, params: Optional[Dict] = None,
+                       json_data: Optional[Dict] = None, body: Optional[Callable[[], Optional[Tuple]]] = None,
+                       with_token: bool = True, idempotent: bool = True, timeout=None) -> Dict:
+        """请求层：超时、分类重试、令牌失效自动刷新后重放，规则同 WeChatAPI._request"""
+        url = f"{self.base_url}/{path}"
+        attempt = 0
+        token_refreshed = False
+        result = None
+
+        while True:
+            query = dict(params or {})
+            token = None
+            if with_token:
+                token = await self.get_access_token()
+                query['access_token'] = token
+
+            prepared = body() if body else _json_body(json_data)
+            if prepared is None:
+                if result is not None:
+                    return result
+                raise Exception(f"请求体无法重放: {path}")
+            content, headers = prepared
+
+            retry = False
+            try:
+                response = await self.client.request(method, url, params=query, content=content, headers=headers,
+                                                     timeout=timeout or self.timeout)
+            except httpx.TransportError as e:
+                if not (_never_sent(e) or idempotent):
+                    raise
+                if attempt >= self.max_retries:
+                    raise
+                retry = True
+            else:
+                try:
+                    result = response.json()
+                except ValueError:
+                    if idempotent and response.status_code in RETRY_HTTP_STATUS and attempt < self.max_retries:
+                        retry = True
+                    else:
+                        raise Exception(f"微信接口响应无法解析: HTTP {response.status_code} {response.text[:200]}")
+
+            if not retry:
+                errcode = _errcode(result)
+                if errcode in TOKEN_ERRCODES and with_token and not token_refreshed:
+                    # invalidate 要拿 AccessTokenCache 的线程锁，而刷新线程持有该锁等待事件循环执行令牌请求，
+                    # 在事件循环上直接调用会互相等待，因此放到线程中执行
+                    await asyncio.to_thread(self.token_cache.invalidate, token)
+                    token_refreshed = True
+                    continue
+                if errcode not in TRANSIENT_ERRCODES or attempt >= self.max_retries:
+                    return result
+
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+            attempt += 1
+
+    async def _post_json(self, path: str, data: Dict, idempotent: bool = True) -> Dict:
+        """以 UTF-8 JSON（不转义中文）调用接口并返回响应数据"""
+        return await self._request('POST', path, json_data=data, idempotent=idempotent)
+
+    async def create_draft(self, articles: List[Dict]) -> Dict:
+        """创建草稿，参数与返回值同 WeChatAPI.create_draft"""
+        return _format_create_draft(await self._post_json('draft/add', {'articles': articles}, idempotent=False))
+
+    async def get_draft_list(self, offset: int = 0, count: int = 20, no_content: int = 0) -> Dict:
+        """获取草稿列表，参数与返回值同 WeChatAPI.get_draft_list"""
+        data = {'offset': offset, 'count': count, 'no_content': no_content}
+        return _format_draft_list(await self._post_json('draft/batchget', data))
+
+    async def delete_draft(self, media_id: str) -> Dict:
+        """删除草稿，参数与返回值同 WeChatAPI.delete_draft"""
+        return _format_delete_draft(await self._post_json('draft/delete', {'media_id': media_id}))
+
+    async def iter_drafts(self, predicate: Optional[DraftPredicate] = None, page_size: int = 20,
+                          no_content: bool = True) -> AsyncIterator[Dict]:
+        """逐页遍历整个草稿箱，参数同 WeChatAPI.iter_drafts"""
+        offset = 0
+        while True:
+            items, total = _page_items(await self.get_draft_list(offset, page_size, int(no_content)), offset)
+            for item in items:
+                if predicate is None or predicate(item):
+                    yield item
+            offset += len(items)
+            if not items or offset >= total:
+                return
+
+    async def delete_drafts(self, predicate: DraftPredicate, max_workers: int = 4, page_size: int = 20,
+                            dry_run: bool = False, limit: Optional[int] = None) -> Dict:
+        """批量删除符合条件的草稿，参数与返回值同 WeChatAPI.delete_drafts"""
+        summary = _new_delete_summary(dry_run)
+        slots = asyncio.Semaphore(max(1, max_workers))
+
+        async def delete(media_id):
+            async with slots:
+                try:
+                    return await self.delete_draft(media_id)
+                except Exception as e:
+                    return {'success': False, 'error': str(e)}
+
+        offset = 0
+        while limit is None or summary['matched'] < limit:
+            items, total = _page_items(await self.get_draft_list(offset, page_size, 1), offset)
+            summary['scanned'] += len(items)
+            matched = [item['media_id'] for item in items if predicate(item)]
+            if limit is not None:
+                matched = matched[:limit - summary['matched']]
+            summary['matched'] += len(matched)
+
+            deleted = 0
+            if not dry_run:
+                results = await asyncio.gather(*(delete(media_id) for media_id in matched))
+                for media_id, result in zip(matched, results):
+                    deleted += _record_delete(summary, media_id, result)
+
+            offset += len(items) - deleted
+            if not items or offset >= total - deleted:
+                break
+        return _format_delete_drafts(summary)
+
+    async def publish_article(self, media_id: str) -> Dict:
+        """发布文章，参数与返回值同 WeChatAPI.publish_article"""
+        return _format_publish(await self._post_json('freepublish/submit', {'media_id': media_id}, idempotent=False))
+
+    async def get_publish_status(self, publish_id: str) -> Dict:
+        """查询发布状态，参数与返回值同 WeChatAPI.get_publish_status"""
+        return _format_publish_status(await self._post_json('freepublish/get', {'publish_id': publish_id}))
+
+    async def upload_media(self, media: MediaSource, media_type: str = 'thumb',
+                           filename: Optional[str] = None, content_type: Optional[str] = None) -> Dict:
+        """上传媒体文件，参数与返回值同 WeChatAPI.upload_media"""
+        fileobj, length, filename, content_type, should_close = open_media_source(media, filename, content_type)
+        start = _tell(fileobj)
+        sent = []
+
+        def build_body():
+            if sent:
+                if start is None:
+                    return None
+                fileobj.seek(start)
+            sent.append(True)
+            body = MultipartStream('media', filename, content_type, fileobj, length)
+            return (_aiter_stream(body, in_memory=isinstance(fileobj, io.BytesIO)),
+                    {'Content-Type': body.content_type, 'Content-Length': str(body.len)})
+
+        try:
+            result = await self._request('POST', 'material/add_material', params={'type': media_type},
+                                         body=build_body, idempotent=False, timeout=self.upload_timeout)
+        finally:
+            if should_close:
+                fileobj.close()
+
+        return _format_upload(result)
+
+    async def complete_publish(self, title: str, content: str, summary: str = '', thumb_media_id: str = '') -> Dict:
+        """一键完整发布流程：创建草稿 -> 提交发布，返回值同 WeChatAPI.complete_publish"""
+        steps = {}
+
+        try:
+            draft_result = await self.create_draft(build_articles(title, content, summary, thumb_media_id))
+            if not draft_result['success']:
+                steps['1.创建草稿'] = '❌ 失败'
+                return {
+                    'success': False,
+                    'error': draft_result['error'],
+                    'message': '草稿创建失败，流程终止',
+                    'steps': steps
+                }
+            steps['1.创建草稿'] = '✅ 成功'
+            media_id = draft_result['media_id']
+
+            publish_result = await self.publish_article(media_id)
+            if not publish_result['success']:
+                steps['2.提交发布'] = '❌ 失败'
+                return {
+                    'success': False,
+                    'error': publish_result['error'],
+                    'message': '发布任务提交失败',
+                    'steps': steps
+                }
+            steps['2.提交发布'] = '✅ 成功'
+
+            return _format_complete_publish(self.access_token, media_id, publish_result, steps)
+
         except Exception as e:
             return {
                 'success': False,
@@ -431,6 +1390,34 @@ class WeChatAPI:
                 'steps': steps
             }
 
+    async def batch_publish(self, articles: List[Dict], group_size: int = MAX_DRAFT_ARTICLES,
+                            publish: bool = True) -> Dict:
+        """批量发布，参数与返回值同 WeChatAPI.batch_publish；各组并发提交"""
+        groups = await asyncio.gather(*(
+            self._publish_group(index, group, publish)
+            for index, group in enumerate(chunk_articles(articles, group_size))
+        ))
+        return _format_batch_publish(list(groups), publish)
+
+    async def _publish_group(self, index: int, group: List[Dict], publish: bool) -> Dict:
+        entry = _batch_group(index, group)
+        try:
+            draft_result = await self.create_draft(group)
+            if not draft_result['success']:
+                return _fail_batch_group(entry, draft_result['error'], '草稿创建失败')
+            entry['media_id'] = draft_result['media_id']
+
+            if publish:
+                publish_result = await self.publish_article(entry['media_id'])
+                if not publish_result['success']:
+                    return _fail_batch_group(entry, publish_result['error'], '发布任务提交失败')
+                entry['publish_id'] = publish_result['publish_id']
+        except Exception as e:
+            return _fail_batch_group(entry, str(e), f'发布流程异常: {str(e)}')
+
+        entry['success'] = True
+        return entry
+
 
 def main():
     """示例用法"""
@@ -503,28 +1490,24 @@ def main():
             if data.get('publish_id'):
                 print(f"\n3️⃣ 查询发布状态 (Publish ID: {data.get('publish_id')})...")
                 
-                # 轮询状态
-                for i in range(5):  # 最多查询5次
-                    time.sleep(3)  # 等待3秒
-                    
-                    status_result = wechat.get_publish_status(data['publish_id'])
-                    if status_result['success']:
-                        status = status_result['publish_status']
-                        desc = status_result['publish_status_desc']
-                        print(f"   第{i+1}次查询: {status} - {desc}")
-                        
-                        if status == 0:  # 发布成功
-                            if 'article_links' in status_result:
-                                for link in status_result['article_links']:
-                                    print(f"   📎 文章链接: {link['url']}")
-                            break
-                        elif status > 1:  # 失败状态
-                            break
-                    else:
-                        print(f"   第{i+1}次查询失败: {status_result.get('message')}")
-                        break
-                else:
+                # 由跟踪器按递增间隔轮询，到达终态后返回
+                from concurrent import futures
+                from publish_tracker import PublishTracker
+                tracker = PublishTracker(wechat, db_path='publish_tracker.db', initial_interval=3)
+                tracker.start()
+                try:
+                    record = tracker.track(data['publish_id']).result(timeout=120)
+                except futures.TimeoutError:
+                    record = None
+                finally:
+                    tracker.stop()
+
+                if record is None:
                     print("   ⏰ 查询超时，请稍后手动查看发布状态")
+                else:
+                    print(f"   查询{record['attempts']}次: {record['publish_status']} - {record['publish_status_desc']}")
+                    for link in (record['result'] or {}).get('article_links', []):
+                        print(f"   📎 文章链接: {link['url']}")
         else:
             print(f"   ❌ 发布失败: {complete_result.get('message')}")
             if complete_result.get('error'):
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+微信公众号 HTML 样式注入
+根据「标签 -> CSS 属性」主题表，一次扫描为 HTML 中的标签注入内联样式；
+MarkdownRenderer 复用 Markdown 转换器并按内容哈希+主题缓存渲染结果
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import markdown
+
+# 默认主题：container 为外层 section 的样式，其余键为 HTML 标签名
+DEFAULT_THEME: Dict[str, Dict[str, str]] = {
+    'container': {
+        'margin': '0',
+        'padding': '16px',
+        'font-family': "-apple-system, 'PingFang SC', 'Microsoft YaHei', sans-serif",
+        'line-height': '1.75',
+        'color': '#333',
+    },
+    # 图片
+    'img': {
+        'max-width': '100%',
+        'height': 'auto',
+        'display': 'block',
+        'margin': '20px auto',
+        'border-radius': '4px',
+    },
+    # 段落
+    'p': {
+        'margin': '16px 0',
+        'text-align': 'justify',
+        'font-size': '15px',
+        'line-height': '1.8',
+    },
+    # 标题 - 更醒目的样式
+    'h2': {
+        'font-size': '22px',
+        'font-weight': 'bold',
+        'margin': '28px 0 18px',
+        'padding': '14px 20px',
+        'background-color': '#4a6cf7',
+        'color': '#ffffff',
+        'text-align': 'center',
+        'letter-spacing': '1px',
+    },
+    'h3': {
+        'font-size': '19px',
+        'font-weight': 'bold',
+        'margin': '24px 0 14px',
+        'padding': '10px 0 10px 16px',
+        'color': '#2d3748',
+        'border-left': '5px solid #4a6cf7',
+        'background-color': '#f7fafc',
+    },
+    # 代码
+    'code': {
+        'padding': '2px 6px',
+        'background': '#f5f5f5',
+        'border-radius': '3px',
+        'font-family': 'Consolas, Monaco, monospace',
+        'font-size': '14px',
+    },
+    'pre': {
+        'background': '#f8f8f8',
+        'padding': '16px',
+        'border-radius': '4px',
+        'overflow-x': 'auto',
+        'margin': '16px 0',
+    },
+    # 引用
+    'blockquote': {
+        'border-left': '4px solid #5b7be8',
+        'margin': '16px 0',
+        'color': '#666',
+        'background-color': '#f7f9fa',
+        'padding': '12px 16px',
+    },
+    # 列表
+    'ul': {
+        'margin': '16px 0',
+        'padding-left': '24px',
+    },
+    'li': {
+        'margin': '8px 0',
+        'line-height': '1.8',
+    },
+    # 强调文字（加粗）
+    'strong': {
+        'color': '#5b7be8',
+        'font-weight': 'bold',
+    },
+}
+
+THEMES: Dict[str, Dict[str, Dict[str, str]]] = {
+    'default': DEFAULT_THEME,
+}
+
+# 标签属性中的 style 属性
+_STYLE_ATTR = re.compile(r'\sstyle\s*=\s*(?:"([^"]*)"|\'([^\']*)\')', re.IGNORECASE)
+
+
+def style_text(styles: Optional[Dict[str, str]]) -> str:
+    """将 CSS 属性字典转为内联样式字符串"""
+    if not styles:
+        return ''
+    return ' '.join(f'{key}: {value};' for key, value in styles.items())
+
+
+def load_theme(name_or_path: str) -> Dict[str, Dict[str, str]]:
+    """按名称获取内置主题，或从 JSON 文件加载主题（格式同 DEFAULT_THEME）"""
+    if name_or_path in THEMES:
+        return THEMES[name_or_path]
+    with open(name_or_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class WeChatStyler:
+    """按主题表为 HTML 注入内联样式（单次扫描，只改写开始标签，不受标签内嵌套内容影响）"""
+
+    def __init__(self, theme: Optional[Dict[str, Dict[str, str]]] = None):
+        theme = theme or DEFAULT_THEME
+        self.container_style = style_text(theme.get('container'))
+        self.tag_styles = {
+            tag.lower(): style_text(styles).replace('"', '&quot;')
+            for tag, styles in theme.items()
+            if tag != 'container' and styles
+        }
+        self._cache: Dict[str, str] = {}
+        names = '|'.join(sorted((re.escape(tag) for tag in self.tag_styles), key=len, reverse=True))
+        # 匹配主题中标签的开始标签，属性值中的引号内容可以包含 >
+        self._pattern = re.compile(
+            rf'<({names})((?:\s[^>"\']*(?:(?:"[^"]*"|\'[^\']*\')[^>"\']*)*)?)>',
+            re.IGNORECASE
+        ) if names else None
+
+    def _replace(self, match: re.Match) -> str:
+        # 大部分开始标签不带属性（如 <p>、<li>），按原文缓存改写结果
+        start_tag = match.group(0)
+        replaced = self._cache.get(start_tag)
+        if replaced is None:
+            replaced = self._restyle(match.group(1), match.group(2))
+            if len(self._cache) < 1024:
+                self._cache[start_tag] = replaced
+        return replaced
+
+    def _restyle(self, tag: str, attrs: str) -> str:
+        style = self.tag_styles[tag.lower()]
+
+        self_closing = attrs.rstrip().endswith('/')
+        if self_closing:
+            attrs = attrs.rstrip()[:-1]
+
+        # 已有内联样式时保留，并让其优先于主题样式
+        existing = _STYLE_ATTR.search(attrs)
+        if existing:
+            original = (existing.group(1) if existing.group(1) is not None else existing.group(2)).strip()
+            attrs = attrs[:existing.start()] + attrs[existing.end():]
+            if original:
+                style = f"{style} {original}{'' if original.endswith(';') else ';'}"
+
+        attrs = attrs.rstrip()
+        return f'<{tag}{attrs} style="{style}"{" /" if self_closing else ""}>'
+
+    def apply(self, html: str) -> str:
+        """为 HTML 片段中的标签注入主题样式"""
+        if not html or self._pattern is None:
+            return html
+        return self._pattern.sub(self._replace, html)
+
+    def render(self, body_html: str) -> str:
+        """注入样式并包裹外层 section"""
+        return f'''
+<section style="{self.container_style}">
+{self.apply(body_html)}
+</section>
+'''
+
+
+@lru_cache(maxsize=16)
+def get_styler(name_or_path: str = 'default') -> WeChatStyler:
+    """获取（并缓存）指定主题的样式器"""
+    return WeChatStyler(load_theme(name_or_path))
+
+
+class MarkdownRenderer:
+    """Markdown -> 微信HTML 渲染器（每个线程复用一个 Markdown 实例，结果按内容哈希+主题做LRU缓存）"""
+
+    def __init__(self, extensions: List[str], max_entries: int = 256):
+        """
+        Args:
+            extensions: Python-Markdown 扩展列表
+            max_entries: 渲染结果缓存条数，0 表示不缓存
+        """
+        self.extensions = list(extensions)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache: 'OrderedDict[tuple, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Markdown 实例不是线程安全的，每个线程各持有一个
+        self._local = threading.local()
+
+    def _converter(self) -> markdown.Markdown:
+        converter = getattr(self._local, 'converter', None)
+        if converter is None:
+            converter = markdown.Markdown(extensions=self.extensions)
+            self._local.converter = converter
+        return converter
+
+    def to_html(self, md_content: str) -> str:
+        """Markdown 转 HTML（不含样式）"""
+        # reset 清除上一次转换残留的状态（脚注、缩写、引用链接等）
+        return self._converter().reset().convert(md_content)
+
+    def render(self, md_content: str, theme: str = 'default') -> str:
+        """
+        渲染带主题样式的微信HTML
+
+        Args:
+            md_content: Markdown 内容
+            theme: 主题名或JSON主题文件路径
+
+        Returns:
+            str: 微信公众号HTML
+        """
+        key = (hashlib.sha256(md_content.encode('utf-8')).hexdigest(), theme)
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+
+        html = get_styler(theme).render(self.to_html(md_content))
+
+        if self.max_entries > 0:
+            with self._lock:
+                self._cache[key] = html
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return html
+
+    def clear(self):
+        """清空渲染缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict:
+        """返回缓存命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._cache),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }